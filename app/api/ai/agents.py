@@ -1,87 +1,279 @@
+import asyncio
 import os
 import openai
 import logging
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from app.api.ai.http_client import get_http_session
+from app.api.ai.prompt_template import PromptTemplate
+from app.api.ai.rate_limiter import estimate_tokens, get_rate_limiter
+from app.api.ai.response_cache import get_cached_response, store_response
 
 logger = logging.getLogger(__name__)
 
+# Callback receiving (new text, completion chunks/tokens so far). Chunk 1 starts
+# a new completion; a cached answer arrives whole with count 0.
+DeltaCallback = Callable[[str, int], None]
+
+RESEARCH_SYSTEM_PROMPT = (
+    "You are a specialized research agent focused on gathering factual details, "
+    "identifying missing data, and providing an objective overview of the company's "
+    "market position, traction, financial health, and other relevant insights."
+)
+
+SECTION_SYSTEM_PROMPT = (
+    "You are an expert report writer with deep industry knowledge. Respond only with the requested headings and content. Do not include disclaimers or source references. If analysis information is missing for a section or table entry, report that it was not provided. This should be a weakness for the analysis of each section. Assume all ratings shown in prompts should be updated to rate the information in the retrieved context and not just use the ratings shown."
+)
+
+
+def _chunk_text(chunk) -> str:
+    """Text carried by one streamed chat-completion chunk (may be empty)."""
+    choices = chunk.get("choices") or []
+    if not choices:
+        return ""
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
 class BaseAIAgent:
     """
     Base class for AI agents using the OpenAI GPT o1 API.
     This class provides methods to generate report sections based on a dynamic prompt template and context.
+
+    Passing `on_delta` streams the completion and reports partial text as it
+    arrives (used for live progress); otherwise a single blocking call is made.
+
+    Subclasses declare `prompt_template` as a class-level `PromptTemplate`, so
+    it is parsed once at import; a template string may still be passed in.
     """
-    def __init__(self, prompt_template: str):
-        self.prompt_template = prompt_template
+    prompt_template: Optional[PromptTemplate] = None
 
-    def gather_research(self, context: Dict[str, Any]) -> str:
+    def __init__(self, prompt_template: Optional[Union[str, PromptTemplate]] = None):
+        if prompt_template is not None:
+            self.prompt_template = PromptTemplate.coerce(prompt_template, name=type(self).__name__)
+        if self.prompt_template is None:
+            raise ValueError(f"{type(self).__name__} has no prompt template")
+
+    @staticmethod
+    def model_name() -> str:
+        # Retrieve model name from environment or default to "o1"
+        return os.getenv("OPENAI_MODEL", "o1")
+
+    @staticmethod
+    def build_messages(system_prompt: str, prompt: str, shared_context: str = "") -> List[Dict[str, str]]:
+        messages = [
+            {
+                "role": "system",
+                "content": system_prompt
+            }
+        ]
+        if shared_context:
+            # Identical across calls and reports, and placed before anything
+            # call-specific so the provider can serve it from its prompt cache.
+            messages.append({"role": "user", "content": shared_context})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    @staticmethod
+    def _cache_prompt(prompt: str, shared_context: str) -> str:
+        return f"{shared_context}\n\n{prompt}" if shared_context else prompt
+
+    def render_request(self, context: Dict[str, Any], research: bool = False) -> Tuple[str, str, str]:
+        """
+        (system prompt, user prompt, shared context) for `context` without
+        calling the API; used to build Batch API requests.
+        """
+        system_prompt = RESEARCH_SYSTEM_PROMPT if research else SECTION_SYSTEM_PROMPT
+        prompt = self.prompt_template.render(context)
+        return system_prompt, prompt, context.get("shared_context", "")
+
+    def _complete(
+        self,
+        system_prompt: str,
+        prompt: str,
+        on_delta: Optional[DeltaCallback] = None,
+        shared_context: str = "",
+    ) -> str:
+        """
+        One chat completion. Served from the response cache when the same
+        (model, system prompt, prompt) was answered before; otherwise throttled
+        by the shared rate limiter, which is reconciled with the real usage (or
+        refunded when the call fails) and fed the x-ratelimit headers of every
+        response by the HTTP session hooks in `app.api.ai.http_client`.
+        """
+        model_name = self.model_name()
+        cache_prompt = self._cache_prompt(prompt, shared_context)
+        cached = get_cached_response(model_name, system_prompt, cache_prompt)
+        if cached is not None:
+            logger.info("Agent cache hit for %s; skipping API call.", type(self).__name__)
+            if on_delta:
+                on_delta(cached, 0)
+            return cached
+
+        messages = self.build_messages(system_prompt, prompt, shared_context)
+        limiter = get_rate_limiter()
+        estimated = estimate_tokens(messages)
+        limiter.acquire(estimated)
+        # Refunded in full unless the call completes (see the finally below)
+        actual: Optional[int] = 0
+        try:
+            response = openai.ChatCompletion.create(
+                model=model_name,
+                messages=messages,
+                stream=on_delta is not None
+            )
+            if on_delta is None:
+                actual = (response.get("usage") or {}).get("total_tokens")
+                content = response["choices"][0]["message"]["content"].strip()
+            else:
+                parts, chunks = [], 0
+                for chunk in response:
+                    text = _chunk_text(chunk)
+                    if text:
+                        parts.append(text)
+                        chunks += 1
+                        on_delta(text, chunks)
+                # Streams carry no usage block; one chunk is ~one token.
+                actual = estimate_tokens(messages, completion_tokens=chunks)
+                content = "".join(parts).strip()
+        except openai.error.RateLimitError:
+            # The 429's headers already resized the buckets (http_client hooks);
+            # keep the reservation rather than hand it back
+            actual = None
+            raise
+        finally:
+            limiter.reconcile(estimated, actual)
+        store_response(model_name, system_prompt, cache_prompt, content)
+        return content
+
+    def gather_research(self, context: Dict[str, Any], on_delta: Optional[DeltaCallback] = None) -> str:
         """
         Calls the GPT API to gather data based on the prompt template.
         Returns text that can be used as context for other agents.
         """
-        prompt = self.prompt_template.format(**context)
+        prompt = self.prompt_template.render(context)
         logger.info("Gathering research with prompt:\n%s", prompt)
 
-        # Retrieve model name from environment or default to "o1"
-        model_name = os.getenv("OPENAI_MODEL", "o1")
-
+        model_name = self.model_name()
         try:
-            response = openai.ChatCompletion.create(
-                model=model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a specialized research agent focused on gathering factual details, "
-                            "identifying missing data, and providing an objective overview of the company's "
-                            "market position, traction, financial health, and other relevant insights."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
+            content = self._complete(
+                RESEARCH_SYSTEM_PROMPT, prompt, on_delta, context.get("shared_context", "")
             )
-            content = response["choices"][0]["message"]["content"].strip()
             logger.info("Research completed successfully using model: %s", model_name)
             return content
         except Exception as e:
             logger.error("Error gathering research: %s", str(e), exc_info=True)
             raise e
 
-    def generate_section(self, context: Dict[str, Any]) -> str:
+    def generate_section(self, context: Dict[str, Any], on_delta: Optional[DeltaCallback] = None) -> str:
         """
         Generates a report section using the provided context.
         Dynamically formats the prompt template with the given context and calls the GPT API.
         """
-        prompt = self.prompt_template.format(**context)
+        prompt = self.prompt_template.render(context)
         logger.info("Generating section with prompt:\n%s", prompt)
 
-        model_name = os.getenv("OPENAI_MODEL", "o1")
+        model_name = self.model_name()
         try:
-            response = openai.ChatCompletion.create(
-                model=model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are an expert report writer with deep industry knowledge. Respond only with the requested headings and content. Do not include disclaimers or source references. If analysis information is missing for a section or table entry, report that it was not provided. This should be a weakness for the analysis of each section. Assume all ratings shown in prompts should be updated to rate the information in the retrieved context and not just use the ratings shown."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
+            content = self._complete(
+                SECTION_SYSTEM_PROMPT, prompt, on_delta, context.get("shared_context", "")
             )
-            content = response["choices"][0]["message"]["content"].strip()
             logger.info("Section generated successfully using model: %s", model_name)
             return content
         except Exception as e:
             logger.error("Error generating section: %s", str(e), exc_info=True)
             raise e
 
-class ResearcherAgent(BaseAIAgent):
+
+class AsyncBaseAIAgent(BaseAIAgent):
+    """
+    Async variant of BaseAIAgent.
+
+    Adds `agather_research` / `agenerate_section`, which await the completion on
+    the process-wide pooled HTTP session (see `app.api.ai.http_client`) instead of
+    blocking a worker thread. The sync methods remain available.
+    """
+    async def _acomplete(
+        self,
+        system_prompt: str,
+        prompt: str,
+        on_delta: Optional[DeltaCallback] = None,
+        shared_context: str = "",
+    ) -> str:
+        model_name = self.model_name()
+        cache_prompt = self._cache_prompt(prompt, shared_context)
+        cached = await asyncio.to_thread(get_cached_response, model_name, system_prompt, cache_prompt)
+        if cached is not None:
+            logger.info("Agent cache hit for %s; skipping API call.", type(self).__name__)
+            if on_delta:
+                on_delta(cached, 0)
+            return cached
+
+        messages = self.build_messages(system_prompt, prompt, shared_context)
+        limiter = get_rate_limiter()
+        estimated = estimate_tokens(messages)
+        await limiter.acquire_async(estimated)
+        # Refunded in full unless the call completes (see the finally below)
+        actual: Optional[int] = 0
+        # openai<1.0 reads the aiohttp session from a context variable; setting it
+        # here reuses pooled keep-alive connections instead of one session per call.
+        openai.aiosession.set(get_http_session())
+        try:
+            response = await openai.ChatCompletion.acreate(
+                model=model_name,
+                messages=messages,
+                stream=on_delta is not None
+            )
+            if on_delta is None:
+                actual = (response.get("usage") or {}).get("total_tokens")
+                content = response["choices"][0]["message"]["content"].strip()
+            else:
+                parts, chunks = [], 0
+                async for chunk in response:
+                    text = _chunk_text(chunk)
+                    if text:
+                        parts.append(text)
+                        chunks += 1
+                        on_delta(text, chunks)
+                # Streams carry no usage block; one chunk is ~one token.
+                actual = estimate_tokens(messages, completion_tokens=chunks)
+                content = "".join(parts).strip()
+        except openai.error.RateLimitError:
+            actual = None
+            raise
+        finally:
+            await limiter.reconcile_async(estimated, actual)
+        await asyncio.to_thread(store_response, model_name, system_prompt, cache_prompt, content)
+        return content
+
+    async def agather_research(self, context: Dict[str, Any], on_delta: Optional[DeltaCallback] = None) -> str:
+        """Async counterpart of `gather_research`."""
+        prompt = self.prompt_template.render(context)
+        logger.info("Gathering research (async) with prompt:\n%s", prompt)
+        try:
+            content = await self._acomplete(
+                RESEARCH_SYSTEM_PROMPT, prompt, on_delta, context.get("shared_context", "")
+            )
+            logger.info("Research completed successfully using model: %s", self.model_name())
+            return content
+        except Exception as e:
+            logger.error("Error gathering research: %s", str(e), exc_info=True)
+            raise e
+
+    async def agenerate_section(self, context: Dict[str, Any], on_delta: Optional[DeltaCallback] = None) -> str:
+        """Async counterpart of `generate_section`."""
+        prompt = self.prompt_template.render(context)
+        logger.info("Generating section (async) with prompt:\n%s", prompt)
+        try:
+            content = await self._acomplete(
+                SECTION_SYSTEM_PROMPT, prompt, on_delta, context.get("shared_context", "")
+            )
+            logger.info("Section generated successfully using model: %s", self.model_name())
+            return content
+        except Exception as e:
+            logger.error("Error generating section: %s", str(e), exc_info=True)
+            raise e
+
+class ResearcherAgent(AsyncBaseAIAgent):
     """
     Consolidates essential research prompts to gather high-level data about a company.
     Output is used as context for subsequent agents.  Updated to:
@@ -91,8 +283,8 @@ class ResearcherAgent(BaseAIAgent):
       • Capture customer-retention trends
       • Preserve strict Markdown output structure
     """
-    def __init__(self):
-        prompt_template = (
+    prompt_template = PromptTemplate(
+        (
             "You are a professional research analyst. Collect clear, factual information for the "
             "company below. **Tailor your depth and tone to the company’s current stage** "
             "(early-stage, growth, late-stage) and its industry domain.\n\n"
@@ -150,13 +342,14 @@ class ResearcherAgent(BaseAIAgent):
             "• Use bullet lists for clarity; keep each bullet concise.\n"
             "• If data is unavailable, state “*Not publicly available*”.\n"
             "• Do **not** draft a final narrative; provide raw findings only.\n"
-        )
-        super().__init__(prompt_template)
+        ),
+        name=__qualname__,
+    )
 
 # ---------------------------------------------------------------
 # 1) Executive Summary & Investment Rationale
 # ---------------------------------------------------------------
-class ExecutiveSummaryAgent(BaseAIAgent):
+class ExecutiveSummaryAgent(AsyncBaseAIAgent):
     """
     Section-1 agent updated to:
       • Briefly touch on all five improvement themes (stage-fit tone, competitive
@@ -167,8 +360,8 @@ class ExecutiveSummaryAgent(BaseAIAgent):
       • Preserve existing markdown headings / anchors.
     """
 
-    def __init__(self):
-        prompt_template = (
+    prompt_template = PromptTemplate(
+        (
             "You are an executive-level report writer creating **Section 1: Executive Summary "
             "& Investment Rationale** in Markdown.  "
             "Use a tone that reflects the company’s maturity: **optimistic and visionary** if "
@@ -229,15 +422,16 @@ class ExecutiveSummaryAgent(BaseAIAgent):
             "• Derive every status or claim from the provided context; if unknown, write "
             "“*Not publicly available*”.  \n"
             "• Keep all headings / anchors exactly as shown; do not add emoji in headings."
-        )
-        super().__init__(prompt_template)
+        ),
+        name=__qualname__,
+    )
 
 
 
 # ---------------------------------------------------------------
 # 2) Market Opportunity & Competitive Landscape
 # ---------------------------------------------------------------
-class MarketAnalysisAgent(BaseAIAgent):
+class MarketAnalysisAgent(AsyncBaseAIAgent):
     """
     AI Agent for Section 2: Market Opportunity & Competitive Landscape
     — updated to:
@@ -247,8 +441,8 @@ class MarketAnalysisAgent(BaseAIAgent):
       • Highlight compliance / market-entry constraints (e.g., SOC 2, GDPR)
       • Preserve all existing markdown anchors and heading hierarchy
     """
-    def __init__(self):
-        prompt_template = (
+    prompt_template = PromptTemplate(
+        (
             "You are an expert market analyst writing **Section 2: Market Opportunity & Competitive Landscape** "
             "in Markdown.  Tailor your analysis to the startup’s **stage** and **audience**:\n"
             "• If **{funding_stage}** is early (pre-MVP / pre-revenue) → emphasize market potential, unmet needs, and validation hurdles.\n"
@@ -311,14 +505,15 @@ class MarketAnalysisAgent(BaseAIAgent):
             "4. Replace [🟢/🟡/🔴] with the correct color to match the rating for the category.\n"
             "5. Use plain words such as Strong / Moderate / Weak and a matching color emoji.\n"
             "6. Base each status on retrieved evidence.\n"
-        )
-        super().__init__(prompt_template)
+        ),
+        name=__qualname__,
+    )
 
 
 # ---------------------------------------------------------------
 # 3) Financial Performance & Investment Readiness
 # ---------------------------------------------------------------
-class FinancialPerformanceAgent(BaseAIAgent):
+class FinancialPerformanceAgent(AsyncBaseAIAgent):
     """
     AI Agent for Section 3: Financial Performance & Investment Readiness
     Subheadings (from your Python docstring):
@@ -367,8 +562,8 @@ class FinancialPerformanceAgent(BaseAIAgent):
       | **Burn Rate & Cash Flow Stability** | 🟡 Requires Validation |
       | **Profitability & Sustainability** | 🟡 Long-Term Risk |
     """
-    def __init__(self):
-        prompt_template = (
+    prompt_template = PromptTemplate(
+        (
             "You are an expert at drafting **Section 3: Financial Performance & Investment Readiness** "
             "in Markdown format. Use **the exact headings, subheadings, and anchor links** below. "
             "Incorporate any relevant details from '{{retrieved_context}}' and apply color-coded references (🟢, 🟡, 🔴) if needed.\n\n"
@@ -416,14 +611,15 @@ class FinancialPerformanceAgent(BaseAIAgent):
             "4. Replace [🟢/🟡/🔴] with the correct color to match the rating for the category.\n"
             "5. Use plain words such as Strong / Moderate / Weak and a matching color emoji.\n"
             "6. Base each status on retrieved evidence.\n"
-        )
-        super().__init__(prompt_template)
+        ),
+        name=__qualname__,
+    )
 
 
 # ---------------------------------------------------------------
 # 4) Go-To-Market (GTM) Strategy & Customer Traction
 # ---------------------------------------------------------------
-class GoToMarketAgent(BaseAIAgent):
+class GoToMarketAgent(AsyncBaseAIAgent):
     """
     Section-4 agent — now stage-aware, retention-focused, and expansion-oriented.
     Adds:
@@ -432,8 +628,8 @@ class GoToMarketAgent(BaseAIAgent):
       • Competitive-aware differentiation guidance
       • Tone adaptation based on funding_stage (early vs. growth/late)
     """
-    def __init__(self):
-        prompt_template = (
+    prompt_template = PromptTemplate(
+        (
             "You are a go-to-market strategist drafting **Section 4: Go-To-Market (GTM) Strategy & Customer Traction** "
             "in Markdown.  Adjust tone and depth to **{funding_stage}**:\n"
             "• *Early-stage* – emphasize agile experiments, budget awareness, learning cycles.\n"
@@ -510,14 +706,15 @@ class GoToMarketAgent(BaseAIAgent):
             "4. Replace [🟢/🟡/🔴] with the correct color to match the rating for the category.\n"
             "5. Use plain words such as Strong / Moderate / Weak and a matching color emoji.\n"
             "6. Base each status on retrieved evidence.\n"
-        )
-        super().__init__(prompt_template)
+        ),
+        name=__qualname__,
+    )
 
 
 # ---------------------------------------------------------------
 # 5) Leadership & Team
 # ---------------------------------------------------------------
-class LeadershipTeamAgent(BaseAIAgent):
+class LeadershipTeamAgent(AsyncBaseAIAgent):
     """
     AI Agent for Section 5: Leadership & Team
 
@@ -570,8 +767,8 @@ class LeadershipTeamAgent(BaseAIAgent):
     | **Sales & Business Development Scalability** | 🟡 Needs Expansion |
     | **Team Stability & Succession Planning** | 🟡 Moderate Risk |
     """
-    def __init__(self):
-        prompt_template = (
+    prompt_template = PromptTemplate(
+        (
             "You are an expert at drafting **Section 5: Leadership & Team** in Markdown format. "
             "Use **the exact headings, subheadings, anchor links, and tables** provided below, "
             "incorporating details from '{{retrieved_context}}' and mentioning color-coded references if relevant."
@@ -629,14 +826,15 @@ class LeadershipTeamAgent(BaseAIAgent):
             "4. Replace [🟢/🟡/🔴] with the correct color to match the rating for the category.\n"
             "5. Use plain words such as Strong / Moderate / Weak and a matching color emoji.\n"
             "6. Base each status on retrieved evidence.\n"
-        )
-        super().__init__(prompt_template)
+        ),
+        name=__qualname__,
+    )
 
 
 # ---------------------------------------------------------------
 # 6) Investor Fit, Exit Strategy & Funding Narrative
 # ---------------------------------------------------------------
-class InvestorFitAgent(BaseAIAgent):
+class InvestorFitAgent(AsyncBaseAIAgent):
     """
     AI Agent for Section 6: Investor Fit, Exit Strategy & Funding Narrative
 
@@ -692,8 +890,8 @@ class InvestorFitAgent(BaseAIAgent):
     | **Funding & Exit Strategy Clarity** | 🟡 Needs Refinement |
     | **Risk Profile for Investors** | 🟡 Moderate Risk Due to FSM Dependency |
     """
-    def __init__(self):
-        prompt_template = (
+    prompt_template = PromptTemplate(
+        (
             "You are an expert at drafting **Section 6: Investor Fit, Exit Strategy & Funding Narrative** "
             "in Markdown format. Use **the exact headings, subheadings, anchor links, tables, and bullet points** "
             "as shown in the template below. Incorporate relevant details from '{{retrieved_context}}' and use "
@@ -754,14 +952,15 @@ class InvestorFitAgent(BaseAIAgent):
             "4. Replace [🟢/🟡/🔴] with the correct color to match the rating for the category.\n"
             "5. Use plain words such as Strong / Moderate / Weak and a matching color emoji.\n"
             "6. Base each status on retrieved evidence.\n"            
-        )
-        super().__init__(prompt_template)
+        ),
+        name=__qualname__,
+    )
 
 
 # ---------------------------------------------------------------
 # 7) Final Recommendations & Next Steps
 # ---------------------------------------------------------------
-class RecommendationsAgent(BaseAIAgent):
+class RecommendationsAgent(AsyncBaseAIAgent):
     """
     Section-7 agent updated for dynamic risk ratings and expanded categories.
     Key upgrades:
@@ -773,8 +972,8 @@ class RecommendationsAgent(BaseAIAgent):
       • Keeps all anchor tags / headings unchanged.
     """
 
-    def __init__(self):
-        prompt_template = (
+    prompt_template = PromptTemplate(
+        (
             "You are an expert analyst drafting **Section 7: Final Recommendations & Next Steps** "
             "in Markdown.  Base your judgments on the full context below and use the dynamic "
             "emoji scoring system:\n"
@@ -851,5 +1050,6 @@ class RecommendationsAgent(BaseAIAgent):
             "4. Replace [🟢/🟡/🔴] with the correct color to match the rating for the category.\n"
             "5. Use plain words such as Strong / Moderate / Weak and a matching color emoji.\n"
             "6. Base each status on retrieved evidence.\n"
-        )
-        super().__init__(prompt_template)
+        ),
+        name=__qualname__,
+    )
@@ -0,0 +1,314 @@
+# app/api/ai/batch.py
+"""
+Batch-API mode for report generation.
+
+For reports nobody is waiting on (the user is emailed when the PDF is ready),
+`generate_reports_batch` sends every agent prompt of many reports through the
+provider's Batch API instead of one request per call. Batch requests are
+billed at a discount and do not count against the interactive RPM/TPM limits.
+
+The report graph has dependencies (research → sections 2–6 → recommendations
+→ executive summary), so generation runs in waves: one batch per graph level,
+and each batch holds that level's prompts for all reports. Each wave:
+
+1. renders the prompts from the outputs of the previous waves;
+2. writes them to a JSONL batch file;
+3. submits the file and polls until the batch finishes;
+4. fans the results back into the sections (and into checkpoints / the response cache).
+
+Providers:
+
+  BATCH_PROVIDER=openai  the OpenAI Batch API (/v1/files + /v1/batches)
+  BATCH_PROVIDER=local   runs every line with ChatCompletion.create in
+                         process; a stand-in for development and tests
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import openai
+import requests
+
+from app.api.ai.agents import BaseAIAgent
+from app.api.ai.context_assembly import assemble_context
+from app.api.ai.orchestrator import (
+    _steps_to_run,
+    assemble_report,
+    build_report_steps,
+    is_valid_checkpoint,
+    render_step,
+    step_output,
+    validate_report_steps,
+)
+from app.api.ai.prompt_template import MissingContextError
+from app.api.ai.response_cache import get_cached_response, store_response
+from app.api.ai.scheduler import AgentNode, topological_levels
+
+logger = logging.getLogger(__name__)
+
+BATCH_PROVIDER = os.getenv("BATCH_PROVIDER", "openai").lower()
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1").rstrip("/")
+BATCH_COMPLETION_WINDOW = os.getenv("BATCH_COMPLETION_WINDOW", "24h")
+BATCH_POLL_INTERVAL = int(os.getenv("BATCH_POLL_INTERVAL", "60"))
+# Give up on a wave after this long (the provider's window plus slack)
+BATCH_MAX_WAIT_SECONDS = int(os.getenv("BATCH_MAX_WAIT_SECONDS", str(26 * 3600)))
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+TERMINAL_BATCH_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+def batch_line(custom_id: str, model: str, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """One request line of a chat-completions batch file."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_ENDPOINT,
+        "body": {"model": model, "messages": messages},
+    }
+
+
+def write_batch_file(lines: List[Dict[str, Any]], directory: Optional[str] = None) -> str:
+    fd, path = tempfile.mkstemp(prefix="report_batch_", suffix=".jsonl", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return path
+
+
+def parse_batch_output(lines: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    """{custom_id: completion text, or None when that request failed}."""
+    results: Dict[str, Optional[str]] = {}
+    for line in lines:
+        custom_id = line.get("custom_id")
+        response = line.get("response") or {}
+        body = response.get("body") or {}
+        if line.get("error") or response.get("status_code", 200) >= 400 or not body.get("choices"):
+            logger.error("Batch request %s failed: %s", custom_id, line.get("error") or body.get("error"))
+            results[custom_id] = None
+            continue
+        content = (body["choices"][0].get("message") or {}).get("content") or ""
+        results[custom_id] = content.strip() or None
+    return results
+
+
+class OpenAIBatchProvider:
+    """
+    OpenAI Batch API over plain HTTP (the pinned openai SDK predates batches).
+    """
+    def __init__(self, api_key: Optional[str] = None, api_base: str = OPENAI_API_BASE):
+        self.api_base = api_base
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_key or openai.api_key or os.getenv('OPENAI_API_KEY', '')}"
+
+    def submit(self, jsonl_path: str) -> str:
+        with open(jsonl_path, "rb") as f:
+            upload = self.session.post(
+                f"{self.api_base}/files",
+                data={"purpose": "batch"},
+                files={"file": (os.path.basename(jsonl_path), f, "application/jsonl")},
+                timeout=300,
+            )
+        upload.raise_for_status()
+        batch = self.session.post(
+            f"{self.api_base}/batches",
+            json={
+                "input_file_id": upload.json()["id"],
+                "endpoint": CHAT_COMPLETIONS_ENDPOINT,
+                "completion_window": BATCH_COMPLETION_WINDOW,
+            },
+            timeout=60,
+        )
+        batch.raise_for_status()
+        return batch.json()["id"]
+
+    def status(self, batch_id: str) -> Dict[str, Any]:
+        response = self.session.get(f"{self.api_base}/batches/{batch_id}", timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def results(self, batch: Dict[str, Any]) -> List[Dict[str, Any]]:
+        lines: List[Dict[str, Any]] = []
+        for key in ("output_file_id", "error_file_id"):
+            file_id = batch.get(key)
+            if not file_id:
+                continue
+            response = self.session.get(f"{self.api_base}/files/{file_id}/content", timeout=300)
+            response.raise_for_status()
+            lines.extend(json.loads(row) for row in response.text.splitlines() if row.strip())
+        return lines
+
+
+class LocalBatchProvider:
+    """
+    In-process stand-in with the same interface: `submit` runs every line
+    through `complete` (ChatCompletion.create by default) and the batch is
+    immediately completed.
+    """
+    def __init__(self, complete: Optional[Callable[..., Any]] = None):
+        self.complete = complete or openai.ChatCompletion.create
+        self._batches: Dict[str, List[Dict[str, Any]]] = {}
+
+    def submit(self, jsonl_path: str) -> str:
+        output = []
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            for row in f:
+                if not row.strip():
+                    continue
+                line = json.loads(row)
+                try:
+                    body = self.complete(**line["body"])
+                    output.append({
+                        "custom_id": line["custom_id"],
+                        "response": {"status_code": 200, "body": body},
+                        "error": None,
+                    })
+                except Exception as e:
+                    output.append({"custom_id": line["custom_id"], "response": None, "error": {"message": str(e)}})
+        batch_id = f"local_{uuid.uuid4().hex}"
+        self._batches[batch_id] = output
+        return batch_id
+
+    def status(self, batch_id: str) -> Dict[str, Any]:
+        return {"id": batch_id, "status": "completed"}
+
+    def results(self, batch: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self._batches.pop(batch["id"], [])
+
+
+def get_batch_provider(name: Optional[str] = None):
+    name = (name or BATCH_PROVIDER).lower()
+    if name == "local":
+        return LocalBatchProvider()
+    if name == "openai":
+        return OpenAIBatchProvider()
+    raise ValueError(f"Unknown BATCH_PROVIDER '{name}'")
+
+
+def wait_for_batch(provider, batch_id: str, poll_interval: int = BATCH_POLL_INTERVAL,
+                   max_wait: int = BATCH_MAX_WAIT_SECONDS,
+                   on_poll: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Poll until the batch reaches a terminal state; raise unless it completed.
+    `on_poll` is called before every status check (the batch runner uses it
+    to heartbeat its requests); its errors are logged, not raised.
+    """
+    deadline = time.monotonic() + max_wait
+    while True:
+        if on_poll is not None:
+            try:
+                on_poll()
+            except Exception as e:
+                logger.warning("Batch %s poll callback failed: %s", batch_id, e)
+        batch = provider.status(batch_id)
+        state = batch.get("status")
+        if state in TERMINAL_BATCH_STATES:
+            if state != "completed":
+                raise RuntimeError(f"Batch {batch_id} ended with status '{state}'")
+            return batch
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Batch {batch_id} still '{state}' after {max_wait}s")
+        logger.info("Batch %s is '%s'; polling again in %ss.", batch_id, state, poll_interval)
+        time.sleep(poll_interval)
+
+
+def generate_reports_batch(
+    reports: Dict[str, dict],
+    checkpoints: Optional[Dict[str, dict]] = None,
+    on_step_complete: Optional[Callable[[str, str, str], None]] = None,
+    provider=None,
+    on_poll: Optional[Callable[[], None]] = None,
+) -> Dict[str, dict]:
+    """
+    Generate many reports through the Batch API.
+
+    Args:
+        reports: {request_id: request_params} (as for `generate_report`).
+        checkpoints: {request_id: {step_key: output}} saved by earlier attempts.
+        on_step_complete: called as `(request_id, step_key, output)` for every
+            newly generated step, so callers can checkpoint it.
+        provider: batch provider (defaults to BATCH_PROVIDER).
+        on_poll: called on every poll while a wave is in flight (see
+            `wait_for_batch`).
+
+    Returns:
+        {request_id: sections dict, as returned by `generate_report`}; reports
+        whose templates lack context are logged and left out.
+    """
+    provider = provider or get_batch_provider()
+    checkpoints = checkpoints or {}
+    model = BaseAIAgent.model_name()
+
+    steps_by_report, to_run, results = {}, {}, {}
+    for request_id, params in list(reports.items()):
+        saved = checkpoints.get(request_id) or {}
+        steps = build_report_steps(params, assemble_context(params))
+        try:
+            validate_report_steps(steps, params)
+        except MissingContextError as e:
+            # Leave it out of the batch; it is absent from the returned dict
+            logger.error("Skipping report %s: %s", request_id, e)
+            reports = {k: v for k, v in reports.items() if k != request_id}
+            continue
+        steps_by_report[request_id] = {step.key: step for step in steps}
+        to_run[request_id] = _steps_to_run(steps, saved)
+        results[request_id] = {k: v for k, v in saved.items() if is_valid_checkpoint(v)}
+
+    if not reports:
+        return {}
+    # Every report shares the same graph, so the waves are the same for all
+    any_steps = next(iter(steps_by_report.values())).values()
+    levels = topological_levels([AgentNode(s.key, None, s.depends_on) for s in any_steps])
+
+    for wave, level in enumerate(levels, start=1):
+        lines, pending = [], {}
+        for request_id in reports:
+            for node in level:
+                if node.key not in to_run[request_id]:
+                    continue
+                step = steps_by_report[request_id][node.key]
+                inputs = {dep: results[request_id][dep] for dep in step.depends_on}
+                agent, system_prompt, prompt, shared = render_step(step, inputs)
+                cache_prompt = agent._cache_prompt(prompt, shared)
+
+                cached = get_cached_response(model, system_prompt, cache_prompt)
+                if cached is not None:
+                    _record(results, request_id, step, cached, on_step_complete)
+                    continue
+
+                custom_id = f"{request_id}:{step.key}"
+                lines.append(batch_line(custom_id, model, agent.build_messages(system_prompt, prompt, shared)))
+                pending[custom_id] = (request_id, step, system_prompt, cache_prompt)
+
+        if not lines:
+            continue
+
+        path = write_batch_file(lines)
+        try:
+            batch_id = provider.submit(path)
+            logger.info("Submitted batch wave %s/%s (%s requests) as %s.", wave, len(levels), len(lines), batch_id)
+            outputs = parse_batch_output(provider.results(wait_for_batch(provider, batch_id, on_poll=on_poll)))
+        finally:
+            os.remove(path)
+
+        for custom_id, (request_id, step, system_prompt, cache_prompt) in pending.items():
+            content = outputs.get(custom_id)
+            if content is not None:
+                store_response(model, system_prompt, cache_prompt, content)
+            _record(results, request_id, step, content, on_step_complete)
+
+    return {request_id: assemble_report(results[request_id]) for request_id in reports}
+
+
+def _record(results, request_id, step, content, on_step_complete) -> None:
+    output = step_output(step, content)
+    results[request_id][step.key] = output
+    if on_step_complete is not None and is_valid_checkpoint(output):
+        try:
+            on_step_complete(request_id, step.key, output)
+        except Exception as e:
+            logger.warning("Could not checkpoint %s/%s: %s", request_id, step.key, e)
@@ -0,0 +1,194 @@
+# app/api/ai/context_assembly.py
+"""
+Context assembly for report agents.
+
+Previously the static reference text, pitch-deck text, vector snippets and
+researcher findings were concatenated into one `ephemeral_context` that was
+sent whole to the Researcher and to each of sections 2–6. Here the context is
+split into:
+
+*   a stable prefix: the static reference material (`reference_context`),
+    routed per agent. It is identical for every report and is sent as its
+    own leading message, so provider-side prompt caching can reuse it.
+*   per-call slices: the report-specific material (pitch-deck pages, retrieval
+    snippets, researcher subsections). It is labelled, de-duplicated, routed
+    to the agents it is relevant to (see `context_router`) and trimmed to a
+    per-agent token budget.
+
+`ContextAssembly.stats()` reports the tokens sent compared with the old
+full-context baseline.
+"""
+
+import functools
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.api.ai.context_router import (
+    AGENT_TOPICS,
+    ContextChunk,
+    label_pitch_deck,
+    label_reference,
+    label_research,
+    label_snippets,
+    render_chunks,
+    route_chunks,
+    split_paragraphs,
+)
+from app.api.ai.rate_limiter import count_tokens
+from app.api.ai.reference_context import REFERENCE_CONTEXT
+from app.matching_engine.retrieval_utils import (
+    retrieve_relevant_chunks,
+    build_context_from_matches
+)
+
+logger = logging.getLogger(__name__)
+
+# Token budgets for the report-specific slice of each prompt (stable prefix excluded)
+RESEARCH_CONTEXT_TOKEN_BUDGET = int(os.getenv("RESEARCH_CONTEXT_TOKEN_BUDGET", "12000"))
+SECTION_CONTEXT_TOKEN_BUDGET = int(os.getenv("SECTION_CONTEXT_TOKEN_BUDGET", "6000"))
+
+# Per-agent overrides of SECTION_CONTEXT_TOKEN_BUDGET
+AGENT_CONTEXT_BUDGETS: Dict[str, int] = {
+    "leadership_team": SECTION_CONTEXT_TOKEN_BUDGET // 2,
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def dedupe_chunks(chunks: Iterable[ContextChunk]) -> List[ContextChunk]:
+    """Drop chunks whose text repeats an earlier one (whitespace/case-insensitive)."""
+    seen = set()
+    unique = []
+    for chunk in chunks:
+        fingerprint = _WHITESPACE.sub(" ", chunk.text).strip().lower()
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        unique.append(chunk)
+    return unique
+
+
+@functools.lru_cache(maxsize=None)
+def reference_prefix(agent_key: Optional[str] = None) -> str:
+    """
+    The reference text routed for `agent_key` (all of it for the Researcher
+    or unknown agents). Deterministic per agent, so it stays a cacheable
+    prefix across reports.
+    """
+    if agent_key not in AGENT_TOPICS:
+        return REFERENCE_CONTEXT
+    return render_chunks(route_chunks(label_reference(REFERENCE_CONTEXT), agent_key))
+
+
+class ContextAssembly:
+    """
+    The context of one report: per-agent stable prefixes plus the labelled
+    report material, routed per agent on demand. Thread-safe; slices are
+    recorded for `stats()`.
+    """
+    def __init__(self, pitch_deck_pages: Sequence[str] = (), context_snippets: str = ""):
+        pitch_deck_pages = list(pitch_deck_pages)
+        context_snippets = (context_snippets or "").strip()
+        self._chunks = dedupe_chunks(
+            label_pitch_deck(pitch_deck_pages)
+            + label_snippets(split_paragraphs(context_snippets))
+        )
+
+        # What every call used to receive: everything, concatenated
+        self._source_tokens = (
+            count_tokens("\n".join(pitch_deck_pages)) + count_tokens(context_snippets)
+        )
+        self._baseline_tokens = count_tokens(REFERENCE_CONTEXT) + self._source_tokens
+
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict[str, int]] = {}
+
+    def prefix_for(self, agent_key: Optional[str] = None) -> str:
+        return reference_prefix(agent_key)
+
+    def research_context(self) -> str:
+        """Report-specific material for the Researcher (no routing, budgeted)."""
+        chunks = route_chunks(self._chunks, "research", RESEARCH_CONTEXT_TOKEN_BUDGET)
+        return self._record("research", None, chunks, self._baseline_tokens)
+
+    def section_context(self, section_key: str, research_output: str = "") -> str:
+        """Researcher subsections plus deck pages / snippets routed to `section_key`."""
+        chunks = dedupe_chunks(label_research(research_output) + self._chunks)
+        budget = AGENT_CONTEXT_BUDGETS.get(section_key, SECTION_CONTEXT_TOKEN_BUDGET)
+        routed = route_chunks(chunks, section_key, budget)
+        baseline = self._baseline_tokens + count_tokens(research_output)
+        return self._record(section_key, section_key, routed, baseline)
+
+    def _record(self, key: str, agent_key: Optional[str], chunks: List[ContextChunk], baseline: int) -> str:
+        sliced = render_chunks(chunks)
+        prefix_tokens = count_tokens(self.prefix_for(agent_key))
+        with self._lock:
+            self._calls[key] = {
+                "baseline": baseline,
+                "prefix": prefix_tokens,
+                "sent": prefix_tokens + count_tokens(sliced),
+            }
+        logger.info(
+            "Context for '%s': %s chunk(s) [%s].", key, len(chunks),
+            ", ".join(chunk.label for chunk in chunks)
+        )
+        return sliced
+
+    def stats(self) -> Dict[str, int]:
+        """Prompt-context tokens of this report compared with the old full-context prompts."""
+        with self._lock:
+            calls = list(self._calls.values())
+        baseline = sum(c["baseline"] for c in calls)
+        sent = sum(c["sent"] for c in calls)
+        return {
+            "calls": len(calls),
+            "baseline_tokens": baseline,
+            "sent_tokens": sent,
+            "saved_tokens": baseline - sent,
+            # Per-agent prefixes are identical across reports: provider-cacheable
+            "cacheable_prefix_tokens": sum(c["prefix"] for c in calls),
+        }
+
+
+def assemble_context(request_params: dict) -> ContextAssembly:
+    """
+    Gather the report-specific material (pitch-deck text and any vector
+    retrieval snippets) and wrap it with the static reference prefix.
+    Blocking (Vertex retrieval).
+    """
+    safe_context = {k: request_params.get(k) for k in request_params if k != "sensitive"}
+    logger.info("Starting orchestration with context: %s", safe_context)
+
+    user_query = request_params.get("title", "Investment readiness analysis")
+
+    # Optional: attempt vector-based retrieval if environment variables exist
+    endpoint_resource_name = os.getenv("VERTEX_ENDPOINT_RESOURCE_NAME", "")
+    deployed_index_id = os.getenv("VERTEX_DEPLOYED_INDEX_ID", "")
+
+    if endpoint_resource_name and deployed_index_id:
+        top_matches = retrieve_relevant_chunks(
+            query_text=user_query,
+            endpoint_resource_name=endpoint_resource_name,
+            deployed_index_id=deployed_index_id,
+            top_k=5
+        )
+        context_snippets = build_context_from_matches(top_matches)
+    else:
+        logger.warning(
+            "VERTEX_ENDPOINT_RESOURCE_NAME or VERTEX_DEPLOYED_INDEX_ID is not set. Skipping retrieval."
+        )
+        context_snippets = ""
+
+    # Page-level text when the deck was extracted page by page; otherwise
+    # form feeds (if any) mark the page breaks.
+    pitch_deck_pages = request_params.get("pitch_deck_pages") or (
+        request_params.get("pitch_deck_text", "") or ""
+    ).split("\f")
+
+    return ContextAssembly(
+        pitch_deck_pages=pitch_deck_pages,
+        context_snippets=context_snippets,
+    )
@@ -0,0 +1,254 @@
+# app/api/ai/context_router.py
+"""
+Per-agent relevance routing of context chunks.
+
+Context is cut into labelled chunks, and each chunk is tagged with one or
+more topics:
+
+*   reference text: one chunk per Maturity Model dimension (`maturity:team`,
+    `maturity:financials`, ...) plus the Carta / Founder Ownership extracts;
+*   pitch deck: one chunk per page (`deck:page_3`);
+*   researcher findings: one chunk per `### N)` subsection (`research:7`);
+*   retrieval snippets: one chunk per paragraph (`snippet:2`).
+
+Each section agent subscribes to a set of topics (`AGENT_TOPICS`) and only
+receives the chunks tagged with those topics, plus `general` ones, within
+its own token budget.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from app.api.ai.rate_limiter import count_tokens
+
+GENERAL = "general"
+
+# Keywords (lower-case) used to tag free text such as deck pages and snippets
+TOPIC_KEYWORDS: Dict[str, Sequence[str]] = {
+    "market": (
+        "market", "tam", "sam", "som", "competit", "industry", "trend", "segment", "landscape",
+    ),
+    "financials": (
+        "revenue", "financ", "burn", "runway", "margin", "cash", "unit economics", "cac", "ltv",
+        "profit", "cost", "arr", "mrr",
+    ),
+    "gtm": (
+        "customer", "sales", "marketing", "channel", "acquisition", "pricing", "traction",
+        "retention", "churn", "pipeline", "go-to-market", "gtm",
+    ),
+    "team": (
+        "founder", "team", "ceo", "cto", "hire", "hiring", "advisor", "experience", "board",
+        "leadership",
+    ),
+    "investor": (
+        "investor", "exit", "ipo", "m&a", "funding", "round", "valuation", "dilution", "safe",
+        "series", "raise", "use of funds",
+    ),
+    "product": (
+        "product", "platform", "technology", "feature", "roadmap", "mvp", "prototype", "patent",
+    ),
+    "operations": (
+        "operations", "infrastructure", "compliance", "security", "regulat", "soc 2", "hipaa",
+        "gdpr", "scalab",
+    ),
+}
+
+# Reference-text headings that start a new chunk: (heading line, label, topics)
+REFERENCE_HEADINGS = (
+    ("Team", "maturity:team", ("team",)),
+    ("Market Validation", "maturity:market_validation", ("market", "gtm")),
+    ("Product Development", "maturity:product_development", ("product", "gtm")),
+    ("Marketing", "maturity:marketing", ("gtm", "market")),
+    ("Sales", "maturity:sales", ("gtm", "financials")),
+    ("Customer Success", "maturity:customer_success", ("gtm",)),
+    ("Financials", "maturity:financials", ("financials", "investor")),
+    ("Operations", "maturity:operations", ("operations", "team")),
+    ("Overview", "carta:state_of_startups", ("investor", "financials", "market")),
+    ("Founder Ownership Report 2025 – Overview", "carta:founder_ownership", ("investor", "team")),
+    ("Context for Funding Landscape & Market Analysis", "reference:deck_outline", (GENERAL,)),
+)
+# Text before the first heading: instructions, stages, objective, capital, revenue rows
+REFERENCE_PREAMBLE = ("maturity:stages", (GENERAL,))
+
+# Researcher output subsections (see ResearcherAgent) → topics
+RESEARCH_SUBSECTION_TOPICS: Dict[int, Sequence[str]] = {
+    1: ("market",),                 # Market & Industry Overview
+    2: ("gtm", "financials"),       # Customer Traction & Revenue
+    3: ("financials", "investor"),  # Financial & Growth Indicators
+    4: ("gtm", "market"),           # Go-To-Market & Competitive Position
+    5: ("operations", "product"),   # Regulatory Compliance & Scalability Readiness
+    6: ("gtm",),                    # Customer Success & Retention Trends
+    7: ("team",),                   # Leadership & Team Snapshot
+    8: ("investor",),               # Investor Alignment & Key Risks
+    9: (GENERAL,),                  # Recommended Next Steps
+}
+
+# Topics each section agent receives (GENERAL chunks always go to everyone)
+AGENT_TOPICS: Dict[str, FrozenSet[str]] = {
+    "market_opportunity_competitive_landscape": frozenset({"market", "product"}),
+    "financial_performance_investment_readiness": frozenset({"financials", "investor"}),
+    "go_to_market_strategy_customer_traction": frozenset({"gtm", "market", "product"}),
+    "leadership_team": frozenset({"team", "operations"}),
+    "investor_fit_exit_strategy_funding": frozenset({"investor", "financials", "market"}),
+}
+
+# Chunks longer than this are split on paragraph / line boundaries
+MAX_CHUNK_TOKENS = 400
+
+_RESEARCH_HEADING = re.compile(r"^#{2,4}\s*(\d+)\)", re.MULTILINE)
+
+
+class ContextChunk:
+    """A labelled piece of context and the topics it is relevant to."""
+    def __init__(self, label: str, text: str, topics: Iterable[str]):
+        self.label = label
+        self.text = text
+        self.topics = frozenset(topics) or frozenset({GENERAL})
+        self.tokens = count_tokens(text)
+
+    def __repr__(self):
+        return f"<ContextChunk {self.label} topics={sorted(self.topics)} tokens={self.tokens}>"
+
+
+def split_paragraphs(text: str, max_tokens: int = MAX_CHUNK_TOKENS) -> List[str]:
+    """Blank-line separated paragraphs, with oversized ones cut on line boundaries."""
+    chunks: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            chunks.append(paragraph)
+            continue
+        current: List[str] = []
+        current_tokens = 0
+        for line in paragraph.splitlines():
+            line_tokens = count_tokens(line)
+            if current and current_tokens + line_tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(line)
+            current_tokens += line_tokens
+        if current:
+            chunks.append("\n".join(current))
+    return chunks
+
+
+def classify_topics(text: str) -> FrozenSet[str]:
+    """
+    Topics of free text by keyword hits: every topic with at least half the
+    hits of the strongest one. Text without any hit is GENERAL.
+    """
+    lowered = text.lower()
+    hits = {
+        topic: sum(lowered.count(keyword) for keyword in keywords)
+        for topic, keywords in TOPIC_KEYWORDS.items()
+    }
+    top = max(hits.values(), default=0)
+    if top == 0:
+        return frozenset({GENERAL})
+    return frozenset(topic for topic, count in hits.items() if count and count * 2 >= top)
+
+
+def label_reference(text: str) -> List[ContextChunk]:
+    """Split the static reference text at its dimension / report headings."""
+    headings = {heading: (label, topics) for heading, label, topics in REFERENCE_HEADINGS}
+    chunks: List[ContextChunk] = []
+    label, topics = REFERENCE_PREAMBLE
+    current: List[str] = []
+    for line in text.splitlines():
+        if line.strip() in headings:
+            if "".join(current).strip():
+                chunks.append(ContextChunk(label, "\n".join(current).strip(), topics))
+            label, topics = headings[line.strip()]
+            current = []
+        current.append(line)
+    if "".join(current).strip():
+        chunks.append(ContextChunk(label, "\n".join(current).strip(), topics))
+    return chunks
+
+
+def label_pitch_deck(pages: Sequence[str]) -> List[ContextChunk]:
+    """One chunk per deck page (oversized pages in parts), tagged by keyword topics."""
+    chunks: List[ContextChunk] = []
+    for number, page in enumerate(pages, start=1):
+        page = (page or "").strip()
+        parts = [page] if page and count_tokens(page) <= MAX_CHUNK_TOKENS else split_paragraphs(page)
+        for part_number, part in enumerate(parts, start=1):
+            suffix = f".{part_number}" if len(parts) > 1 else ""
+            chunks.append(ContextChunk(
+                f"deck:page_{number}{suffix}",
+                f"Pitch Deck Page {number}{suffix}:\n{part}",
+                classify_topics(part),
+            ))
+    return chunks
+
+
+def label_research(text: str) -> List[ContextChunk]:
+    """One chunk per researcher `### N)` subsection (the intro is GENERAL)."""
+    if not text or not text.strip():
+        return []
+    matches = list(_RESEARCH_HEADING.finditer(text))
+    if not matches:
+        return [
+            ContextChunk(f"research:part_{i}", part, classify_topics(part))
+            for i, part in enumerate(split_paragraphs(text), start=1)
+        ]
+
+    chunks: List[ContextChunk] = []
+    intro = text[:matches[0].start()].strip()
+    if intro:
+        chunks.append(ContextChunk("research:intro", intro, (GENERAL,)))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        number = int(match.group(1))
+        body = text[match.start():end].strip()
+        topics = RESEARCH_SUBSECTION_TOPICS.get(number) or classify_topics(body)
+        chunks.append(ContextChunk(f"research:{number}", body, topics))
+    return chunks
+
+
+def label_snippets(paragraphs: Sequence[str]) -> List[ContextChunk]:
+    return [
+        ContextChunk(f"snippet:{i}", paragraph, classify_topics(paragraph))
+        for i, paragraph in enumerate(paragraphs, start=1)
+    ]
+
+
+def route_chunks(
+    chunks: Sequence[ContextChunk],
+    agent_key: str,
+    budget: Optional[int] = None,
+) -> List[ContextChunk]:
+    """
+    Chunks relevant to `agent_key`, in their original order. Topic matches
+    are kept before GENERAL chunks when the budget is tight. Unknown agents
+    get everything.
+    """
+    topics = AGENT_TOPICS.get(agent_key)
+    if topics is None:
+        selected = list(range(len(chunks)))
+        priority = {i: 0 for i in selected}
+    else:
+        selected, priority = [], {}
+        for i, chunk in enumerate(chunks):
+            if chunk.topics & topics:
+                selected.append(i)
+                priority[i] = 0
+            elif GENERAL in chunk.topics:
+                selected.append(i)
+                priority[i] = 1
+
+    if budget is not None:
+        kept, used = set(), 0
+        for i in sorted(selected, key=lambda i: (priority[i], i)):
+            if used + chunks[i].tokens > budget:
+                continue
+            kept.add(i)
+            used += chunks[i].tokens
+        selected = sorted(kept)
+    return [chunks[i] for i in selected]
+
+
+def render_chunks(chunks: Iterable[ContextChunk]) -> str:
+    return "\n\n".join(chunk.text for chunk in chunks)
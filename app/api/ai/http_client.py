@@ -0,0 +1,122 @@
+# app/api/ai/http_client.py
+"""
+Process-wide pooled HTTP session for async OpenAI calls.
+
+openai<1.0 opens (and closes) a fresh aiohttp session per `acreate` call unless
+one is supplied through `openai.aiosession`. Sharing a single keep-alive session
+per process lets one uvicorn worker drive many concurrent reports without
+paying a TLS handshake per section.
+
+Both this session and the per-thread `requests` sessions of sync calls
+(`openai.requestssession`, installed on import) pass the x-ratelimit-* headers
+of every response, successful or not, to the matching rate limiter. The
+openai<1.0 response objects do not expose headers.
+"""
+
+import asyncio
+import logging
+import os
+from types import SimpleNamespace
+from typing import Optional
+
+import aiohttp
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.api.ai.rate_limiter import get_rate_limiter_for_url
+
+logger = logging.getLogger(__name__)
+
+# Max simultaneous connections to the provider from this process
+OPENAI_HTTP_POOL_SIZE = int(os.getenv("OPENAI_HTTP_POOL_SIZE", "100"))
+# Seconds an idle keep-alive connection stays open
+OPENAI_HTTP_KEEPALIVE = float(os.getenv("OPENAI_HTTP_KEEPALIVE", "60"))
+# Total timeout for one completion request (long reports can take minutes)
+OPENAI_HTTP_TIMEOUT = float(os.getenv("OPENAI_HTTP_TIMEOUT", "600"))
+
+# Connection retries of the sync sessions (openai's own default)
+OPENAI_HTTP_MAX_RETRIES = 2
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Return the shared session, creating it on first use.
+    Must be called from inside a running event loop; a new session is created
+    if the previous one was closed or belongs to another loop.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=OPENAI_HTTP_POOL_SIZE,
+            keepalive_timeout=OPENAI_HTTP_KEEPALIVE,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=OPENAI_HTTP_TIMEOUT),
+            trace_configs=[_rate_limit_trace_config()],
+        )
+        _session_loop = loop
+        logger.info("Created pooled OpenAI HTTP session (pool size=%s).", OPENAI_HTTP_POOL_SIZE)
+    return _session
+
+
+async def _on_request_end(
+    session: aiohttp.ClientSession, context: SimpleNamespace, params: aiohttp.TraceRequestEndParams
+) -> None:
+    limiter = get_rate_limiter_for_url(str(params.url))
+    if limiter is None:
+        return
+    try:
+        await limiter.update_from_headers_async(params.response.headers)
+    except Exception as e:
+        # Bookkeeping only: never fail the call itself
+        logger.warning("Could not apply rate-limit headers: %s", e)
+
+
+def _rate_limit_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_end.append(_on_request_end)
+    return trace_config
+
+
+def _on_response(response: requests.Response, *args, **kwargs) -> None:
+    limiter = get_rate_limiter_for_url(response.url)
+    if limiter is None:
+        return
+    try:
+        limiter.update_from_headers(response.headers)
+    except Exception as e:
+        logger.warning("Could not apply rate-limit headers: %s", e)
+
+
+def make_requests_session() -> requests.Session:
+    """
+    A `requests` session for sync OpenAI calls whose responses feed the rate
+    limiter. openai<1.0 calls this once per thread (and again when it
+    recycles the thread's session).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=OPENAI_HTTP_MAX_RETRIES)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.hooks["response"].append(_on_response)
+    return session
+
+
+# A callable, not a Session: openai<1.0 then keeps one session per thread as usual
+openai.requestssession = make_requests_session
+
+
+async def close_http_session() -> None:
+    """Close the shared session (call on application shutdown)."""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("Closed pooled OpenAI HTTP session.")
+    _session = None
+    _session_loop = None
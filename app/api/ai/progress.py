@@ -0,0 +1,224 @@
+# app/api/ai/progress.py
+"""
+Live progress of a report generation.
+
+A `ReportProgress` tracks every step (research + sections 1–7) as
+queued → running → done / failed, with streamed partial text and a running
+token count. Snapshots are:
+
+*   kept in memory (registry keyed by request id) for same-process readers such
+    as the SSE endpoint, and
+*   persisted through a caller-supplied `persist(snapshot)` callback (normally
+    `parameters.progress` in the database), throttled to one write per
+    PROGRESS_PERSIST_INTERVAL seconds plus every state transition, so other
+    instances can serve `/status` and `/events` too. Persisted snapshots carry
+    only the last PROGRESS_PERSIST_PARTIAL_CHARS characters of running steps;
+    finished text lives in `report_sections`, not in `parameters`.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_PERSIST_INTERVAL = float(os.getenv("PROGRESS_PERSIST_INTERVAL", "2"))
+# Tail of a running step's streamed text kept in persisted snapshots (0 = none)
+PROGRESS_PERSIST_PARTIAL_CHARS = int(os.getenv("PROGRESS_PERSIST_PARTIAL_CHARS", "500"))
+# Rough size of a finished section; only used to scale progress while streaming.
+EXPECTED_SECTION_TOKENS = int(os.getenv("EXPECTED_SECTION_TOKENS", "1500"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Share of the progress bar owned by agent generation; the rest is PDF/upload.
+GENERATION_SHARE = 90
+
+
+class ReportProgress:
+    """Thread-safe progress record for one report."""
+
+    def __init__(
+        self,
+        request_id: str,
+        step_keys: Iterable[str],
+        persist: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.request_id = str(request_id)
+        self._persist = persist
+        self._lock = threading.Lock()
+        self._stage = "generating"
+        self._steps: Dict[str, Dict[str, Any]] = {
+            key: {"state": QUEUED, "tokens": 0, "parts": []} for key in step_keys
+        }
+        self._version = 0
+        self._last_persist = 0.0
+        self._persist_running = False
+        self._persist_dirty = False
+
+    # ------------------------------------------------------------------ #
+    # Updates
+    # ------------------------------------------------------------------ #
+    def start(self, key: str) -> None:
+        self._update(key, force=True, state=RUNNING, tokens=0, parts=[], started_at=datetime.utcnow())
+
+    def stream(self, key: str, delta: str, tokens: int) -> None:
+        """
+        Append streamed text. `tokens` <= 1 marks the start of a new completion
+        (first chunk, or a cached answer delivered whole), which replaces any
+        text from a previous, failed attempt.
+        """
+        with self._lock:
+            step = self._steps.setdefault(key, {"state": QUEUED, "tokens": 0, "parts": []})
+            if tokens <= 1:
+                step["parts"] = [delta]
+            else:
+                step["parts"].append(delta)
+            step["state"] = RUNNING
+            step["tokens"] = tokens
+            self._version += 1
+        self._maybe_persist(force=False)
+
+    def finish(self, key: str, output: str, ok: bool = True) -> None:
+        state = DONE if ok else FAILED
+        with self._lock:
+            tokens = self._steps.get(key, {}).get("tokens", 0)
+        self._update(key, force=True, state=state, tokens=tokens, parts=[output])
+
+    def set_stage(self, stage: str) -> None:
+        with self._lock:
+            self._stage = stage
+            self._version += 1
+        self._maybe_persist(force=True)
+
+    def _update(self, key: str, force: bool, **fields) -> None:
+        with self._lock:
+            self._steps.setdefault(key, {"state": QUEUED, "tokens": 0, "parts": []}).update(fields)
+            self._version += 1
+        self._maybe_persist(force=force)
+
+    # ------------------------------------------------------------------ #
+    # Reads
+    # ------------------------------------------------------------------ #
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def started_at(self, key: str) -> Optional[datetime]:
+        with self._lock:
+            return self._steps.get(key, {}).get("started_at")
+
+    def percent(self) -> int:
+        with self._lock:
+            return self._percent_locked()
+
+    def _percent_locked(self) -> int:
+        if self._stage == "completed":
+            return 100
+        if not self._steps:
+            return 0
+        total = 0.0
+        for step in self._steps.values():
+            if step["state"] in (DONE, FAILED):
+                total += 1
+            elif step["state"] == RUNNING:
+                total += min(step["tokens"] / EXPECTED_SECTION_TOKENS, 0.9)
+        percent = GENERATION_SHARE * total / len(self._steps)
+        if self._stage == "publishing":
+            percent = GENERATION_SHARE
+        return int(percent)
+
+    def snapshot(self, include_partial: bool = True, partial_tail: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Current state of every step. With `partial_tail`, only running steps
+        carry partial text, cut to its last `partial_tail` characters.
+        """
+        with self._lock:
+            sections = {}
+            for key, step in self._steps.items():
+                entry = {"state": step["state"], "tokens": step["tokens"]}
+                if include_partial:
+                    if partial_tail is None:
+                        entry["partial"] = "".join(step["parts"])
+                    elif partial_tail and step["state"] == RUNNING:
+                        entry["partial"] = "".join(step["parts"])[-partial_tail:]
+                sections[key] = entry
+            return {
+                "stage": self._stage,
+                "progress": self._percent_locked(),
+                "version": self._version,
+                "updated_at": datetime.utcnow().isoformat(),
+                "sections": sections,
+            }
+
+    # ------------------------------------------------------------------ #
+    # Persistence (throttled, never concurrent, never out of order)
+    # ------------------------------------------------------------------ #
+    def _maybe_persist(self, force: bool) -> None:
+        if self._persist is None:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._last_persist < PROGRESS_PERSIST_INTERVAL:
+                return
+            if self._persist_running:
+                self._persist_dirty = True
+                return
+            self._persist_running = True
+            self._last_persist = time.monotonic()
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            # Never block the event loop on a DB write
+            loop.run_in_executor(None, self._persist_loop)
+        else:
+            self._persist_loop()
+
+    def _persist_loop(self) -> None:
+        while True:
+            try:
+                self._persist(self.snapshot(partial_tail=PROGRESS_PERSIST_PARTIAL_CHARS))
+            except Exception as e:
+                logger.warning("Could not persist progress for %s: %s", self.request_id, e)
+            with self._lock:
+                if not self._persist_dirty:
+                    self._persist_running = False
+                    return
+                self._persist_dirty = False
+                self._last_persist = time.monotonic()
+
+
+# --------------------------------------------------------------------------- #
+# In-process registry (for same-instance SSE readers)
+# --------------------------------------------------------------------------- #
+_registry: Dict[str, ReportProgress] = {}
+_registry_lock = threading.Lock()
+
+
+def start_report_progress(
+    request_id: str,
+    step_keys: Iterable[str],
+    persist: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> ReportProgress:
+    progress = ReportProgress(request_id, step_keys, persist=persist)
+    with _registry_lock:
+        _registry[str(request_id)] = progress
+    return progress
+
+
+def get_report_progress(request_id: str) -> Optional[ReportProgress]:
+    with _registry_lock:
+        return _registry.get(str(request_id))
+
+
+def release_report_progress(request_id: str) -> None:
+    with _registry_lock:
+        _registry.pop(str(request_id), None)
@@ -0,0 +1,99 @@
+# app/api/ai/prompt_template.py
+"""
+Prompt templates parsed once, at import.
+
+`PromptTemplate` wraps a `str.format`-style template (doubled braces are
+literal braces, as before). The template is parsed a single time into
+literal and field segments, so each render is a plain join. Missing context
+fails immediately with `MissingContextError`, naming every absent field and
+the template, instead of a bare KeyError halfway through a report.
+"""
+
+from string import Formatter
+from typing import Any, FrozenSet, List, Mapping, Optional, Tuple
+
+_FORMATTER = Formatter()
+
+
+class MissingContextError(ValueError):
+    """The context passed to a template lacks one or more required fields."""
+    def __init__(self, template_name: str, missing):
+        self.template_name = template_name
+        self.missing = sorted(missing)
+        super().__init__(f"Prompt '{template_name}' is missing context field(s): {', '.join(self.missing)}")
+
+
+class PromptTemplate:
+    """
+    A compiled prompt template.
+
+    Attributes:
+        name: Label used in errors and logs (normally the agent class name).
+        required_fields: Top-level context keys the template reads.
+        static_prefix: Literal text before the first placeholder.
+        static_prefix_length: len(static_prefix).
+    """
+    def __init__(self, template: str, name: str = "prompt"):
+        self.template = template
+        self.name = name
+        # (literal, field_name or None, format_spec, conversion)
+        self._segments: List[Tuple[str, Optional[str], str, Optional[str]]] = []
+        required = set()
+        for literal, field_name, format_spec, conversion in _FORMATTER.parse(template):
+            if field_name == "":
+                raise ValueError(f"Prompt '{name}' uses a positional placeholder '{{}}'")
+            if field_name is not None:
+                required.add(_root_field(field_name))
+            self._segments.append((literal, field_name, format_spec or "", conversion))
+        self.required_fields: FrozenSet[str] = frozenset(required)
+
+        first_field = next((i for i, seg in enumerate(self._segments) if seg[1] is not None), None)
+        literals = self._segments if first_field is None else self._segments[:first_field + 1]
+        self.static_prefix = "".join(seg[0] for seg in literals)
+        self.static_prefix_length = len(self.static_prefix)
+
+    @classmethod
+    def coerce(cls, template, name: str = "prompt") -> "PromptTemplate":
+        return template if isinstance(template, cls) else cls(template, name=name)
+
+    def missing_fields(self, available) -> FrozenSet[str]:
+        return self.required_fields.difference(available)
+
+    def validate(self, context: Mapping[str, Any]) -> None:
+        missing = self.missing_fields(context.keys())
+        if missing:
+            raise MissingContextError(self.name, missing)
+
+    def render(self, context: Mapping[str, Any]) -> str:
+        self.validate(context)
+        parts = []
+        for literal, field_name, format_spec, conversion in self._segments:
+            parts.append(literal)
+            if field_name is None:
+                continue
+            if field_name in context:
+                value = context[field_name]
+            else:
+                value, _ = _FORMATTER.get_field(field_name, (), context)
+            if conversion:
+                value = _FORMATTER.convert_field(value, conversion)
+            parts.append(value if (not format_spec and isinstance(value, str)) else format(value, format_spec))
+        return "".join(parts)
+
+    # str.format compatibility for callers that still pass kwargs
+    def format(self, **context) -> str:
+        return self.render(context)
+
+    def __str__(self):
+        return self.template
+
+    def __repr__(self):
+        return f"<PromptTemplate {self.name} fields={sorted(self.required_fields)}>"
+
+
+def _root_field(field_name: str) -> str:
+    """'a.b[0]' -> 'a'"""
+    for i, char in enumerate(field_name):
+        if char in ".[":
+            return field_name[:i]
+    return field_name
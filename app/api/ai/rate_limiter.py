@@ -0,0 +1,415 @@
+# app/api/ai/rate_limiter.py
+"""
+Process-wide (optionally cross-instance) rate limiter for OpenAI calls.
+
+Two token buckets are tracked: requests-per-minute and tokens-per-minute. Each
+call first estimates its prompt + completion tokens and waits until both
+buckets can cover it; the estimate is reconciled with the real `usage` once the
+response arrives. Rate-limit headers returned by the provider (on every
+response, see `app.api.ai.http_client`) shrink the buckets to what the server
+reports, and `Retry-After` pauses everyone.
+
+Backends (RATE_LIMIT_BACKEND):
+  - memory   : per-process (default)
+  - file     : JSON state file guarded by flock, shared by processes on one host
+  - postgres : `rate_limit_buckets` row locked with SELECT ... FOR UPDATE, shared
+               by every Cloud Run instance using the same DATABASE_URL
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+# Expected completion size added to each estimate (TPM counts output tokens too)
+OPENAI_EXPECTED_COMPLETION_TOKENS = int(os.getenv("OPENAI_EXPECTED_COMPLETION_TOKENS", "2000"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+# Embeddings have their own provider limits; a separate bucket keeps large
+# embedding batches from starving chat completions (and vice versa)
+EMBED_RPM = int(os.getenv("EMBED_RPM", "3000"))
+EMBED_TPM = int(os.getenv("EMBED_TPM", "1000000"))
+RATE_LIMIT_FILE = os.getenv("RATE_LIMIT_FILE", "/tmp/openai_rate_limit.json")
+RATE_LIMIT_KEY = os.getenv("RATE_LIMIT_KEY", "openai")
+
+# Longest single sleep before re-checking the bucket (keeps waiters responsive)
+MAX_WAIT_SLICE = 5.0
+
+
+# --------------------------------------------------------------------------- #
+# Token estimation
+# --------------------------------------------------------------------------- #
+def count_tokens(text: str) -> int:
+    """Token count of `text`: tiktoken when installed, else ~4 characters per token."""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    return len(text) // 4
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    `text` cut to at most `max_tokens` tokens: exactly with tiktoken, else at a
+    conservative 3 characters per token.
+    """
+    if tiktoken is not None:
+        encoding = tiktoken.get_encoding("cl100k_base")
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 3]
+
+
+def estimate_tokens(messages: List[Dict[str, str]], completion_tokens: Optional[int] = None) -> int:
+    """
+    Estimate the tokens a chat completion will consume against the TPM budget.
+    Uses tiktoken when installed, else ~4 characters per token.
+    """
+    prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+    prompt_tokens += 4 * len(messages)  # per-message framing overhead
+    if completion_tokens is None:
+        completion_tokens = OPENAI_EXPECTED_COMPLETION_TOKENS
+    return prompt_tokens + completion_tokens
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def parse_reset_duration(value: str) -> Optional[float]:
+    """Parse header durations such as '1s', '6m0s' or '20ms' into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in _DURATION_PART.findall(value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+# --------------------------------------------------------------------------- #
+# Bucket arithmetic (pure functions over a state dict)
+# --------------------------------------------------------------------------- #
+def _new_state(rpm: int, tpm: int, now: float) -> Dict[str, float]:
+    return {
+        "rpm": rpm,
+        "tpm": tpm,
+        "requests": float(rpm),
+        "tokens": float(tpm),
+        "updated": now,
+        "paused_until": 0.0,
+    }
+
+
+def _refill(state: Dict[str, float], now: float) -> None:
+    elapsed = max(0.0, now - state["updated"])
+    state["requests"] = min(state["rpm"], state["requests"] + elapsed * state["rpm"] / 60.0)
+    state["tokens"] = min(state["tpm"], state["tokens"] + elapsed * state["tpm"] / 60.0)
+    state["updated"] = now
+
+
+def _take(state: Dict[str, float], tokens: int, now: float) -> float:
+    """Consume budget if available; otherwise return the seconds to wait."""
+    _refill(state, now)
+    if state["paused_until"] > now:
+        return state["paused_until"] - now
+    # A single call larger than the whole TPM budget can never fit; let it
+    # through once the bucket is full rather than deadlocking.
+    tokens = min(tokens, state["tpm"])
+    if state["requests"] >= 1 and state["tokens"] >= tokens:
+        state["requests"] -= 1
+        state["tokens"] -= tokens
+        return 0.0
+    wait_requests = (1 - state["requests"]) * 60.0 / state["rpm"] if state["requests"] < 1 else 0.0
+    wait_tokens = (tokens - state["tokens"]) * 60.0 / state["tpm"] if state["tokens"] < tokens else 0.0
+    return max(wait_requests, wait_tokens)
+
+
+# --------------------------------------------------------------------------- #
+# Backends: each runs `fn(state) -> result` atomically and persists the state
+# --------------------------------------------------------------------------- #
+class MemoryBackend:
+    """Bucket state held in this process."""
+    is_local = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Optional[Dict[str, float]] = None
+
+    def transact(self, init: Callable[[], Dict], fn: Callable[[Dict], Any]) -> Any:
+        with self._lock:
+            if self._state is None:
+                self._state = init()
+            return fn(self._state)
+
+
+class FileBackend:
+    """Bucket state in a JSON file, serialised with an exclusive flock."""
+    is_local = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def transact(self, init: Callable[[], Dict], fn: Callable[[Dict], Any]) -> Any:
+        with self._lock, open(self.path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw.strip() else init()
+                except ValueError:
+                    logger.warning("Corrupt rate-limit state in %s; resetting.", self.path)
+                    state = init()
+                result = fn(state)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class PostgresBackend:
+    """Bucket state in `rate_limit_buckets`, row-locked for the transaction."""
+    is_local = False
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def transact(self, init: Callable[[], Dict], fn: Callable[[Dict], Any]) -> Any:
+        # Imported lazily: app.database.database requires DATABASE_URL at import.
+        from sqlalchemy.dialects.postgresql import insert
+        from app.database.database import db_session
+        from app.database.models import RateLimitBucket
+
+        with db_session() as db:
+            db.execute(
+                insert(RateLimitBucket)
+                .values(key=self.key, state=init())
+                .on_conflict_do_nothing(index_elements=["key"])
+            )
+            row = (
+                db.query(RateLimitBucket)
+                .filter(RateLimitBucket.key == self.key)
+                .with_for_update()
+                .one()
+            )
+            state = dict(row.state)
+            result = fn(state)
+            row.state = state
+            return result
+
+
+def _make_backend(name: str, suffix: str = ""):
+    """Backend for one limiter; `suffix` separates its state from the default limiter's."""
+    if name == "file":
+        root, ext = os.path.splitext(RATE_LIMIT_FILE)
+        return FileBackend(f"{root}{suffix}{ext}")
+    if name == "postgres":
+        return PostgresBackend(f"{RATE_LIMIT_KEY}{suffix}")
+    if name != "memory":
+        logger.warning("Unknown RATE_LIMIT_BACKEND '%s'; falling back to memory.", name)
+    return MemoryBackend()
+
+
+# --------------------------------------------------------------------------- #
+# Limiter
+# --------------------------------------------------------------------------- #
+class RateLimiter:
+    """
+    Requests-per-minute + tokens-per-minute limiter shared by all agents.
+
+    Usage::
+
+        limiter.acquire(estimated_tokens)          # blocks until budget exists
+        ... call the API ...
+        limiter.reconcile(estimated_tokens, usage["total_tokens"])
+    """
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, backend=None):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.backend = backend or MemoryBackend()
+
+    def _init_state(self) -> Dict[str, float]:
+        return _new_state(self.rpm, self.tpm, time.time())
+
+    def _try_acquire(self, tokens: int) -> float:
+        return self.backend.transact(self._init_state, lambda s: _take(s, tokens, time.time()))
+
+    def acquire(self, tokens: int) -> float:
+        """Block until one request and `tokens` tokens are available. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            wait_seconds = self._try_acquire(tokens)
+            if wait_seconds <= 0:
+                if waited:
+                    logger.info("Rate limiter delayed call by %.1fs (%s tokens).", waited, tokens)
+                return waited
+            wait_seconds = min(wait_seconds, MAX_WAIT_SLICE)
+            time.sleep(wait_seconds)
+            waited += wait_seconds
+
+    async def acquire_async(self, tokens: int) -> float:
+        """Async counterpart of `acquire`; shared backends are queried off the event loop."""
+        waited = 0.0
+        while True:
+            if self.backend.is_local:
+                wait_seconds = self._try_acquire(tokens)
+            else:
+                wait_seconds = await asyncio.to_thread(self._try_acquire, tokens)
+            if wait_seconds <= 0:
+                if waited:
+                    logger.info("Rate limiter delayed call by %.1fs (%s tokens).", waited, tokens)
+                return waited
+            wait_seconds = min(wait_seconds, MAX_WAIT_SLICE)
+            await asyncio.sleep(wait_seconds)
+            waited += wait_seconds
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the real usage of a call is known."""
+        if actual_tokens is None:
+            return
+        delta = estimated_tokens - actual_tokens
+
+        def _apply(state):
+            state["tokens"] = min(state["tpm"], state["tokens"] + delta)
+
+        self.backend.transact(self._init_state, _apply)
+
+    async def reconcile_async(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """`reconcile` that keeps shared backends (flock / row lock) off the event loop."""
+        if self.backend.is_local:
+            self.reconcile(estimated_tokens, actual_tokens)
+        else:
+            await asyncio.to_thread(self.reconcile, estimated_tokens, actual_tokens)
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]) -> None:
+        """
+        Adjust the buckets from provider headers (x-ratelimit-* / retry-after):
+        limits become the new capacities, remaining values cap the current
+        levels, and Retry-After pauses all callers sharing this limiter.
+        """
+        if not headers:
+            return
+        lowered = {str(k).lower(): v for k, v in dict(headers).items()}
+
+        def _int(name: str) -> Optional[int]:
+            try:
+                return int(lowered[name])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+        limit_requests = _int("x-ratelimit-limit-requests")
+        limit_tokens = _int("x-ratelimit-limit-tokens")
+        remaining_requests = _int("x-ratelimit-remaining-requests")
+        remaining_tokens = _int("x-ratelimit-remaining-tokens")
+        retry_after = parse_reset_duration(lowered.get("retry-after", ""))
+        if retry_after is None and remaining_requests == 0:
+            retry_after = parse_reset_duration(lowered.get("x-ratelimit-reset-requests", ""))
+        if retry_after is None and remaining_tokens == 0:
+            retry_after = parse_reset_duration(lowered.get("x-ratelimit-reset-tokens", ""))
+
+        def _apply(state):
+            now = time.time()
+            _refill(state, now)
+            if limit_requests:
+                state["rpm"] = limit_requests
+            if limit_tokens:
+                state["tpm"] = limit_tokens
+            if remaining_requests is not None:
+                state["requests"] = min(state["requests"], remaining_requests)
+            if remaining_tokens is not None:
+                state["tokens"] = min(state["tokens"], remaining_tokens)
+            if retry_after:
+                state["paused_until"] = max(state["paused_until"], now + retry_after)
+
+        self.backend.transact(self._init_state, _apply)
+        if retry_after:
+            logger.warning("Provider rate limit hit; pausing OpenAI calls for %.1fs.", retry_after)
+
+    async def update_from_headers_async(self, headers: Optional[Mapping[str, str]]) -> None:
+        """`update_from_headers` that keeps shared backends off the event loop."""
+        if self.backend.is_local:
+            self.update_from_headers(headers)
+        else:
+            await asyncio.to_thread(self.update_from_headers, headers)
+
+    def snapshot(self) -> Tuple[float, float]:
+        """Current (requests, tokens) levels, for logging/metrics."""
+        def _read(state):
+            _refill(state, time.time())
+            return state["requests"], state["tokens"]
+
+        return self.backend.transact(self._init_state, _read)
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide limiter configured from the environment."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                OPENAI_RPM_LIMIT,
+                OPENAI_TPM_LIMIT,
+                backend=_make_backend(RATE_LIMIT_BACKEND),
+            )
+            logger.info(
+                "OpenAI rate limiter: %s RPM / %s TPM (backend=%s).",
+                OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, RATE_LIMIT_BACKEND,
+            )
+        return _limiter
+
+
+_embedding_limiter: Optional[RateLimiter] = None
+
+
+def get_embedding_rate_limiter() -> RateLimiter:
+    """Process-wide limiter for embedding requests (EMBED_RPM / EMBED_TPM), separate from chat."""
+    global _embedding_limiter
+    with _limiter_lock:
+        if _embedding_limiter is None:
+            _embedding_limiter = RateLimiter(
+                EMBED_RPM,
+                EMBED_TPM,
+                backend=_make_backend(RATE_LIMIT_BACKEND, suffix="_embeddings"),
+            )
+            logger.info(
+                "Embedding rate limiter: %s RPM / %s TPM (backend=%s).",
+                EMBED_RPM, EMBED_TPM, RATE_LIMIT_BACKEND,
+            )
+        return _embedding_limiter
+
+
+def get_rate_limiter_for_url(url: str) -> Optional[RateLimiter]:
+    """The limiter an OpenAI endpoint draws on (chat or embeddings), or None for any other URL."""
+    path = urlparse(str(url)).path.rstrip("/")
+    if path.endswith("/embeddings"):
+        return get_embedding_rate_limiter()
+    if path.endswith("/completions"):
+        return get_rate_limiter()
+    return None
@@ -0,0 +1,83 @@
+# app/api/ai/response_cache.py
+"""
+Persistent cache of agent completions.
+
+Keys are sha256(model, system prompt, rendered user prompt), so re-running a
+report whose prompts did not change (e.g. after a PDF/upload failure) costs no
+tokens. Configure with:
+
+  AGENT_CACHE_BACKEND      none (default) | disk | postgres
+  AGENT_CACHE_DIR          directory for the disk backend
+  AGENT_CACHE_TTL_SECONDS  entry lifetime (default 7 days, 0 = never expire)
+  AGENT_CACHE_MAX_ENTRIES  LRU bound on the number of cached completions
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from app.storage.cache import content_hash, make_cache
+
+logger = logging.getLogger(__name__)
+
+AGENT_CACHE_BACKEND = os.getenv("AGENT_CACHE_BACKEND", "none")
+AGENT_CACHE_DIR = os.getenv("AGENT_CACHE_DIR", "")
+AGENT_CACHE_TTL_SECONDS = int(os.getenv("AGENT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+AGENT_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "5000"))
+
+CACHE_NAMESPACE = "agent_responses"
+
+_cache = None
+_cache_initialised = False
+_cache_lock = threading.Lock()
+
+
+def response_cache_key(model: str, system_prompt: str, prompt: str) -> str:
+    return content_hash(model, system_prompt, prompt)
+
+
+def get_response_cache():
+    """Return the configured cache, or None when caching is disabled."""
+    global _cache, _cache_initialised
+    with _cache_lock:
+        if not _cache_initialised:
+            _cache = make_cache(
+                AGENT_CACHE_BACKEND,
+                CACHE_NAMESPACE,
+                directory=AGENT_CACHE_DIR or None,
+                ttl_seconds=AGENT_CACHE_TTL_SECONDS or None,
+                max_entries=AGENT_CACHE_MAX_ENTRIES,
+            )
+            _cache_initialised = True
+            if _cache is not None:
+                logger.info("Agent response cache enabled (backend=%s).", AGENT_CACHE_BACKEND)
+        return _cache
+
+
+def get_cached_response(model: str, system_prompt: str, prompt: str) -> Optional[str]:
+    cache = get_response_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(response_cache_key(model, system_prompt, prompt))
+    except Exception as e:
+        # A broken cache must never fail report generation
+        logger.warning("Agent cache lookup failed: %s", e)
+        return None
+
+
+def store_response(model: str, system_prompt: str, prompt: str, content: str) -> None:
+    cache = get_response_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(response_cache_key(model, system_prompt, prompt), content)
+    except Exception as e:
+        logger.warning("Agent cache write failed: %s", e)
+
+
+def response_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of the agent cache (empty when disabled)."""
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else {}
@@ -0,0 +1,167 @@
+# app/api/ai/scheduler.py
+"""
+Dependency-graph scheduler for report agents.
+
+Each agent invocation is modelled as an `AgentNode` that declares which other
+nodes it reads from. `run_agent_graph` starts every node whose inputs are ready,
+runs independent nodes concurrently (bounded by `max_concurrency`), and returns
+a dict of {node_key: output}. Wall-clock time is therefore roughly the length of
+the critical path (Researcher → sections 2–6 → Recommendations → Summary)
+instead of the sum of all calls.
+
+`run_agent_graph_async` is the asyncio counterpart for coroutine nodes.
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on simultaneous agent calls for one report.
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("REPORT_MAX_CONCURRENCY", "5"))
+
+
+class AgentNode:
+    """
+    A single unit of work in the report graph.
+
+    Args:
+        key: Unique name of the node (also the key of its output).
+        run: Callable receiving {dependency_key: output} and returning the node output.
+        depends_on: Keys of the nodes whose outputs this node needs.
+    """
+    def __init__(
+        self,
+        key: str,
+        run: Callable[[Dict[str, Any]], Any],
+        depends_on: Iterable[str] = (),
+    ):
+        self.key = key
+        self.run = run
+        self.depends_on = tuple(depends_on)
+
+    def __repr__(self):
+        return f"<AgentNode key={self.key} depends_on={self.depends_on}>"
+
+
+def topological_levels(nodes: List[AgentNode]) -> List[List[AgentNode]]:
+    """
+    Group nodes into levels where every node only depends on earlier levels.
+    Raises ValueError for duplicate keys, unknown dependencies or cycles.
+    """
+    by_key: Dict[str, AgentNode] = {}
+    for node in nodes:
+        if node.key in by_key:
+            raise ValueError(f"Duplicate agent node key: {node.key}")
+        by_key[node.key] = node
+
+    for node in nodes:
+        missing = [dep for dep in node.depends_on if dep not in by_key]
+        if missing:
+            raise ValueError(f"Node '{node.key}' depends on unknown node(s): {missing}")
+
+    levels: List[List[AgentNode]] = []
+    placed: set = set()
+    remaining = list(nodes)
+    while remaining:
+        level = [n for n in remaining if all(dep in placed for dep in n.depends_on)]
+        if not level:
+            raise ValueError(
+                f"Cycle detected in agent graph: {[n.key for n in remaining]}"
+            )
+        levels.append(level)
+        placed.update(n.key for n in level)
+        remaining = [n for n in remaining if n.key not in placed]
+    return levels
+
+
+def run_agent_graph(
+    nodes: List[AgentNode],
+    max_concurrency: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Execute the graph, running every ready node as soon as its inputs exist.
+
+    A node that raises aborts the whole run (pending nodes are cancelled and the
+    exception is re-raised); nodes that want softer failure semantics should
+    catch their own errors and return a placeholder.
+    """
+    topological_levels(nodes)  # validation only
+    max_workers = max(1, max_concurrency or DEFAULT_MAX_CONCURRENCY)
+
+    results: Dict[str, Any] = {}
+    pending = {node.key: node for node in nodes}
+    running = {}
+
+    def _ready(node: AgentNode) -> bool:
+        return all(dep in results for dep in node.depends_on)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent") as pool:
+        while pending or running:
+            for key in [k for k, n in pending.items() if _ready(n)]:
+                node = pending.pop(key)
+                inputs = {dep: results[dep] for dep in node.depends_on}
+                logger.info("Starting agent node '%s'.", key)
+                running[pool.submit(node.run, inputs)] = key
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                try:
+                    results[key] = future.result()
+                except Exception:
+                    logger.error("Agent node '%s' failed; aborting graph.", key, exc_info=True)
+                    for other in running:
+                        other.cancel()
+                    raise
+                logger.info("Agent node '%s' finished.", key)
+
+    return results
+
+
+async def run_agent_graph_async(
+    nodes: List[AgentNode],
+    max_concurrency: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Async counterpart of `run_agent_graph`: every `node.run` must be a coroutine
+    function. Nodes are awaited as tasks on the current event loop, so no worker
+    threads are held while agents wait on the provider.
+    """
+    topological_levels(nodes)  # validation only
+    max_workers = max(1, max_concurrency or DEFAULT_MAX_CONCURRENCY)
+
+    results: Dict[str, Any] = {}
+    pending = {node.key: node for node in nodes}
+    running = {}
+
+    def _ready(node: AgentNode) -> bool:
+        return all(dep in results for dep in node.depends_on)
+
+    try:
+        while pending or running:
+            for key in [k for k, n in pending.items() if _ready(n)]:
+                if len(running) >= max_workers:
+                    break
+                node = pending.pop(key)
+                inputs = {dep: results[dep] for dep in node.depends_on}
+                logger.info("Starting agent node '%s'.", key)
+                running[asyncio.ensure_future(node.run(inputs))] = key
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                key = running.pop(task)
+                try:
+                    results[key] = task.result()
+                except Exception:
+                    logger.error("Agent node '%s' failed; aborting graph.", key, exc_info=True)
+                    raise
+                logger.info("Agent node '%s' finished.", key)
+    finally:
+        for task in running:
+            task.cancel()
+
+    return results
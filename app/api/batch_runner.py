@@ -0,0 +1,121 @@
+# app/api/batch_runner.py
+"""
+Overnight runner for reports queued with `POST /reports/{id}/generate?mode=batch`.
+
+    python -m app.api.batch_runner [--limit 100]
+
+Picks up pending requests whose `parameters.generation_mode` is "batch",
+generates all of them through the Batch API (see `app.api.ai.batch`), then
+builds, uploads and emails each PDF exactly like the report worker.
+"""
+
+import argparse
+import logging
+from typing import Dict
+
+from app.api.ai.batch import generate_reports_batch
+from app.database.crud import (
+    get_analysis_request_by_id,
+    get_pending_batch_requests,
+    get_section_checkpoints,
+    save_generated_sections,
+    touch_analysis_requests,
+    transition_analysis_request_status,
+    update_analysis_request_status,
+)
+from app.database.database import db_session
+from app.worker.pipeline import (
+    build_generation_params,
+    checkpoint_step,
+    fetch_pitch_deck_pages,
+    publish_report,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def run_batch(limit: int = 100) -> int:
+    """
+    Generate and publish up to `limit` queued reports. Returns how many completed.
+
+    No DB session is held while decks are fetched or while a wave waits on the
+    provider: the claim, the checkpoint reads and each publish use their own
+    short sessions, and every poll bumps `updated_at` on the claimed requests
+    so the reaper does not take them back.
+    """
+    with db_session() as db:
+        queued = get_pending_batch_requests(db, limit)
+        if not queued:
+            logger.info("No reports queued for batch generation.")
+            return 0
+
+        reports: Dict[str, dict] = {}
+        for req in queued:
+            request_id = str(req.id)
+            # Skip it if an interactive trigger claimed it since the query
+            if transition_analysis_request_status(db, request_id, ("pending",), "processing"):
+                reports[request_id] = build_generation_params(req)
+
+    if not reports:
+        return 0
+
+    def heartbeat() -> None:
+        with db_session() as db:
+            touch_analysis_requests(db, list(reports))
+
+    for request_id, params in reports.items():
+        if params["pitch_deck_url"]:
+            try:
+                pages = fetch_pitch_deck_pages(params["pitch_deck_url"])
+                params["pitch_deck_pages"] = pages
+                params["pitch_deck_text"] = "\n".join(page for page in pages if page)
+            except Exception as e:
+                logger.warning("Could not fetch/parse pitch deck PDF for %s: %s", request_id, e)
+        heartbeat()
+
+    with db_session() as db:
+        checkpoints = {request_id: get_section_checkpoints(db, request_id) for request_id in reports}
+
+    try:
+        sections_by_report = generate_reports_batch(
+            reports,
+            checkpoints=checkpoints,
+            on_step_complete=checkpoint_step,
+            on_poll=heartbeat,
+        )
+    except Exception as exc:
+        # Sections that did finish are checkpointed; a re-run resumes from them
+        logger.error("Batch generation failed: %s", exc, exc_info=True)
+        with db_session() as db:
+            for request_id in reports:
+                update_analysis_request_status(db, request_id, "failed")
+        return 0
+
+    with db_session() as db:
+        for request_id in set(reports) - set(sections_by_report):
+            update_analysis_request_status(db, request_id, "failed")
+
+    completed = 0
+    for request_id, ai_sections in sections_by_report.items():
+        try:
+            with db_session() as db:
+                req = get_analysis_request_by_id(db, request_id)
+                save_generated_sections(db, request_id, ai_sections)
+                publish_report(db, req, request_id, reports[request_id]["title"], ai_sections)
+            completed += 1
+        except Exception as exc:
+            logger.error("Publishing batch report %s failed: %s", request_id, exc, exc_info=True)
+            with db_session() as db:
+                update_analysis_request_status(db, request_id, "failed")
+        heartbeat()
+
+    logger.info("Batch run finished: %s/%s reports completed.", completed, len(reports))
+    return completed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    parser = argparse.ArgumentParser(description="Generate queued reports through the Batch API.")
+    parser.add_argument("--limit", type=int, default=100, help="Max reports per run")
+    args = parser.parse_args()
+    run_batch(limit=args.limit)
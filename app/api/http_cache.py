@@ -0,0 +1,93 @@
+# app/api/http_cache.py
+"""
+Conditional GET and compression helpers for the report read endpoints.
+
+*   Strong ETags are hashed from version data the caller can read cheaply
+    (`updated_at`, section timestamps) so a 304 is answered before the row
+    or its sections are loaded.
+*   JSON bodies above COMPRESS_MIN_BYTES are compressed with brotli (when the
+    `brotli` package is installed and the client accepts it) or gzip. Each
+    encoding gets its own ETag (`"<hash>-br"`), as strong validators must
+    differ per representation; `If-None-Match` matches any of them.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:     # optional
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# Clients must revalidate every time (cheap with a 304), never serve stale
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if the `If-None-Match` header lists `etag` (in any encoding) or is `*`."""
+    if not if_none_match:
+        return False
+    base = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate.split("-", 1)[0] == base:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"},
+    )
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {
+        token.split(";")[0].strip().lower()
+        for token in accept_encoding.split(",")
+        if token.strip() and not token.strip().endswith(";q=0")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def cached_json_response(request: Request, payload: Any, etag: str) -> Response:
+    """JSON response carrying `etag`, compressed when large and accepted."""
+    body = json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+    encoding = None
+    if len(body) >= COMPRESS_MIN_BYTES:
+        encoding = _choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding == "br":
+        body = brotli.compress(body, quality=5)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+    if encoding:
+        base = etag.strip('"')
+        headers["Content-Encoding"] = encoding
+        headers["ETag"] = f'"{base}-{encoding}"'
+
+    return Response(content=body, media_type="application/json", headers=headers)
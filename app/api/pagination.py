@@ -0,0 +1,32 @@
+# app/api/pagination.py
+"""
+Opaque keyset cursors over (created_at, id), newest first.
+
+A cursor is the position of the last item of a page; the next page holds the
+rows strictly after it in (created_at DESC, id DESC) order, which the
+`(user_id, created_at, id)` index serves directly (no OFFSET scans).
+"""
+
+import base64
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+Cursor = Tuple[datetime, uuid.UUID]
+
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    """Inverse of `encode_cursor`; raises ValueError for a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-import uuid
-import time                            # NEW: for deal_id timestamp
-from datetime import datetime
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional, Tuple
 
-import requests
-from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import UUID4
 from sqlalchemy.orm import Session
 
@@ -15,24 +15,38 @@ from sqlalchemy.orm import Session
 # REMOVED: AnalysisRequestIn import (no longer used, as front-end inserts directly)
 from app.api.schemas import (
     AnalysisRequestOut,
+    BulkStatusItem,
+    BulkStatusRequest,
+    BulkStatusResponse,
     ReportContentResponse,
+    ReportListItem,
+    ReportListResponse,
+    ReportJobAccepted,
     ReportSection,
     ReportStatusResponse,
+    SectionProgress,
+    SectionSummary,
 )
 from app.database.crud import (
+    JOB_MAX_ATTEMPTS,
     get_analysis_request_by_id,
-    update_analysis_request_status,
-    save_generated_sections,    
     get_generated_sections,
+    get_report_status_row,
+    get_report_statuses,
+    list_user_requests,
+    get_request_version,
+    get_sections_version,
+    queue_request_for_batch,
+    start_report_job,
+    get_latest_report_job,
 )
-from app.database.database import db_session
-from app.api.ai.orchestrator import generate_report
-from app.storage.pdfgenerator import generate_pdf
-from app.storage.gcs import finalize_report_with_pdf
-from app.notifications.supabase_notifier import supabase    # NEW: Supabase client for DB inserts
-from app.matching_engine.pdf_to_openai_jsonl import (          # unchanged
-    extract_text_with_ocr,
-)
+from app.database import async_crud
+from app.database.database import ASYNC_DB_ENABLED, async_db_session, db_session
+from app.api.ai.orchestrator import RESEARCH_NODE
+from app.api.ai.progress import get_report_progress
+from app.api.http_cache import cached_json_response, etag_matches, make_etag, not_modified
+from app.api.pagination import decode_cursor, encode_cursor
+from app.worker.pipeline import SECTION_TITLES
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -51,192 +65,336 @@ def get_db():
 # ──────────────────────────────────────────────────────────────────────────────
 #  2)  GENERATE FULL REPORT  (status: pending -> processing -> completed/failed)
 # ──────────────────────────────────────────────────────────────────────────────
-@router.post("/reports/{request_id}/generate", response_model=AnalysisRequestOut)
+@router.post(
+    "/reports/{request_id}/generate",
+    response_model=ReportJobAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 def generate_full_report(
+    request: Request,
     request_id: UUID4 = Path(..., description="UUID of the analysis request to process"),
+    mode: str = Query(
+        "interactive",
+        pattern="^(interactive|batch)$",
+        description="'batch' queues the report for the overnight Batch API run (emailed when ready)",
+    ),
     db: Session = Depends(get_db),
-) -> AnalysisRequestOut:
+):
+    # Generation takes minutes, so it no longer runs inside the request: the
+    # report is queued in `report_jobs` and a worker (python -m app.worker.main)
+    # claims and runs it. Follow it on /status or /events.
+    #
+    # Idempotent: only the call that moves the request from 'pending' (or
+    # 'failed') to 'processing' enqueues a job. Repeated or concurrent calls
+    # get that same job back and follow its progress instead of paying for a
+    # second run.
+
     # Lookup the existing analysis request (which should have status 'pending')
     req = get_analysis_request_by_id(db, request_id)
     if not req:
         raise HTTPException(status_code=404, detail="Analysis request not found")
 
-    try:
-        # 1. Update status to 'processing'
-        update_analysis_request_status(db, request_id, "processing")  # triggers real-time update
-
-        # 2. Prepare parameters for AI generation (merge form inputs and defaults)
-        params: Dict[str, Any] = (req.parameters or {}).copy()
-        # Extract founder company from additional_info (prefix "Founder Company: ")
-        # founder_co = ""
-        # if req.additional_info:
-        #     founder_co = req.additional_info.split("\n")[0].replace("Founder Company:", "").strip()
-        # founder_co = founder_co or "Unknown Company"
-
-        # Build the report title dynamically to include founder name & company:contentReference[oaicite:1]{index=1}
-        title_str = f"Founder Due Diligence Report for "
-        title_str += f"{req.company_name or 'Startup'}"
-        params.update({
-            "title": title_str,
-            "requestor_name": req.requestor_name,
-            "company": "DealIntel.VC",
-            "founder_company": req.company_name,
-            "founder_name": req.founder_name or "",
-            "industry": req.industry or "",
-            "funding_stage": req.funding_stage or "",
-            "company_type": req.company_type or "",
-            "pitch_deck_url": req.pitch_deck_url or "",
-            "email": req.email,
-        })
-
-        # If a pitch deck URL is provided, fetch and OCR its text to include in prompts
-        if params["pitch_deck_url"]:
-            try:
-                pdf_data = requests.get(params["pitch_deck_url"], timeout=30).content
-                params["pitch_deck_text"] = extract_text_with_ocr(pdf_data)
-            except Exception as e:
-                logger.warning("Could not fetch/parse pitch deck PDF: %s", e)
-
-        # 3. Generate report sections using AI orchestrator
-        ai_sections: Dict[str, str] = generate_report(params)
-
-        # 4. Save generated sections into the request record (parameters.generated_sections)
-        save_generated_sections(db, request_id, ai_sections)
-
-        # 5. Build PDF from the generated sections
-        section_map = {
-            "executive_summary_investment_rationale": "Section 1: Executive Summary & Investment Rationale",
-            "market_opportunity_competitive_landscape": "Section 2: Market Opportunity & Competitive Landscape",
-            "financial_performance_investment_readiness": "Section 3: Financial Performance & Investment Readiness",
-            "go_to_market_strategy_customer_traction": "Section 4: Go-To-Market (GTM) Strategy & Customer Traction",
-            "leadership_team": "Section 5: Leadership & Team",
-            "investor_fit_exit_strategy_funding": "Section 6: Investor Fit, Exit Strategy & Funding Narrative",
-            "final_recommendations_next_steps": "Section 7: Final Recommendations & Next Steps",
-        }
-        sections_for_pdf = [
-            {"id": f"sec_{i}", "title": section_map.get(key, key), "content": body}
-            for i, (key, body) in enumerate(ai_sections.items(), start=1)
-        ]
-        pdf_bytes = generate_pdf(
-            report_id=req.id,
-            report_title=title_str,
-            tier2_sections=sections_for_pdf,
-            founder_name=req.founder_name or "",
-            founder_company=req.company_name or "",
-            founder_type=req.company_type or "",
-            output_path=None,
-        )
+    if mode == "batch":
+        # Back to / stays 'pending'; app.api.batch_runner picks it up, and the
+        # user is emailed the PDF like for interactive reports. Same guard as
+        # the interactive path: only a 'pending' or 'failed' request qualifies.
+        if not queue_request_for_batch(db, request_id):
+            db.refresh(req)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Report is already '{req.status}'",
+            )
+        job_id, job_status = None, "batch"
+    else:
+        # Concurrent triggers are settled by the compare-and-set in
+        # start_report_job: the losers get the winner's job id
+        job_id, job_status = _trigger_generation(db, request_id)
+    return ReportJobAccepted(
+        report_id=request_id,
+        job_id=job_id,
+        status=job_status,
+        status_url=str(request.url_for("report_status", request_id=str(request_id))),
+        events_url=str(request.url_for("report_events", request_id=str(request_id))),
+    )
+
 
-        # 6. Upload PDF to storage and send notification email (returns public URL info)
-        supabase_info = finalize_report_with_pdf(
-            report_id=req.id,
-            user_id=req.user_id,
-            final_report_sections=sections_for_pdf,
-            pdf_data=pdf_bytes,
-            expiration_seconds=86_400,
-            upload_to_supabase=True,
-            user_email=req.email,
-            requestor_name=req.requestor_name,
+def _trigger_generation(db: Session, request_id) -> Tuple[Any, str]:
+    """(job id, job status) of a newly started job, or of the one already started."""
+    job = start_report_job(db, request_id, max_attempts=JOB_MAX_ATTEMPTS)
+    if job is not None:
+        return job.id, job.status
+
+    job = get_latest_report_job(db, request_id)
+    if job is None:
+        # Claimed outside the job queue (e.g. by the batch runner)
+        req = get_analysis_request_by_id(db, request_id)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Report is already '{req.status if req else 'unknown'}'",
         )
-        # finalize_report_with_pdf is now modified to return a dict with storage info (public_url, etc.)
-
-        # 7. Mark request as completed and record external ID & PDF link in the database
-        updated_req = get_analysis_request_by_id(db, request_id)
-        if not updated_req:
-            # In theory, updated_req should exist; this check is just a safety.
-            raise Exception("Request record vanished before completion update")
-        updated_req.status = "completed"
-        updated_req.external_request_id = str(req.id)  # use the same ID as external reference:contentReference[oaicite:2]{index=2}
-        if updated_req.parameters is None:
-            updated_req.parameters = {}
-        updated_req.parameters["pdf_url"] = supabase_info.get("public_url") or ""
-        updated_req.updated_at = datetime.utcnow()
-        db.commit()  # commit all the above changes
-
-        # 8. Create a new internal deal entry and a summary placeholder, actually just use the id sent for the request for the other table entries
-        # deal_id = f"deal_{int(time.time())}_{uuid.uuid4().hex[:8]}"  # unique deal identifier
-        try:
-            # Insert into deal_reports (PDF link initially included, since we have it now)
-            supabase.table("deal_reports").insert({
-                "deal_id": str(request_id),
-                "company_name": req.company_name or "Unknown Company",
-                "pdf_url": supabase_info.get("public_url") or None,
-                "pdf_file_path": supabase_info.get("storage_path") or None
-            }).execute()
-        except Exception as e:
-            logger.error("Error saving deal report record: %s", e, exc_info=True)
-        try:
-            # Insert into deal_report_summaries with placeholder content:contentReference[oaicite:3]{index=3}:contentReference[oaicite:4]{index=4}
-            supabase.table("deal_report_summaries").insert({
-                "deal_id": str(request_id),
-                "company_name": req.company_name or "Unknown Company",
-                "executive_summary": f"Analysis report submitted to external API with ID: {req.id}. Report generation is in progress.",
-                "strategic_recommendations": "Report generation in progress via external API",
-                "market_analysis": "Analysis pending via external API service",
-                "financial_overview": "Financial analysis pending",
-                "competitive_landscape": "Competitive analysis pending",
-                "action_plan": "Action plan to be generated",
-                "investment_readiness": "pending",
-                "key_metrics": {"external_report_id": str(req.id), "api_status": "submitted"},
-                "financial_projections": {"status": "pending", "external_report_id": str(req.id)}
-            }).execute()
-        except Exception as e:
-            logger.error("Error saving report summary placeholder: %s", e, exc_info=True)
-
-        # At this point, the analysis request is completed and the PDF URL is stored:contentReference[oaicite:5]{index=5}.
-        # The front-end can retrieve the PDF via GET /api/reports/{id}/content or directly from deal_reports.
-
-        return AnalysisRequestOut(**updated_req.__dict__)
-
-    except Exception as exc:
-        logger.error("Report generation failed: %s", exc, exc_info=True)
-        # Mark the request as failed in the database:contentReference[oaicite:6]{index=6}
-        update_analysis_request_status(db, request_id, "failed")
-        raise HTTPException(status_code=500, detail="Report generation failed")
+    logger.info("Report %s already triggered; returning job %s (%s).", request_id, job.id, job.status)
+    return job.id, job.status
 
 # ──────────────────────────────────────────────────────────────────────────────
 #  3)  GET FULL ROW + SECTIONS
 # ──────────────────────────────────────────────────────────────────────────────
 @router.get("/reports/{request_id}", response_model=AnalysisRequestOut)
-def get_report(request_id: UUID4, db: Session = Depends(get_db)) -> AnalysisRequestOut:
+def get_report(request: Request, request_id: UUID4, db: Session = Depends(get_db)):
+    # Conditional GET: the ETag comes from (status, updated_at), so an
+    # unchanged report is answered with 304 before the row is loaded.
+    version = get_request_version(db, request_id)
+    if not version:
+        raise HTTPException(404, "Analysis request not found")
+    etag = make_etag("report", request_id, version.status, version.updated_at)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
     req = get_analysis_request_by_id(db, request_id)
     if not req:
         raise HTTPException(404, "Analysis request not found")
-    return AnalysisRequestOut(**req.__dict__)
+    etag = make_etag("report", request_id, req.status, req.updated_at)
+    return cached_json_response(request, AnalysisRequestOut(**req.__dict__), etag)
 
 # ──────────────────────────────────────────────────────────────────────────────
 #  4)  GET JUST THE CONTENT SECTIONS (and PDF URL)
 # ──────────────────────────────────────────────────────────────────────────────
+def _content_etag(db: Session, request_id) -> Optional[str]:
+    """From the request version plus the newest section write: sections no longer touch the request row."""
+    version = get_request_version(db, request_id)
+    if not version:
+        return None
+    sections = get_sections_version(db, request_id)
+    return make_etag(
+        "content", request_id, version.status, version.updated_at,
+        sections.last_updated, sections.count,
+    )
+
+
 @router.get("/reports/{request_id}/content", response_model=ReportContentResponse)
-def get_report_content_endpoint(request_id: UUID4, db: Session = Depends(get_db)) -> ReportContentResponse:
+def get_report_content_endpoint(request: Request, request_id: UUID4, db: Session = Depends(get_db)):
+    etag = _content_etag(db, request_id)
+    if etag is None:
+        raise HTTPException(404, "Analysis request not found")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
     req = get_analysis_request_by_id(db, request_id)
     if not req:
         raise HTTPException(404, "Analysis request not found")
 
     secs_raw = get_generated_sections(db, request_id)
+    # JSONB does not preserve key order and sections are checkpointed one by
+    # one, so restore the report order explicitly.
+    section_order = list(SECTION_TITLES)
+    ordered = sorted(
+        secs_raw.items(),
+        key=lambda item: section_order.index(item[0]) if item[0] in SECTION_TITLES else len(section_order),
+    )
     sections: List[ReportSection] = [
         ReportSection(id=f"sec_{i}", title=title, content=body, sub_sections=[])
-        for i, (title, body) in enumerate(secs_raw.items(), start=1)
+        for i, (title, body) in enumerate(ordered, start=1)
     ]
 
-    return ReportContentResponse(
+    content = ReportContentResponse(
         status=req.status,
         url=req.parameters.get("pdf_url") if req.parameters else None,   # returns the public PDF link:contentReference[oaicite:7]{index=7}
         sections=sections,
     )
+    return cached_json_response(request, content, etag)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 #  5)  LIGHT-WEIGHT STATUS POLLING
 # ──────────────────────────────────────────────────────────────────────────────
+STEP_TITLES = {RESEARCH_NODE: "Research", **SECTION_TITLES}
+TERMINAL_STAGES = ("completed", "failed")
+
+
+def _load_progress(row, include_partial: bool) -> Dict[str, Any]:
+    """
+    Latest progress snapshot for a status row: the in-memory tracker when this
+    instance is generating it, otherwise the copy persisted in `parameters.progress`.
+    """
+    tracker = get_report_progress(row.id)
+    if tracker is not None:
+        return tracker.snapshot(include_partial=include_partial)
+
+    snapshot = dict(row.progress or {})
+    if row.status in TERMINAL_STAGES:
+        snapshot["stage"] = row.status
+    if row.status == "completed":
+        snapshot["progress"] = 100
+    if not include_partial:
+        snapshot["sections"] = {
+            key: {k: v for k, v in step.items() if k != "partial"}
+            for key, step in (snapshot.get("sections") or {}).items()
+        }
+    return snapshot
+
+
+def _status_response(row, snapshot: Dict[str, Any]) -> ReportStatusResponse:
+    sections = [
+        SectionProgress(
+            key=key,
+            title=STEP_TITLES.get(key),
+            state=step.get("state", "queued"),
+            tokens=step.get("tokens", 0),
+            partial_content=step.get("partial"),
+        )
+        for key, step in (snapshot.get("sections") or {}).items()
+    ]
+    return ReportStatusResponse(
+        report_id=row.id,
+        status=row.status,
+        progress=snapshot.get("progress", 100 if row.status == "completed" else 0),
+        stage=snapshot.get("stage"),
+        sections=sections,
+    )
+
+
+def _read_status(request_id, include_partial: bool) -> Optional[ReportStatusResponse]:
+    # Lean projection: never loads the generated sections held in `parameters`
+    with db_session() as session:
+        row = get_report_status_row(session, request_id)
+    if row is None:
+        return None
+    return _status_response(row, _load_progress(row, include_partial))
+
+
+async def _aread_status(request_id, include_partial: bool) -> Optional[ReportStatusResponse]:
+    """`_read_status` on the async engine when enabled, else in the threadpool."""
+    if not ASYNC_DB_ENABLED:
+        return await run_in_threadpool(_read_status, request_id, include_partial)
+    async with async_db_session() as session:
+        row = await async_crud.get_report_status_row(session, request_id)
+    if row is None:
+        return None
+    return _status_response(row, _load_progress(row, include_partial))
+
+
 @router.get("/reports/{request_id}/status", response_model=ReportStatusResponse)
-def report_status(
-    request_id: UUID4, db: Session = Depends(get_db)
+async def report_status(
+    request_id: UUID4,
+    include_partial: bool = Query(False, description="Include streamed partial section text"),
 ) -> ReportStatusResponse:
-    req = get_analysis_request_by_id(db, request_id)
-    if not req:
+    current = await _aread_status(request_id, include_partial)
+    if current is None:
+        raise HTTPException(404, "Analysis request not found")
+    return current
+
+
+@router.post("/reports/status/bulk", response_model=BulkStatusResponse)
+def bulk_report_status(body: BulkStatusRequest, db: Session = Depends(get_db)) -> BulkStatusResponse:
+    """
+    Status of many reports in one query: by `ids`, or all of a `user_id`'s
+    reports page by page (`cursor` = previous `next_cursor`). With
+    `include_sections`, each item also lists its stored sections' metadata.
+    """
+    if body.ids is None and body.user_id is None:
+        raise HTTPException(400, "Provide 'ids' or 'user_id'")
+    try:
+        after = decode_cursor(body.cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    limit = body.limit
+    rows = get_report_statuses(
+        db,
+        ids=body.ids,
+        user_id=body.user_id,
+        limit=limit + 1,                # one extra row tells whether there is a next page
+        after=after,
+        include_sections=body.include_sections,
+    )
+    page, has_more = rows[:limit], len(rows) > limit
+
+    items = []
+    for row in page:
+        status_payload = _status_response(row, _load_progress(row, include_partial=False))
+        summaries = None
+        if body.include_sections:
+            summaries = [
+                SectionSummary(title=STEP_TITLES.get(section["key"]), **section)
+                for section in (row.sections or [])
+            ]
+        items.append(BulkStatusItem(
+            **status_payload.__dict__,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+            section_summaries=summaries,
+        ))
+
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if has_more else None
+    return BulkStatusResponse(items=items, next_cursor=next_cursor)
+
+
+@router.get("/users/{user_id}/reports", response_model=ReportListResponse)
+def list_user_reports(
+    user_id: UUID4,
+    status_filter: Optional[str] = Query(
+        None, alias="status", pattern="^(pending|processing|completed|failed)$",
+        description="Only requests in this status",
+    ),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: Session = Depends(get_db),
+) -> ReportListResponse:
+    """A user's analysis requests, newest first, in keyset-paginated pages."""
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    rows = list_user_requests(db, user_id, status=status_filter, limit=limit + 1, after=after)
+    page, has_more = rows[:limit], len(rows) > limit
+    return ReportListResponse(
+        items=[ReportListItem(**row._mapping) for row in page],
+        next_cursor=encode_cursor(page[-1].created_at, page[-1].id) if has_more else None,
+    )
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  6)  LIVE PROGRESS (server-sent events)
+# ──────────────────────────────────────────────────────────────────────────────
+EVENTS_POLL_INTERVAL = 1.0      # seconds between progress checks
+EVENTS_HEARTBEAT_INTERVAL = 15  # seconds between keep-alive comments
+
+
+@router.get("/reports/{request_id}/events")
+async def report_events(
+    request: Request,
+    request_id: UUID4,
+    include_partial: bool = Query(True, description="Include streamed partial section text"),
+):
+    """
+    Server-sent events stream of report progress. Emits an `event: progress`
+    message (same payload as /status) whenever something changes, and ends
+    with the completed/failed update.
+    """
+    if await _aread_status(request_id, include_partial) is None:
         raise HTTPException(404, "Analysis request not found")
 
-    # crude progress heuristic
-    progress = 100 if req.status == "completed" else 50
-    return ReportStatusResponse(report_id=req.id, status=req.status, progress=progress)
+    async def event_stream():
+        last_payload = None
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            current = await _aread_status(request_id, include_partial)
+            if current is None:
+                return
+            payload = current.model_dump_json() if hasattr(current, "model_dump_json") else current.json()
+            if payload != last_payload:
+                yield f"event: progress\ndata: {payload}\n\n"
+                last_payload = payload
+                last_sent = time.monotonic()
+                if current.status in TERMINAL_STAGES or current.stage in TERMINAL_STAGES:
+                    return
+            elif time.monotonic() - last_sent >= EVENTS_HEARTBEAT_INTERVAL:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(EVENTS_POLL_INTERVAL)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
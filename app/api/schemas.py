@@ -38,8 +38,78 @@ class ReportContentResponse(BaseModel):
     url: Optional[str] = None           # public PDF URL (from deal_reports or parameters):contentReference[oaicite:14]{index=14}
     sections: List[ReportSection]
 
+class SectionProgress(BaseModel):
+    """Live state of one generation step (research or a report section)."""
+    key: str
+    title: Optional[str] = None
+    state: str                          # queued | running | done | failed
+    tokens: int = 0                     # streamed completion tokens so far
+    partial_content: Optional[str] = None
+
 class ReportStatusResponse(BaseModel):
     """Light-weight status check for a report generation."""
     report_id: UUID4
     status: str
     progress: int = 0
+    stage: Optional[str] = None         # generating | publishing | completed | failed
+    sections: List[SectionProgress] = []
+
+
+class ReportJobAccepted(BaseModel):
+    """Returned with 202 when a report is queued for the worker (or the batch runner)."""
+    report_id: UUID4
+    job_id: Optional[UUID4] = None      # None for batch mode (no report_jobs row)
+    status: str                         # queued | running | batch
+    status_url: str
+    events_url: str
+
+
+class SectionSummary(BaseModel):
+    """Metadata of one stored section (no content)."""
+    key: str
+    title: Optional[str] = None
+    kind: str = "section"               # section | step
+    ordinal: int = 0
+    chars: int = 0
+    completion_tokens: Optional[int] = None
+    model: Optional[str] = None
+    finished_at: Optional[datetime] = None
+
+
+class BulkStatusRequest(BaseModel):
+    """Either `ids` or `user_id` (or both, to intersect)."""
+    ids: Optional[List[UUID4]] = Field(None, max_length=500)
+    user_id: Optional[UUID4] = None
+    cursor: Optional[str] = None        # next_cursor of the previous page
+    limit: int = Field(100, ge=1, le=500)
+    include_sections: bool = False
+
+
+class BulkStatusItem(ReportStatusResponse):
+    created_at: datetime
+    updated_at: datetime
+    section_summaries: Optional[List[SectionSummary]] = None
+
+
+class BulkStatusResponse(BaseModel):
+    items: List[BulkStatusItem]
+    next_cursor: Optional[str] = None   # None on the last page
+
+
+class ReportListItem(BaseModel):
+    """One row of GET /users/{user_id}/reports (no parameters / sections)."""
+    id: UUID4
+    status: str
+    company_name: Optional[str] = None
+    founder_name: Optional[str] = None
+    requestor_name: Optional[str] = None
+    industry: Optional[str] = None
+    funding_stage: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    pdf_url: Optional[str] = None
+
+
+class ReportListResponse(BaseModel):
+    items: List[ReportListItem]
+    next_cursor: Optional[str] = None   # None on the last page
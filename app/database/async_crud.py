@@ -0,0 +1,50 @@
+"""
+Async counterparts of the read paths in `crud.py`, for `AsyncSession`s from
+`async_db_session()` (ASYNC_DB_ENABLED=true).
+
+They are the queries hit by polling clients (/status, /events), so they read
+only the columns / `parameters` keys they need.
+"""
+
+from typing import Any, Dict, Optional, Union
+
+from pydantic import UUID4
+from sqlalchemy import select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.crud import parameters_key_query, sections_query, status_row_query
+from app.database.models import AnalysisRequest
+
+# READ
+async def get_analysis_request_by_id(
+    db: AsyncSession, request_id: Union[str, UUID4]
+) -> Optional[AnalysisRequest]:
+    """Return the full analysis-request row or None."""
+    result = await db.execute(select(AnalysisRequest).where(AnalysisRequest.id == request_id))
+    return result.scalars().first()
+
+# READ – status (lean)
+async def get_report_status_row(
+    db: AsyncSession, request_id: Union[str, UUID4]
+) -> Optional[Row]:
+    """Row with `id, status, updated_at, progress`, or None."""
+    result = await db.execute(status_row_query(request_id))
+    return result.first()
+
+# READ – live progress
+async def get_report_progress_snapshot(
+    db: AsyncSession, request_id: Union[str, UUID4]
+) -> Dict[str, Any]:
+    result = await db.execute(parameters_key_query(request_id, "progress"))
+    return result.scalar() or {}
+
+# READ – generated sections
+async def get_generated_sections(
+    db: AsyncSession, request_id: Union[str, UUID4]
+) -> Dict[str, Any]:
+    rows = (await db.execute(sections_query(request_id, kind="section"))).all()
+    if rows:
+        return {row.section_key: row.content for row in rows}
+    result = await db.execute(parameters_key_query(request_id, "generated_sections"))
+    return result.scalar() or {}
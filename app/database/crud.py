@@ -1,10 +1,19 @@
+import json
+import os
 from datetime import datetime
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 from pydantic import UUID4
+from sqlalchemy import Select, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 
-from app.database.models import AnalysisRequest
+from app.database.models import AnalysisRequest, GeneratedSection, ReportJob
+
+# Attempts per report job before it is marked failed. Single source for the
+# API, the worker, the listener and the reaper.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
 
 # NOTE: The create_analysis_request_entry function has been removed, since new 
 # analysis requests are inserted on the front-end via Supabase (status 'pending').
@@ -16,6 +25,162 @@ def get_analysis_request_by_id(
     """Return the analysis-request row or None."""
     return db.query(AnalysisRequest).filter(AnalysisRequest.id == request_id).first()
 
+# READ – projections
+# Queries that read single keys of `parameters` instead of loading the whole
+# row (which carries every generated section). Shared with async_crud.
+def status_row_query(request_id: Union[str, UUID4]) -> Select:
+    """`id, status, updated_at, progress`: everything status polling needs."""
+    return select(
+        AnalysisRequest.id,
+        AnalysisRequest.status,
+        AnalysisRequest.updated_at,
+        AnalysisRequest.parameters["progress"].label("progress"),
+    ).where(AnalysisRequest.id == request_id)
+
+
+def parameters_key_query(request_id: Union[str, UUID4], *keys: str) -> Select:
+    """The given top-level `parameters` keys, one column each."""
+    return select(
+        *(AnalysisRequest.parameters[key].label(key) for key in keys)
+    ).where(AnalysisRequest.id == request_id)
+
+def sections_query(request_id: Union[str, UUID4], kind: Optional[str] = None) -> Select:
+    """`section_key, content` rows of `report_sections`, in report order."""
+    query = select(GeneratedSection.section_key, GeneratedSection.content).where(
+        GeneratedSection.request_id == request_id
+    )
+    if kind is not None:
+        query = query.where(GeneratedSection.kind == kind)
+    return query.order_by(GeneratedSection.ordinal, GeneratedSection.section_key)
+
+
+def legacy_sections(row: Optional[Row]) -> Dict[str, str]:
+    """
+    Merge the `step_checkpoints` / `generated_sections` JSONB columns of a
+    `parameters_key_query` row: where sections lived before `report_sections`.
+    """
+    sections: Dict[str, str] = {}
+    if row is not None:
+        sections.update(row.step_checkpoints or {})
+        sections.update(row.generated_sections or {})
+    return sections
+
+# READ – statuses in bulk
+def get_report_statuses(
+    db: Session,
+    ids: Optional[Sequence[Union[str, UUID4]]] = None,
+    user_id: Optional[Union[str, UUID4]] = None,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, Any]] = None,
+    include_sections: bool = False,
+) -> List[Row]:
+    """
+    Status rows (`id, status, created_at, updated_at, progress`, plus a
+    `sections` JSON summary when `include_sections`) for the given `ids`
+    and/or `user_id`, newest first, in one query.
+
+    `after` is the (created_at, id) keyset position of the previous page's
+    last row.
+    """
+    columns = [
+        AnalysisRequest.id,
+        AnalysisRequest.status,
+        AnalysisRequest.created_at,
+        AnalysisRequest.updated_at,
+        AnalysisRequest.parameters["progress"].label("progress"),
+    ]
+    if include_sections:
+        columns.append(section_summaries_subquery().label("sections"))
+
+    query = select(*columns)
+    if ids is not None:
+        query = query.where(AnalysisRequest.id.in_(list(ids)))
+    if user_id is not None:
+        query = query.where(AnalysisRequest.user_id == user_id)
+    if after is not None:
+        query = query.where(tuple_(AnalysisRequest.created_at, AnalysisRequest.id) < tuple_(*after))
+    query = query.order_by(AnalysisRequest.created_at.desc(), AnalysisRequest.id.desc()).limit(limit)
+    return db.execute(query).all()
+
+
+def section_summaries_subquery():
+    """Per-request JSON array of section metadata (no content), in report order."""
+    summary = func.jsonb_build_object(
+        "key", GeneratedSection.section_key,
+        "kind", GeneratedSection.kind,
+        "ordinal", GeneratedSection.ordinal,
+        "chars", func.length(GeneratedSection.content),
+        "completion_tokens", GeneratedSection.completion_tokens,
+        "model", GeneratedSection.model,
+        "finished_at", GeneratedSection.finished_at,
+    )
+    return (
+        select(func.coalesce(
+            func.jsonb_agg(aggregate_order_by(summary, GeneratedSection.ordinal)),
+            text("'[]'::jsonb"),
+        ))
+        .where(GeneratedSection.request_id == AnalysisRequest.id)
+        .scalar_subquery()
+    )
+
+# READ – a user's requests (keyset pages)
+def list_user_requests(
+    db: Session,
+    user_id: Union[str, UUID4],
+    status: Optional[str] = None,
+    limit: int = 50,
+    after: Optional[Tuple[datetime, Any]] = None,
+) -> List[Row]:
+    """
+    One page of a user's requests, newest first, without `parameters`
+    (only its `pdf_url`). Served by the (user_id[, status], created_at, id)
+    indexes, so the cost is O(limit) however many requests the user has.
+    """
+    query = select(
+        AnalysisRequest.id,
+        AnalysisRequest.status,
+        AnalysisRequest.company_name,
+        AnalysisRequest.founder_name,
+        AnalysisRequest.requestor_name,
+        AnalysisRequest.industry,
+        AnalysisRequest.funding_stage,
+        AnalysisRequest.created_at,
+        AnalysisRequest.updated_at,
+        AnalysisRequest.parameters["pdf_url"].astext.label("pdf_url"),
+    ).where(AnalysisRequest.user_id == user_id)
+    if status is not None:
+        query = query.where(AnalysisRequest.status == status)
+    if after is not None:
+        query = query.where(tuple_(AnalysisRequest.created_at, AnalysisRequest.id) < tuple_(*after))
+    query = query.order_by(AnalysisRequest.created_at.desc(), AnalysisRequest.id.desc()).limit(limit)
+    return db.execute(query).all()
+
+# READ – versions (for ETags)
+def get_request_version(
+    db: Session, request_id: Union[str, UUID4]
+) -> Optional[Row]:
+    """`status, updated_at` of the request, or None."""
+    return db.execute(
+        select(AnalysisRequest.status, AnalysisRequest.updated_at).where(AnalysisRequest.id == request_id)
+    ).first()
+
+
+def get_sections_version(db: Session, request_id: Union[str, UUID4]) -> Row:
+    """`last_updated, count` over the request's `report_sections` rows."""
+    return db.execute(
+        select(
+            func.max(GeneratedSection.updated_at).label("last_updated"),
+            func.count().label("count"),
+        ).where(GeneratedSection.request_id == request_id)
+    ).one()
+
+# READ – status (lean)
+def get_report_status_row(
+    db: Session, request_id: Union[str, UUID4]
+) -> Optional[Row]:
+    """Row with `id, status, updated_at, progress`, or None."""
+    return db.execute(status_row_query(request_id)).first()
+
 # UPDATE – status
 def update_analysis_request_status(
     db: Session, request_id: Union[str, UUID4], new_status: str
@@ -31,26 +196,445 @@ def update_analysis_request_status(
     req.updated_at = datetime.utcnow()
     db.commit()
 
+# UPDATE – status, compare-and-set
+def transition_analysis_request_status(
+    db: Session,
+    request_id: Union[str, UUID4],
+    from_statuses: Sequence[str],
+    new_status: str,
+    commit: bool = True,
+) -> bool:
+    """
+    Set `status` to `new_status` only if it is currently one of
+    `from_statuses`, in a single UPDATE. Returns False when the row is in
+    another state (e.g. a concurrent caller already moved it) or missing.
+    """
+    result = db.execute(
+        text(
+            """
+            UPDATE analysis_requests
+            SET status = :new_status, updated_at = :now
+            WHERE id = :id AND status = ANY(:from_statuses)
+            """
+        ),
+        {
+            "new_status": new_status,
+            "from_statuses": list(from_statuses),
+            "now": datetime.utcnow(),
+            "id": str(request_id),
+        },
+    )
+    if commit:
+        db.commit()
+    return result.rowcount == 1
+
+# UPDATE – heartbeat for requests owned outside the job queue
+def touch_analysis_requests(
+    db: Session, request_ids: Sequence[Union[str, UUID4]]
+) -> int:
+    """
+    Bump `updated_at` on the given requests that are still 'processing', so
+    the reaper sees they are alive. Returns how many rows were touched.
+    """
+    if not request_ids:
+        return 0
+    result = db.execute(
+        text(
+            """
+            UPDATE analysis_requests
+            SET updated_at = :now
+            WHERE id = ANY(CAST(:ids AS uuid[])) AND status = 'processing'
+            """
+        ),
+        {"now": datetime.utcnow(), "ids": [str(i) for i in request_ids]},
+    )
+    db.commit()
+    return result.rowcount
+
 # UPDATE – generated sections
 def save_generated_sections(
-    db: Session, request_id: Union[str, UUID4], sections: Dict[str, str]
+    db: Session,
+    request_id: Union[str, UUID4],
+    sections: Dict[str, str],
+    model: Optional[str] = None,
 ) -> None:
-    """Persist AI-generated sections into `parameters.generated_sections`."""
-    req = get_analysis_request_by_id(db, request_id)
-    if not req:
-        return
-    if req.parameters is None:
-        req.parameters = {}
-    req.parameters["generated_sections"] = sections
-    req.updated_at = datetime.utcnow()
+    """
+    Upsert the final sections into `report_sections` (ordinal = dict order)
+    and touch the request's `updated_at` for real-time listeners.
+    """
+    now = datetime.utcnow()
+    for ordinal, (key, content) in enumerate(sections.items(), start=1):
+        db.execute(_section_upsert(
+            request_id, key, content, kind="section", ordinal=ordinal, model=model, finished_at=now,
+        ))
+    db.execute(
+        text("UPDATE analysis_requests SET updated_at = :now WHERE id = :id"),
+        {"now": now, "id": str(request_id)},
+    )
+    db.commit()
+
+# UPDATE – single section checkpoint
+def save_generated_section(
+    db: Session,
+    request_id: Union[str, UUID4],
+    section_key: str,
+    content: str,
+    kind: str = "section",
+    ordinal: int = 0,
+    **details: Any,
+) -> None:
+    """
+    Upsert one section (or intermediate step output, kind='step') as soon as
+    it is generated: a single `report_sections` row, so concurrently finishing
+    sections never touch each other or the request row.
+
+    `details` may carry prompt_tokens, completion_tokens, model, started_at
+    and finished_at.
+    """
+    db.execute(_section_upsert(request_id, section_key, content, kind=kind, ordinal=ordinal, **details))
+    db.commit()
+
+
+def _section_upsert(request_id, section_key: str, content: str, **values: Any):
+    now = datetime.utcnow()
+    values = {k: v for k, v in values.items() if v is not None}
+    stmt = insert(GeneratedSection).values(
+        request_id=str(request_id),
+        section_key=section_key,
+        content=content,
+        created_at=now,
+        updated_at=now,
+        **values,
+    )
+    return stmt.on_conflict_do_update(
+        constraint="uq_report_sections_request_key",
+        set_={"content": stmt.excluded.content, "updated_at": now,
+              **{k: getattr(stmt.excluded, k) for k in values}},
+    )
+
+# UPDATE – single parameter
+def set_request_parameter(
+    db: Session, request_id: Union[str, UUID4], key: str, value: Any
+) -> None:
+    """Set `parameters.<key>` with a single JSONB merge."""
+    db.execute(
+        text(
+            """
+            UPDATE analysis_requests
+            SET parameters = COALESCE(parameters, '{}'::jsonb)
+                    || jsonb_build_object(CAST(:key AS text), CAST(:value AS jsonb)),
+                updated_at = :now
+            WHERE id = :id
+            """
+        ),
+        {"key": key, "value": json.dumps(value), "now": datetime.utcnow(), "id": str(request_id)},
+    )
+    db.commit()
+
+# UPDATE – hand a request to the batch runner
+def queue_request_for_batch(db: Session, request_id: Union[str, UUID4]) -> bool:
+    """
+    Flag a 'pending' or 'failed' request with `parameters.generation_mode =
+    'batch'` (back to 'pending') in one conditional UPDATE. Returns False when
+    it is in another state, e.g. already processing or completed.
+    """
+    result = db.execute(
+        text(
+            """
+            UPDATE analysis_requests
+            SET status = 'pending',
+                parameters = COALESCE(parameters, '{}'::jsonb) || '{"generation_mode": "batch"}'::jsonb,
+                updated_at = :now
+            WHERE id = :id AND status IN ('pending', 'failed')
+            """
+        ),
+        {"now": datetime.utcnow(), "id": str(request_id)},
+    )
+    db.commit()
+    return result.rowcount > 0
+
+# READ – requests queued for batch generation
+def get_pending_batch_requests(db: Session, limit: int = 100) -> List[AnalysisRequest]:
+    """Pending requests flagged with `parameters.generation_mode = 'batch'`, oldest first."""
+    return (
+        db.query(AnalysisRequest)
+        .filter(
+            AnalysisRequest.status == "pending",
+            AnalysisRequest.parameters["generation_mode"].astext == "batch",
+        )
+        .order_by(AnalysisRequest.created_at)
+        .limit(limit)
+        .all()
+    )
+
+# READ – requests waiting for an interactive trigger
+def get_pending_interactive_request_ids(db: Session, limit: int = 100) -> List[Any]:
+    """Ids of pending requests not flagged for batch generation, oldest first."""
+    return db.execute(
+        select(AnalysisRequest.id)
+        .where(
+            AnalysisRequest.status == "pending",
+            AnalysisRequest.parameters["generation_mode"].astext.is_distinct_from("batch"),
+        )
+        .order_by(AnalysisRequest.created_at)
+        .limit(limit)
+    ).scalars().all()
+
+# READ – section checkpoints (for resume)
+def get_section_checkpoints(
+    db: Session, request_id: Union[str, UUID4]
+) -> Dict[str, str]:
+    """
+    Everything saved by earlier attempts that the orchestrator can reuse:
+    generated sections plus intermediate step outputs (e.g. research).
+    """
+    checkpoints = legacy_sections(db.execute(
+        parameters_key_query(request_id, "step_checkpoints", "generated_sections")
+    ).first())
+    checkpoints.update(
+        (row.section_key, row.content) for row in db.execute(sections_query(request_id))
+    )
+    return checkpoints
+
+# UPDATE – live progress
+def save_report_progress(
+    db: Session, request_id: Union[str, UUID4], snapshot: Dict[str, Any]
+) -> None:
+    """
+    Overwrite `parameters.progress` with the latest progress snapshot
+    (stage, percentage, per-section state and partial text).
+
+    Single JSONB merge, so it never clobbers sections being checkpointed
+    concurrently.
+    """
+    db.execute(
+        text(
+            """
+            UPDATE analysis_requests
+            SET parameters = COALESCE(parameters, '{}'::jsonb)
+                    || jsonb_build_object('progress', CAST(:snapshot AS jsonb)),
+                updated_at = :now
+            WHERE id = :id
+            """
+        ),
+        {
+            "snapshot": json.dumps(snapshot),
+            "now": datetime.utcnow(),
+            "id": str(request_id),
+        },
+    )
     db.commit()
 
+# READ – live progress
+def get_report_progress_snapshot(
+    db: Session, request_id: Union[str, UUID4]
+) -> Dict[str, Any]:
+    """Return the last persisted progress snapshot ({} if none yet)."""
+    return db.execute(parameters_key_query(request_id, "progress")).scalar() or {}
+
 # READ – generated sections
 def get_generated_sections(
     db: Session, request_id: Union[str, UUID4]
 ) -> Dict[str, Any]:
-    """Retrieve whatever was saved by `save_generated_sections`."""
-    req = get_analysis_request_by_id(db, request_id)
-    if not req or not req.parameters:
-        return {}
-    return req.parameters.get("generated_sections", {})
+    """Report sections in report order (legacy JSONB copy for unmigrated rows)."""
+    rows = db.execute(sections_query(request_id, kind="section")).all()
+    if rows:
+        return {row.section_key: row.content for row in rows}
+    return db.execute(parameters_key_query(request_id, "generated_sections")).scalar() or {}
+
+# CREATE – start generation (idempotent)
+def start_report_job(
+    db: Session,
+    request_id: Union[str, UUID4],
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    from_statuses: Sequence[str] = ("pending", "failed"),
+) -> Optional[ReportJob]:
+    """
+    Move the request to 'processing' and enqueue its job in one transaction.
+    Returns None, without enqueuing, if the request is not in
+    `from_statuses`: generation was already triggered (or it is missing).
+    """
+    if not transition_analysis_request_status(db, request_id, from_statuses, "processing", commit=False):
+        db.rollback()
+        return None
+    job = ReportJob(request_id=request_id, status="queued", max_attempts=max_attempts)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+# READ – latest job
+def get_latest_report_job(
+    db: Session, request_id: Union[str, UUID4]
+) -> Optional[ReportJob]:
+    return (
+        db.query(ReportJob)
+        .filter(ReportJob.request_id == request_id)
+        .order_by(ReportJob.created_at.desc())
+        .first()
+    )
+
+# UPDATE – recover stale requests
+def requeue_stale_requests(
+    db: Session,
+    stale_before: datetime,
+    max_attempts: int,
+    job_max_attempts: int = JOB_MAX_ATTEMPTS,
+    limit: int = 100,
+    batch_stale_before: Optional[datetime] = None,
+) -> Tuple[List[Any], List[Any]]:
+    """
+    Requests stuck in 'processing' (no write since `stale_before`) with no
+    queued or running job, e.g. after a crash outside the job queue. Each
+    one gets a new job, or is marked 'failed' once it has had `max_attempts`
+    jobs. Rows locked by another reaper are skipped. Batch-mode requests
+    (heartbeated by the batch runner on every provider poll) are judged
+    against `batch_stale_before` instead, which defaults to `stale_before`.
+
+    Returns (requeued ids, failed ids).
+    """
+    rows = db.execute(
+        text(
+            """
+            SELECT r.id,
+                   (SELECT count(*) FROM report_jobs j WHERE j.request_id = r.id) AS jobs
+            FROM analysis_requests r
+            WHERE r.status = 'processing'
+              AND r.updated_at < CASE
+                  WHEN COALESCE(r.parameters ->> 'generation_mode', '') = 'batch'
+                  THEN :batch_stale_before ELSE :stale_before
+              END
+              AND NOT EXISTS (
+                  SELECT 1 FROM report_jobs j
+                  WHERE j.request_id = r.id AND j.status IN ('queued', 'running')
+              )
+            ORDER BY r.updated_at
+            LIMIT :limit
+            FOR UPDATE OF r SKIP LOCKED
+            """
+        ),
+        {
+            "stale_before": stale_before,
+            "batch_stale_before": batch_stale_before or stale_before,
+            "limit": limit,
+        },
+    ).all()
+
+    now = datetime.utcnow()
+    requeued, failed = [], []
+    for row in rows:
+        if row.jobs >= max_attempts:
+            failed.append(row.id)
+        else:
+            db.add(ReportJob(request_id=row.id, status="queued", max_attempts=job_max_attempts))
+            requeued.append(row.id)
+    for ids, new_status in ((requeued, "processing"), (failed, "failed")):
+        if ids:
+            db.execute(
+                text("UPDATE analysis_requests SET status = :status, updated_at = :now WHERE id = ANY(CAST(:ids AS uuid[]))"),
+                {"status": new_status, "now": now, "ids": [str(i) for i in ids]},
+            )
+    db.commit()
+    return requeued, failed
+
+# UPDATE – claim
+def claim_report_jobs(
+    db: Session, worker_id: str, limit: int, lease_seconds: int
+) -> List[Dict[str, Any]]:
+    """
+    Atomically lease up to `limit` jobs for `worker_id`: queued jobs that are
+    due, plus running jobs whose lease expired (their worker died). Rows held
+    by other workers are skipped, not waited on.
+    """
+    rows = db.execute(
+        text(
+            """
+            UPDATE report_jobs AS j
+            SET status = 'running',
+                attempts = j.attempts + 1,
+                locked_by = :worker,
+                lease_expires_at = :now + make_interval(secs => :lease),
+                heartbeat_at = :now,
+                updated_at = :now
+            WHERE j.id IN (
+                SELECT id FROM report_jobs
+                WHERE (status = 'queued' AND run_after <= :now)
+                   OR (status = 'running' AND lease_expires_at < :now)
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT :limit
+            )
+            RETURNING j.id, j.request_id, j.attempts, j.max_attempts
+            """
+        ),
+        {"worker": worker_id, "now": datetime.utcnow(), "lease": lease_seconds, "limit": limit},
+    ).mappings().all()
+    db.commit()
+    return [dict(row) for row in rows]
+
+# UPDATE – heartbeat
+def heartbeat_report_job(
+    db: Session, job_id, worker_id: str, lease_seconds: int
+) -> bool:
+    """Extend the lease; False if the job is no longer ours (lease lost)."""
+    result = db.execute(
+        text(
+            """
+            UPDATE report_jobs
+            SET lease_expires_at = :now + make_interval(secs => :lease),
+                heartbeat_at = :now,
+                updated_at = :now
+            WHERE id = :id AND locked_by = :worker AND status = 'running'
+            """
+        ),
+        {"id": str(job_id), "worker": worker_id, "now": datetime.utcnow(), "lease": lease_seconds},
+    )
+    db.commit()
+    return result.rowcount == 1
+
+# UPDATE – finish
+def complete_report_job(db: Session, job_id, worker_id: str) -> None:
+    db.execute(
+        text(
+            """
+            UPDATE report_jobs
+            SET status = 'succeeded', locked_by = NULL, lease_expires_at = NULL, updated_at = :now
+            WHERE id = :id AND locked_by = :worker
+            """
+        ),
+        {"id": str(job_id), "worker": worker_id, "now": datetime.utcnow()},
+    )
+    db.commit()
+
+
+def fail_report_job(
+    db: Session, job_id, worker_id: str, error: str, retry_delay_seconds: int
+) -> bool:
+    """
+    Record a failed attempt. The job is re-queued after `retry_delay_seconds`
+    while attempts remain; returns True once it has failed for good.
+    """
+    row = db.execute(
+        text(
+            """
+            UPDATE report_jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                run_after = :now + make_interval(secs => :delay),
+                last_error = :error,
+                locked_by = NULL,
+                lease_expires_at = NULL,
+                updated_at = :now
+            WHERE id = :id AND locked_by = :worker
+            RETURNING status
+            """
+        ),
+        {
+            "id": str(job_id),
+            "worker": worker_id,
+            "error": error[:4000],
+            "delay": retry_delay_seconds,
+            "now": datetime.utcnow(),
+        },
+    ).first()
+    db.commit()
+    return row is not None and row[0] == "failed"
@@ -5,15 +5,18 @@ Central SQLAlchemy setup.
 *   Creates an Engine with sensible pooling + disconnect handling.
 *   Exposes `SessionLocal()` factory and `Base` declarative metadata.
 *   Provides `get_db()` FastAPI dependency + `init_db()` helper.
+*   Optionally (ASYNC_DB_ENABLED=true) an asyncpg-backed `AsyncEngine` and
+    `async_db_session()` for hot read paths such as status polling.
 """
 
 from __future__ import annotations
 
 import os
-from contextlib import contextmanager
-from typing import Generator
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncGenerator, Generator, Optional
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
 # --------------------------------------------------------------------------- #
@@ -26,6 +29,8 @@ if not DATABASE_URL:
         "DATABASE_URL is not set – cannot start application without a database."
     )
 
+ASYNC_DB_ENABLED: bool = os.getenv("ASYNC_DB_ENABLED", "false").lower() == "true"
+
 # --------------------------------------------------------------------------- #
 # Engine
 # --------------------------------------------------------------------------- #
@@ -51,6 +56,52 @@ SessionLocal = sessionmaker(
     autocommit=False,
 )
 
+# --------------------------------------------------------------------------- #
+# Async engine (optional, asyncpg)
+# --------------------------------------------------------------------------- #
+def async_database_url(url: str) -> str:
+    """Same database through the asyncpg driver (postgresql+psycopg2:// → postgresql+asyncpg://)."""
+    scheme, sep, rest = url.partition("://")
+    if scheme.split("+")[0] in ("postgres", "postgresql"):
+        scheme = "postgresql+asyncpg"
+    return f"{scheme}{sep}{rest}"
+
+
+ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Created on first use, so asyncpg is only needed when ASYNC_DB_ENABLED is
+    set. Its pool is separate from ENGINE's.
+    """
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_size=10,
+            max_overflow=20,
+            pool_pre_ping=True,
+            pool_recycle=1800,
+            echo=os.getenv("SQLALCHEMY_ECHO", "false").lower() == "true",
+        )
+        _async_sessionmaker = async_sessionmaker(
+            bind=_async_engine,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_sessionmaker = None
+
 # --------------------------------------------------------------------------- #
 # Declarative base
 # --------------------------------------------------------------------------- #
@@ -80,6 +131,26 @@ def db_session() -> Generator[Session, None, None]:
         db.close()
 
 
+@asynccontextmanager
+async def async_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async counterpart of `db_session()`::
+
+        async with async_db_session() as db:
+            await db.execute(...)
+    """
+    get_async_engine()
+    db = _async_sessionmaker()
+    try:
+        yield db
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
 def init_db() -> None:
     """
     Create all tables that are imported into metadata.
@@ -88,3 +159,6 @@ def init_db() -> None:
     import app.database.models  # noqa: F401 – ensure models are imported
 
     Base.metadata.create_all(bind=ENGINE)
+    # create_all skips tables that already exist (e.g. the Supabase-managed
+    # analysis_requests); indexes added to those are built online by
+    # `python -m app.database.migrate_indexes`, not on every start.
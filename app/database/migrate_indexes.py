@@ -0,0 +1,63 @@
+"""
+One-off creation of the indexes added to `analysis_requests`, a table the
+app does not own (Supabase creates it, so `create_all` never touches it).
+
+    python -m app.database.migrate_indexes
+
+Safe to run while the API and workers are live: every index is built with
+`CREATE INDEX CONCURRENTLY IF NOT EXISTS`, which does not block writes to
+the table. A concurrent build that was interrupted leaves an INVALID index
+behind; it is dropped (concurrently) and built again. Running it twice is a
+no-op.
+"""
+
+import argparse
+import logging
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from app.database.database import ENGINE
+
+logger = logging.getLogger(__name__)
+
+# Name -> "table (columns)". Keep in step with AnalysisRequest.__table_args__.
+INDEXES: Dict[str, str] = {
+    # Keyset pagination of a user's requests (bulk status, GET /users/{id}/reports)
+    "ix_analysis_requests_user_created": "analysis_requests (user_id, created_at, id)",
+    # ... and of one status of them (GET /users/{id}/reports?status=)
+    "ix_analysis_requests_user_status_created": "analysis_requests (user_id, status, created_at, id)",
+}
+
+INVALID_INDEX_SQL = text(
+    """
+    SELECT c.relname
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = ANY(:names) AND NOT i.indisvalid
+    """
+)
+
+
+def migrate_indexes() -> List[str]:
+    """Create every index in INDEXES that is missing or invalid. Returns their names."""
+    # CONCURRENTLY cannot run inside a transaction block
+    with ENGINE.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = conn.execute(INVALID_INDEX_SQL, {"names": list(INDEXES)}).scalars().all()
+        for name in invalid:
+            logger.warning("Dropping invalid index %s left by an interrupted build.", name)
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+        for name, definition in INDEXES.items():
+            logger.info("Creating index %s (if missing)...", name)
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+
+    logger.info("Done: %s index(es) in place.", len(INDEXES))
+    return list(INDEXES)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    parser = argparse.ArgumentParser(description="Create the analysis_requests indexes online.")
+    parser.parse_args()
+    migrate_indexes()
@@ -0,0 +1,109 @@
+"""
+Online migration of generated sections from `analysis_requests.parameters`
+(`generated_sections` / `step_checkpoints`) into `report_sections`.
+
+    python -m app.database.migrate_sections [--batch-size 200] [--keep-jsonb]
+
+Safe to run while the API and workers are live:
+
+*   rows are processed in small batches, each in its own transaction, with
+    `FOR UPDATE SKIP LOCKED` so rows being written right now are left for a
+    later run;
+*   `ON CONFLICT DO NOTHING` keeps a section a worker already wrote to the
+    table (the newer copy);
+*   readers fall back to the JSONB copy until a row has been migrated, so the
+    order of deploy and migration does not matter.
+
+Unless `--keep-jsonb` is given, the copied keys are removed from
+`parameters`, which shrinks the row and stops `get_report` returning them.
+"""
+
+import argparse
+import logging
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.api.ai.orchestrator import REPORT_SECTION_ORDER
+from app.database.database import db_session, init_db
+
+logger = logging.getLogger(__name__)
+
+MIGRATE_BATCH_SQL = text(
+    """
+    WITH batch AS (
+        SELECT id, parameters
+        FROM analysis_requests
+        WHERE id > CAST(:after AS uuid)
+          AND (parameters -> 'generated_sections' IS NOT NULL
+               OR parameters -> 'step_checkpoints' IS NOT NULL)
+        ORDER BY id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    copied AS (
+        INSERT INTO report_sections
+            (id, request_id, section_key, kind, ordinal, content, created_at, updated_at)
+        SELECT gen_random_uuid(), b.id, e.key, kinds.kind,
+               COALESCE(array_position(CAST(:order AS text[]), e.key), 0),
+               e.value, :now, :now
+        FROM batch b
+        CROSS JOIN LATERAL (
+            VALUES ('generated_sections', 'section'), ('step_checkpoints', 'step')
+        ) AS kinds(field, kind)
+        CROSS JOIN LATERAL jsonb_each_text(
+            CASE WHEN jsonb_typeof(b.parameters -> kinds.field) = 'object'
+                 THEN b.parameters -> kinds.field ELSE '{}'::jsonb END
+        ) AS e
+        ON CONFLICT (request_id, section_key) DO NOTHING
+        RETURNING 1
+    ),
+    stripped AS (
+        UPDATE analysis_requests a
+        SET parameters = a.parameters - 'generated_sections' - 'step_checkpoints'
+        FROM batch b
+        WHERE a.id = b.id AND :strip
+        RETURNING 1
+    )
+    SELECT (SELECT id FROM batch ORDER BY id DESC LIMIT 1) AS last_id,
+           (SELECT count(*) FROM batch) AS requests,
+           (SELECT count(*) FROM copied) AS sections
+    """
+)
+
+
+def migrate_sections(batch_size: int = 200, keep_jsonb: bool = False) -> int:
+    """Copy every request's JSONB sections into `report_sections`. Returns requests processed."""
+    init_db()   # creates report_sections if this runs before the new code is deployed
+    after = "00000000-0000-0000-0000-000000000000"
+    total_requests = total_sections = 0
+    while True:
+        with db_session() as db:
+            row = db.execute(
+                MIGRATE_BATCH_SQL,
+                {
+                    "after": after,
+                    "batch_size": batch_size,
+                    "order": list(REPORT_SECTION_ORDER),
+                    "now": datetime.utcnow(),
+                    "strip": not keep_jsonb,
+                },
+            ).one()
+        if not row.requests:
+            break
+        after = str(row.last_id)
+        total_requests += row.requests
+        total_sections += row.sections
+        logger.info("Migrated %s request(s), %s section(s) so far.", total_requests, total_sections)
+
+    logger.info("Done: %s request(s), %s section row(s) created.", total_requests, total_sections)
+    return total_requests
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    parser = argparse.ArgumentParser(description="Move generated sections into report_sections.")
+    parser.add_argument("--batch-size", type=int, default=200, help="Requests per transaction")
+    parser.add_argument("--keep-jsonb", action="store_true", help="Copy only; leave parameters untouched")
+    args = parser.parse_args()
+    migrate_sections(batch_size=args.batch_size, keep_jsonb=args.keep_jsonb)
@@ -1,5 +1,5 @@
 import datetime
-from sqlalchemy import Column, String, DateTime, text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.database.database import Base
 
@@ -61,5 +61,156 @@ class AnalysisRequest(Base):
     # Convenience JSON field if you need to stash extra payload
     parameters = Column(JSONB)
 
+    # Built on existing databases by app.database.migrate_indexes
+    __table_args__ = (
+        # Keyset pagination of a user's requests, newest first
+        Index("ix_analysis_requests_user_created", "user_id", "created_at", "id"),
+        # ... and of one status of them (GET /users/{id}/reports?status=)
+        Index("ix_analysis_requests_user_status_created", "user_id", "status", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<AnalysisRequest id={self.id} user_id={self.user_id} status={self.status}>"
+
+
+class RateLimitBucket(Base):
+    """
+    Shared token-bucket state for the OpenAI rate limiter
+    (RATE_LIMIT_BACKEND=postgres), one row per limiter key.
+    """
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    state = Column(JSONB, nullable=False)
+    updated_at = Column(
+        DateTime,
+        default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow,
+        nullable=False,
+    )
+
+    def __repr__(self):
+        return f"<RateLimitBucket key={self.key}>"
+
+
+class CacheEntry(Base):
+    """
+    Generic content-addressed cache row (see `app.storage.cache.PostgresCache`),
+    e.g. agent completions keyed by a hash of model + prompts.
+    """
+    __tablename__ = "cache_entries"
+
+    namespace = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    value = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    last_accessed_at = Column(
+        DateTime, default=datetime.datetime.utcnow, nullable=False, index=True
+    )
+
+    def __repr__(self):
+        return f"<CacheEntry namespace={self.namespace} key={self.key}>"
+
+
+class ReportJob(Base):
+    """
+    Durable queue entry for generating one analysis request.
+
+    Workers claim rows with `SELECT … FOR UPDATE SKIP LOCKED`, hold a lease
+    they extend with heartbeats, and a row whose lease expired (crashed or
+    recycled worker) is claimed again.
+    status: queued → running → succeeded / failed
+    """
+    __tablename__ = "report_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    request_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("analysis_requests.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+
+    # Earliest time the job may be (re)claimed: retry back-off
+    run_after = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    # Lease held by the worker currently running the job
+    locked_by = Column(String)
+    lease_expires_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    updated_at = Column(
+        DateTime,
+        default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow,
+        nullable=False,
+    )
+
+    __table_args__ = (
+        # The claim query scans only queued / running rows
+        Index(
+            "ix_report_jobs_claimable",
+            "status", "run_after",
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+        # At most one live job per request: a duplicate trigger cannot enqueue twice
+        Index(
+            "uq_report_jobs_active_request",
+            "request_id",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<ReportJob id={self.id} request_id={self.request_id} status={self.status}>"
+
+
+class GeneratedSection(Base):
+    """
+    One generated report section (kind 'section') or intermediate step output
+    such as the research pass (kind 'step'), one row per request and key.
+
+    Replaces `analysis_requests.parameters["generated_sections"]` /
+    `["step_checkpoints"]`: checkpointing a section is a single-row upsert
+    instead of a rewrite of the whole parameters document. Rows written before
+    the move are copied over by `app.database.migrate_sections`.
+    """
+    __tablename__ = "report_sections"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    request_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("analysis_requests.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    section_key = Column(String, nullable=False)
+    kind = Column(String, nullable=False, default="section")    # section | step
+    ordinal = Column(Integer, nullable=False, default=0)        # position in the report
+    content = Column(Text, nullable=False)
+
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    model = Column(String)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    updated_at = Column(
+        DateTime,
+        default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow,
+        nullable=False,
+    )
+
+    __table_args__ = (
+        UniqueConstraint("request_id", "section_key", name="uq_report_sections_request_key"),
+    )
+
+    def __repr__(self):
+        return f"<GeneratedSection request_id={self.request_id} key={self.section_key} kind={self.kind}>"
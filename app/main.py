@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import json
 import google.cloud.logging
@@ -11,10 +12,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 
 # Database imports
-from app.database.database import SessionLocal, init_db
+from app.database.database import SessionLocal, dispose_async_engine, init_db
 
 # Router import
 from app.api.router import router as reports_router
+from app.api.ai.http_client import close_http_session
+from app.worker.cpu_pool import cpu_pool_stats, shutdown_cpu_pool
+from app.worker.main import run_worker
+from app.worker.reaper import start_reaper
 
 # Initialize Google Cloud Logging client
 client = google.cloud.logging.Client()
@@ -35,6 +40,8 @@ logger = logging.getLogger(__name__)
 MAX_UPLOAD_SIZE_MB = os.getenv("MAX_UPLOAD_SIZE_MB", "25")
 REPORTS_BUCKET_NAME = os.getenv("REPORTS_BUCKET_NAME", "my-reports-bucket")
 STATIC_API_TOKEN = os.getenv("STATIC_API_TOKEN", "expected-static-token")
+# Run a report worker inside the API process (single-container deployments)
+REPORT_WORKER_IN_PROCESS = os.getenv("REPORT_WORKER_IN_PROCESS", "false").lower() == "true"
 
 app = FastAPI(title="GFV Investment Readiness Report API")
 
@@ -105,7 +112,7 @@ app.include_router(
 @app.get("/health")
 def health_check():
     logger.info("Health check endpoint accessed")
-    return {"status": "ok"}
+    return {"status": "ok", "cpu_pool": cpu_pool_stats()}
 
 # ------------------------------------------------------------------
 # Exception Handlers
@@ -140,8 +147,22 @@ async def startup_event():
     logger.info(f"MAX_UPLOAD_SIZE_MB is set to {MAX_UPLOAD_SIZE_MB}")
     logger.info(f"REPORTS_BUCKET_NAME is set to {REPORTS_BUCKET_NAME}")
 
+    if REPORT_WORKER_IN_PROCESS:
+        app.state.worker_stop = asyncio.Event()
+        app.state.worker_task = asyncio.create_task(run_worker(app.state.worker_stop))
+        app.state.reaper = start_reaper()
+        logger.info("In-process report worker started.")
+
     logger.info("Application startup complete.")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if REPORT_WORKER_IN_PROCESS:
+        app.state.worker_stop.set()
+        await app.state.worker_task
+        if app.state.reaper is not None:
+            app.state.reaper.stop(timeout=5)
+    await close_http_session()
+    await dispose_async_engine()
+    await asyncio.to_thread(shutdown_cpu_pool)
     logger.info("Application shutdown complete.")
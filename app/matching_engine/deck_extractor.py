@@ -0,0 +1,284 @@
+# app/matching_engine/deck_extractor.py
+"""
+Page-parallel text extraction for pitch decks.
+
+`extract_pages_with_ocr` (pdf_to_openai_jsonl) OCRs every text-less page one
+after another at 150 DPI. An image-only 40-slide deck takes minutes that way.
+`extract_deck_pages` does this instead:
+
+1.  Classifies each page by its text layer and its image coverage:
+
+        text   enough embedded text, no OCR
+        mixed  some text, but images cover much of the page (screenshots,
+               charts with labels); OCR, keep whichever text is longer
+        image  no usable text layer (scanned / exported-as-image slides)
+
+2.  Renders only the pages that need OCR, at the DPI of their page type, and
+    fans them out over the CPU process pool (`app.worker.cpu_pool`), one
+    task per page, with the Tesseract page-segmentation mode (PSM) of their
+    page type.
+
+    Pages already in the OCR cache (`app.matching_engine.ocr_cache`, keyed
+    by the rendered pixmap) are not submitted at all.
+
+3.  Returns one string per page, in page order ('' for empty pages), the
+    same shape as `extract_pages_with_ocr`.
+
+Tunable per page type through DECK_OCR_<TYPE>_DPI / DECK_OCR_<TYPE>_PSM
+(e.g. DECK_OCR_IMAGE_DPI=200), plus DECK_TEXT_MIN_CHARS and
+DECK_IMAGE_COVERAGE for the classification.
+
+DECK_EXTRACT_MODE=layout reads text-layer pages from PyMuPDF's block/span
+dictionary instead of `get_text("text")` (see `layout_page_text`):
+
+*   the slide title (largest, short block) becomes a `## ` heading;
+*   tables found on the page are rebuilt as markdown tables;
+*   lines repeated in the top / bottom margin of most slides (company name,
+    "Confidential", page numbers) are dropped.
+
+Same content, fewer and better-ordered tokens. The default, `text`, keeps
+the plain extraction.
+"""
+
+import logging
+import os
+import re
+from collections import Counter
+from statistics import median
+from typing import Dict, List, Optional, Set, Tuple
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+from app.matching_engine.ocr_cache import get_cached_ocr, ocr_cache_key, store_ocr
+from app.worker.cpu_pool import submit_cpu_stage
+
+logger = logging.getLogger(__name__)
+
+# A page with at least this many characters of embedded text counts as text
+DECK_TEXT_MIN_CHARS = int(os.getenv("DECK_TEXT_MIN_CHARS", "200"))
+# ... unless images cover at least this share of it
+DECK_IMAGE_COVERAGE = float(os.getenv("DECK_IMAGE_COVERAGE", "0.5"))
+DECK_OCR_LANG = os.getenv("DECK_OCR_LANG", "eng")
+DECK_EXTRACT_MODE = os.getenv("DECK_EXTRACT_MODE", "text").lower()     # text | layout
+
+# Layout mode: share of the page height treated as header / footer margin, and
+# share of pages a margin line must appear on to count as repeated
+MARGIN_FRACTION = 0.1
+REPEATED_LINE_SHARE = 0.5
+# A block is the slide title if its font is this much larger than the body text
+TITLE_SIZE_RATIO = 1.2
+TITLE_MAX_CHARS = 120
+
+# (dpi, psm) per page type that is OCR'd. PSM 3 = automatic layout analysis;
+# PSM 11 = sparse text, which suits labels scattered over charts and photos.
+OCR_PROFILES: Dict[str, Tuple[int, int]] = {
+    page_type: (
+        int(os.getenv(f"DECK_OCR_{page_type.upper()}_DPI", str(dpi))),
+        int(os.getenv(f"DECK_OCR_{page_type.upper()}_PSM", str(psm))),
+    )
+    for page_type, (dpi, psm) in {"image": (200, 3), "mixed": (200, 11)}.items()
+}
+
+
+def image_coverage(page: "fitz.Page") -> float:
+    """Share (0-1) of the page area covered by images (overlaps counted twice, capped at 1)."""
+    page_rect = page.rect
+    page_area = abs(page_rect) or 1.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(fitz.Rect(info["bbox"]) & page_rect)
+    return min(1.0, covered / page_area)
+
+
+def classify_page(text: str, coverage: float) -> str:
+    """'text', 'mixed' or 'image' (see module docstring)."""
+    chars = len(text.strip())
+    if chars == 0:
+        return "image"
+    if chars < DECK_TEXT_MIN_CHARS and coverage >= DECK_IMAGE_COVERAGE:
+        return "mixed"
+    return "text"
+
+
+def ocr_pixmap(samples: bytes, width: int, height: int, psm: int, lang: str = DECK_OCR_LANG) -> str:
+    """OCR one rendered page (raw RGB samples). Runs in a pool process."""
+    img = Image.frombytes("RGB", (width, height), samples)
+    return pytesseract.image_to_string(img, lang=lang, config=f"--psm {psm}")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Layout mode
+# ─────────────────────────────────────────────────────────────────────────────
+def _line_key(text: str) -> str:
+    """Normalised margin line: page numbers and dates vary, so digits are ignored."""
+    return re.sub(r"\d+", "#", " ".join(text.split()).lower())
+
+
+def _block_lines(block: dict) -> List[Tuple[str, float, "fitz.Rect"]]:
+    """(text, largest font size, bbox) of every non-empty line of a text block."""
+    lines = []
+    for line in block.get("lines", []):
+        spans = [span for span in line.get("spans", []) if span.get("text", "").strip()]
+        if spans:
+            text = " ".join(span["text"].strip() for span in spans)
+            lines.append((text, max(span["size"] for span in spans), fitz.Rect(line["bbox"])))
+    return lines
+
+
+def _in_margin(rect: "fitz.Rect", page_rect: "fitz.Rect") -> bool:
+    margin = page_rect.height * MARGIN_FRACTION
+    return rect.y1 <= page_rect.y0 + margin or rect.y0 >= page_rect.y1 - margin
+
+
+def repeated_margin_lines(doc: "fitz.Document") -> Set[str]:
+    """Header / footer lines (by `_line_key`) present on most pages of `doc`."""
+    if doc.page_count < 3:
+        return set()
+    seen: Counter = Counter()
+    for page in doc:
+        keys = set()
+        for block in page.get_text("dict")["blocks"]:
+            for text, _, rect in _block_lines(block):
+                if _in_margin(rect, page.rect):
+                    keys.add(_line_key(text))
+        seen.update(keys)
+    threshold = max(2, int(doc.page_count * REPEATED_LINE_SHARE))
+    return {key for key, count in seen.items() if count >= threshold}
+
+
+def table_markdown(rows: List[List[Optional[str]]]) -> str:
+    """Rows of cell strings (None for merged cells) as a compact markdown table."""
+    rows = [[" ".join((cell or "").split()).replace("|", "/") for cell in row] for row in rows]
+    rows = [row for row in rows if any(row)]
+    if not rows:
+        return ""
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + "---|" * width]
+    lines += ["| " + " | ".join(row) + " |" for row in rows[1:]]
+    return "\n".join(lines)
+
+
+def layout_page_text(page: "fitz.Page", repeated: Set[str] = frozenset()) -> str:
+    """Structured markdown for one slide: title heading, text blocks and tables in reading order."""
+    page_rect = page.rect
+    items: List[Tuple[float, float, str]] = []     # (y, x, markdown)
+
+    table_rects = []
+    try:
+        tables = page.find_tables().tables
+    except Exception as e:     # table detection is best effort
+        logger.debug("Table detection failed on page %s: %s", page.number + 1, e)
+        tables = []
+    for table in tables:
+        markdown = table_markdown(table.extract())
+        if markdown:
+            rect = fitz.Rect(table.bbox)
+            table_rects.append(rect)
+            items.append((rect.y0, rect.x0, markdown))
+
+    blocks = []
+    for block in page.get_text("dict", sort=True)["blocks"]:
+        if block.get("type") != 0:
+            continue
+        rect = fitz.Rect(block["bbox"])
+        center = fitz.Point((rect.x0 + rect.x1) / 2, (rect.y0 + rect.y1) / 2)
+        if any(center in table_rect for table_rect in table_rects):
+            continue    # already part of a table
+        lines = [
+            (text, size) for text, size, line_rect in _block_lines(block)
+            if not (_in_margin(line_rect, page_rect) and _line_key(text) in repeated)
+        ]
+        if lines:
+            blocks.append((rect, lines))
+
+    title_block = None
+    sizes = [size for _, lines in blocks for _, size in lines]
+    if sizes:
+        body_size = median(sizes)
+        candidates = [
+            (max(size for _, size in lines), -rect.y0, i)
+            for i, (rect, lines) in enumerate(blocks)
+            if sum(len(text) for text, _ in lines) <= TITLE_MAX_CHARS
+        ]
+        if candidates:
+            size, _, index = max(candidates)
+            if size >= body_size * TITLE_SIZE_RATIO or len(blocks) == 1:
+                title_block = index
+
+    for i, (rect, lines) in enumerate(blocks):
+        text = " ".join(text for text, _ in lines) if i == title_block else "\n".join(text for text, _ in lines)
+        if i == title_block:
+            items.append((-1.0, 0.0, f"## {text}"))    # title first, wherever it sits
+        else:
+            items.append((rect.y0, rect.x0, text))
+
+    items.sort(key=lambda item: (item[0], item[1]))
+    return "\n\n".join(markdown for _, _, markdown in items)
+
+
+def _keep_longer(pages: List[str], page_index: int, ocr_text: str) -> None:
+    if len(ocr_text.strip()) > len(pages[page_index].strip()):
+        pages[page_index] = ocr_text
+
+
+def extract_deck_pages(pdf_bytes: bytes, mode: str = DECK_EXTRACT_MODE) -> List[str]:
+    """
+    Extract the text of every page of a PDF, OCR'ing the pages that need it in
+    parallel. `mode` is 'text' or 'layout' (see module docstring). Blocking;
+    call from a thread.
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        layout = mode == "layout"
+        repeated = repeated_margin_lines(doc) if layout else set()
+        pages: List[str] = []
+        pending = {}    # page index -> (cache key, future of its OCR text)
+        counts = {"text": 0, "mixed": 0, "image": 0}
+        cached = 0
+
+        for page_index in range(doc.page_count):
+            page = doc[page_index]
+            text = page.get_text("text")
+            page_type = classify_page(text, image_coverage(page))
+            counts[page_type] += 1
+            if layout and page_type != "image":
+                text = layout_page_text(page, repeated)
+            pages.append(text)
+            if page_type == "text":
+                continue
+
+            dpi, psm = OCR_PROFILES[page_type]
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+            key = ocr_cache_key(pix.samples, pix.width, pix.height, psm, DECK_OCR_LANG)
+            ocr_text = get_cached_ocr(key)
+            if ocr_text is not None:
+                cached += 1
+                _keep_longer(pages, page_index, ocr_text)
+                continue
+            pending[page_index] = (key, submit_cpu_stage(
+                "ocr", ocr_pixmap, pix.samples, pix.width, pix.height, psm
+            ))
+    finally:
+        doc.close()
+
+    failed = 0
+    for page_index, (key, future) in pending.items():
+        try:
+            ocr_text = future.result()
+        except Exception as e:
+            # One bad page (Tesseract error, corrupt image) must not lose the deck:
+            # keep its text layer, if any
+            failed += 1
+            logger.warning("OCR failed on page %s: %s", page_index + 1, e)
+            continue
+        store_ocr(key, ocr_text)
+        _keep_longer(pages, page_index, ocr_text)
+
+    logger.info(
+        "Extracted %s page(s): %s text, %s mixed, %s image (%s OCR'd, %s failed, %s from cache).",
+        len(pages), counts["text"], counts["mixed"], counts["image"], len(pending), failed, cached,
+    )
+    return [text if text.strip() else "" for text in pages]
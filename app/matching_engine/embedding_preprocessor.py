@@ -2,13 +2,17 @@
 embedding_preprocessor.py
 
 Usage:
-    python embedding_preprocessor.py --pdf path/to/document.pdf \
-                                     --index projects/PROJECT_ID/locations/us-central1/indexes/INDEX_ID
+    python -m app.matching_engine.embedding_preprocessor --pdf path/to/document.pdf \
+        --index projects/PROJECT_ID/locations/us-central1/indexes/INDEX_ID
 
 Description:
     1) Extracts text from a given PDF using PyMuPDF.
-    2) Generates embeddings for each non-empty page using OpenAI's text-embedding-ada-002.
-    3) Upserts these vectors into your Vertex AI Matching Engine index for real-time retrieval.
+    2) Generates embeddings for each non-empty page using OpenAI's text-embedding-ada-002,
+       in batched requests: pages are grouped into requests of at most
+       EMBED_BATCH_MAX_TOKENS tokens / EMBED_BATCH_MAX_INPUTS inputs, sent
+       EMBED_CONCURRENCY at a time under their own rate limiter (EMBED_RPM / EMBED_TPM).
+    3) Upserts these vectors into your Vertex AI Matching Engine index for real-time retrieval,
+       VERTEX_UPSERT_BATCH_SIZE datapoints per request through one reused client.
 
 Prerequisites:
     pip install pymupdf google-cloud-aiplatform openai
@@ -19,11 +23,29 @@ Environment Variables Needed:
 """
 
 import argparse
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence, Tuple
+
 import pymupdf
 import openai
 from google.cloud import aiplatform_v1
 
+from app.api.ai.rate_limiter import count_tokens, get_embedding_rate_limiter, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# ada-002 rejects any input over 8191 tokens, failing its whole request (and
+# with it the deck), so longer texts are truncated before batching
+EMBED_MAX_INPUT_TOKENS = 8191
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "50000"))
+EMBED_BATCH_MAX_INPUTS = int(os.getenv("EMBED_BATCH_MAX_INPUTS", "256"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+VERTEX_UPSERT_BATCH_SIZE = int(os.getenv("VERTEX_UPSERT_BATCH_SIZE", "500"))
+
 
 def extract_pdf_text(pdf_path: str):
     """
@@ -39,18 +61,107 @@ def extract_pdf_text(pdf_path: str):
     return extracted
 
 
+def fit_embedding_input(text: str) -> str:
+    """`text`, truncated to EMBED_MAX_INPUT_TOKENS if it is longer."""
+    fitted = truncate_tokens(text, EMBED_MAX_INPUT_TOKENS)
+    if len(fitted) < len(text):
+        logger.warning(
+            "Embedding input truncated to %s tokens (%s of %s characters kept).",
+            EMBED_MAX_INPUT_TOKENS, len(fitted), len(text),
+        )
+    return fitted
+
+
+def batch_by_tokens(texts: Sequence[str]) -> List[List[int]]:
+    """Group input positions into consecutive batches bounded by tokens and input count."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (current_tokens + tokens > EMBED_BATCH_MAX_TOKENS
+                        or len(current) >= EMBED_BATCH_MAX_INPUTS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _embed_batch(texts: List[str]) -> List[list]:
+    """One embeddings request for `texts` under the embedding rate limiter."""
+    limiter = get_embedding_rate_limiter()
+    estimated = sum(count_tokens(text) for text in texts)
+    limiter.acquire(estimated)
+    try:
+        response = openai.Embedding.create(input=texts, model=EMBEDDING_MODEL)
+    except openai.error.RateLimitError as e:
+        limiter.update_from_headers(getattr(e, "headers", None))
+        raise
+    limiter.reconcile(estimated, (response.get("usage") or {}).get("total_tokens"))
+    # Results carry their input position; do not rely on response order
+    data = sorted(response["data"], key=lambda item: item["index"])
+    return [item["embedding"] for item in data]
+
+
+def generate_embeddings(texts: Sequence[str]) -> List[list]:
+    """
+    Embedding vectors for `texts`, in input order, using token-bounded batched
+    requests sent EMBED_CONCURRENCY at a time. Inputs over
+    EMBED_MAX_INPUT_TOKENS are truncated.
+    """
+    texts = [fit_embedding_input(text) for text in texts]
+    batches = batch_by_tokens(texts)
+    vectors: List[list] = [None] * len(texts)
+    with ThreadPoolExecutor(max_workers=max(1, min(EMBED_CONCURRENCY, len(batches)))) as pool:
+        results = pool.map(lambda batch: _embed_batch([texts[i] for i in batch]), batches)
+        for batch, batch_vectors in zip(batches, results):
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+    logger.info("Embedded %s text(s) in %s request(s).", len(texts), len(batches))
+    return vectors
+
+
 def generate_embedding(text: str) -> list:
     """
     Generates an embedding vector (list of floats) for the given text
     using OpenAI's 'text-embedding-ada-002' model.
     """
-    response = openai.Embedding.create(
-        input=[text],
-        model="text-embedding-ada-002"
-    )
-    # The model returns a list of embeddings (one per input). We used a single input, so index [0].
-    embedding_vector = response["data"][0]["embedding"]
-    return embedding_vector
+    return _embed_batch([fit_embedding_input(text)])[0]
+
+
+_index_client = None
+_index_client_lock = threading.Lock()
+
+
+def get_index_client() -> "aiplatform_v1.IndexServiceClient":
+    """One IndexServiceClient (and its gRPC channel) per process."""
+    global _index_client
+    with _index_client_lock:
+        if _index_client is None:
+            _index_client = aiplatform_v1.IndexServiceClient()
+        return _index_client
+
+
+def upsert_embeddings_to_vertex(index_resource_name: str, items: Sequence[Tuple[str, list]]) -> None:
+    """
+    Upserts (data_id, embedding) pairs to the specified Vertex AI Matching Engine
+    index, VERTEX_UPSERT_BATCH_SIZE datapoints per request.
+    """
+    index_client = get_index_client()
+    for start in range(0, len(items), VERTEX_UPSERT_BATCH_SIZE):
+        chunk = items[start:start + VERTEX_UPSERT_BATCH_SIZE]
+        request = aiplatform_v1.UpsertDatapointsRequest(
+            index=index_resource_name,
+            datapoints=[
+                aiplatform_v1.IndexDatapoint(datapoint_id=data_id, feature_vector=embedding)
+                for data_id, embedding in chunk
+            ],
+        )
+        index_client.upsert_datapoints(request=request)
+    print(f"Upserted {len(items)} datapoints into index {index_resource_name}.")
 
 
 def upsert_embedding_to_vertex(index_resource_name: str, data_id: str, embedding: list):
@@ -63,18 +174,7 @@ def upsert_embedding_to_vertex(index_resource_name: str, data_id: str, embedding
         data_id: Unique ID for this datapoint in the index (string).
         embedding: The embedding vector as a list of floats.
     """
-    index_client = aiplatform_v1.IndexServiceClient()
-    datapoint = aiplatform_v1.IndexDatapoint(
-        datapoint_id=data_id,
-        feature_vector=embedding
-        # Optional: if you have restricts, crowding tag, etc., you can add them here
-    )
-    request = aiplatform_v1.UpsertDatapointsRequest(
-        index=index_resource_name,
-        datapoints=[datapoint]
-    )
-    index_client.upsert_datapoints(request=request)
-    print(f"Upserted {data_id} into index {index_resource_name}.")
+    upsert_embeddings_to_vertex(index_resource_name, [(data_id, embedding)])
 
 
 def process_pdf_and_upsert(pdf_path: str, index_resource_name: str):
@@ -88,16 +188,15 @@ def process_pdf_and_upsert(pdf_path: str, index_resource_name: str):
     pages = extract_pdf_text(pdf_path)
     print(f"Extracted {len(pages)} non-empty pages from {pdf_path}.")
 
-    # 2. For each page, generate embedding & upsert
-    for page_number, text_content in pages:
-        # Generate an embedding
-        embedding_vector = generate_embedding(text_content)
+    # 2. Generate embeddings for all pages in batched requests
+    vectors = generate_embeddings([text_content for _, text_content in pages])
 
-        # Create a unique datapoint_id, e.g. "mydoc_page0"
-        data_id = f"{os.path.basename(pdf_path)}_page{page_number}"
-
-        # 3. Upsert to Vertex AI
-        upsert_embedding_to_vertex(index_resource_name, data_id, embedding_vector)
+    # 3. Upsert to Vertex AI in bulk; datapoint ids look like "mydoc_page0"
+    base_name = os.path.basename(pdf_path)
+    upsert_embeddings_to_vertex(
+        index_resource_name,
+        [(f"{base_name}_page{page_number}", vector) for (page_number, _), vector in zip(pages, vectors)],
+    )
 
 
 if __name__ == "__main__":
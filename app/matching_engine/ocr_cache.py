@@ -0,0 +1,90 @@
+# app/matching_engine/ocr_cache.py
+"""
+Persistent cache of per-page OCR results.
+
+Keys are sha256 of the rendered page pixmap (raw samples + size) and the
+Tesseract settings, so a deck that is generated again, or a slide reused
+across decks (company templates, title pages), skips Tesseract. Rendering a
+page is cheap next to OCR'ing it. Configure with:
+
+  OCR_CACHE_BACKEND      none (default) | disk | postgres
+  OCR_CACHE_DIR          directory for the disk backend
+  OCR_CACHE_TTL_SECONDS  entry lifetime (default 30 days, 0 = never expire)
+  OCR_CACHE_MAX_ENTRIES  LRU bound on the number of cached pages
+  OCR_CACHE_MAX_BYTES    LRU bound on the disk backend's size (default 256 MB)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from app.storage.cache import content_hash, make_cache
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE_BACKEND = os.getenv("OCR_CACHE_BACKEND", "none")
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "")
+OCR_CACHE_TTL_SECONDS = int(os.getenv("OCR_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "20000"))
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+CACHE_NAMESPACE = "ocr_pages"
+
+_cache = None
+_cache_initialised = False
+_cache_lock = threading.Lock()
+
+
+def ocr_cache_key(samples: bytes, width: int, height: int, psm: Optional[int], lang: str) -> str:
+    return content_hash(
+        hashlib.sha256(samples).hexdigest(), f"{width}x{height}", str(psm or "default"), lang
+    )
+
+
+def get_ocr_cache():
+    """Return the configured cache, or None when caching is disabled."""
+    global _cache, _cache_initialised
+    with _cache_lock:
+        if not _cache_initialised:
+            _cache = make_cache(
+                OCR_CACHE_BACKEND,
+                CACHE_NAMESPACE,
+                directory=OCR_CACHE_DIR or None,
+                ttl_seconds=OCR_CACHE_TTL_SECONDS or None,
+                max_entries=OCR_CACHE_MAX_ENTRIES,
+                max_bytes=OCR_CACHE_MAX_BYTES,
+            )
+            _cache_initialised = True
+            if _cache is not None:
+                logger.info("OCR page cache enabled (backend=%s).", OCR_CACHE_BACKEND)
+        return _cache
+
+
+def get_cached_ocr(key: str) -> Optional[str]:
+    cache = get_ocr_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception as e:
+        # A broken cache must never fail extraction
+        logger.warning("OCR cache lookup failed: %s", e)
+        return None
+
+
+def store_ocr(key: str, text: str) -> None:
+    cache = get_ocr_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(key, text)
+    except Exception as e:
+        logger.warning("OCR cache write failed: %s", e)
+
+
+def ocr_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of the OCR cache (empty when disabled)."""
+    cache = get_ocr_cache()
+    return cache.stats() if cache is not None else {}
@@ -65,6 +65,12 @@ try:
 except ImportError:
     SUPABASE_AVAILABLE = False
 
+# OCR page cache (OCR_CACHE_BACKEND); unavailable when run outside the app package
+try:
+    from app.matching_engine.ocr_cache import get_cached_ocr, ocr_cache_key, store_ocr
+except ImportError:
+    get_cached_ocr = ocr_cache_key = store_ocr = None
+
 
 def init_supabase() -> "Client":
     """
@@ -98,32 +104,54 @@ def download_pdf_from_supabase(file_name: str, bucket: str = "pitchdecks") -> by
     return response
 
 
-def extract_text_with_ocr(pdf_bytes: bytes) -> str:
+def _ocr_pixmap_cached(pix) -> str:
+    """OCR a rendered page, reusing a cached result for an identical pixmap."""
+    key = None
+    if ocr_cache_key is not None:
+        key = ocr_cache_key(pix.samples, pix.width, pix.height, None, "eng")
+        cached = get_cached_ocr(key)
+        if cached is not None:
+            return cached
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    text = pytesseract.image_to_string(img)
+    if key is not None:
+        store_ocr(key, text)
+    return text
+
+
+def extract_pages_with_ocr(pdf_bytes: bytes) -> list:
     """
-    Extract text from a PDF (supplied as bytes) using PyMuPDF.
+    Extract text from a PDF (supplied as bytes) page by page using PyMuPDF.
     If a page has no text, fallback to OCR with pytesseract.
 
     :param pdf_bytes: The raw PDF data as bytes
-    :return: A single string containing the entire extracted text
+    :return: A list with the text of each page ('' for pages without any text)
     """
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    all_text = []
+    pages = []
 
     for page_index in range(doc.page_count):
         page = doc[page_index]
         # Attempt direct extraction
         text = page.get_text("text")
-        if text.strip():
-            all_text.append(text)
-        else:
+        if not text.strip():
             # OCR fallback
             pix = page.get_pixmap(dpi=150)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            ocr_result = pytesseract.image_to_string(img)
-            if ocr_result.strip():
-                all_text.append(ocr_result)
+            text = _ocr_pixmap_cached(pix)
+        pages.append(text if text.strip() else "")
+
+    return pages
 
-    return "\n".join(all_text)
+
+def extract_text_with_ocr(pdf_bytes: bytes) -> str:
+    """
+    Extract text from a PDF (supplied as bytes) using PyMuPDF.
+    If a page has no text, fallback to OCR with pytesseract.
+
+    :param pdf_bytes: The raw PDF data as bytes
+    :return: A single string containing the entire extracted text
+    """
+    return "\n".join(page for page in extract_pages_with_ocr(pdf_bytes) if page)
 
 
 def chunk_text_by_tokens(full_text: str, tokens_per_chunk: int = 1000) -> list:
@@ -2,11 +2,9 @@ import os
 import pymupdf
 import openai
 from supabase import create_client, Client
-from google.cloud import aiplatform_v1
 
-# If you have the embedding_preprocessor from earlier code, 
-# you can import specific functions or re-use them here.
-# from app.matching_engine.embedding_preprocessor import generate_embedding, upsert_embedding_to_vertex
+# Batched embedding + bulk Vertex upsert shared with the local-PDF preprocessor
+from app.matching_engine.embedding_preprocessor import generate_embeddings, upsert_embeddings_to_vertex
 
 def init_supabase() -> Client:
     """
@@ -48,41 +46,12 @@ def extract_pdf_text(pdf_path: str):
             extracted.append((page_idx, text))
     return extracted
 
-def generate_embedding(text: str) -> list:
-    """
-    Generates an embedding vector (list of floats) for the given text
-    using OpenAI's 'text-embedding-ada-002' model.
-    """
-    response = openai.Embedding.create(
-        input=[text],
-        model="text-embedding-ada-002"
-    )
-    embedding_vector = response["data"][0]["embedding"]
-    return embedding_vector
-
-def upsert_embedding_to_vertex(index_resource_name: str, data_id: str, embedding: list):
-    """
-    Upserts a single embedding vector to the specified Vertex AI Matching Engine index.
-    """
-    index_client = aiplatform_v1.IndexServiceClient()
-    datapoint = aiplatform_v1.IndexDatapoint(
-        datapoint_id=data_id,
-        feature_vector=embedding
-    )
-    request = aiplatform_v1.UpsertDatapointsRequest(
-        index=index_resource_name,
-        datapoints=[datapoint]
-    )
-    index_client.upsert_datapoints(request=request)
-    print(f"Upserted {data_id} into index {index_resource_name}.")
-
-
 def process_pitch_deck(file_name: str, index_resource_name: str):
     """
     1. Downloads the pitch deck (PDF) from Supabase.
     2. Extracts text from its pages.
-    3. Generates embeddings for each page.
-    4. Upserts embeddings to Vertex AI Matching Engine.
+    3. Generates embeddings for its pages in batched requests.
+    4. Upserts embeddings to Vertex AI Matching Engine in bulk.
     """
     pdf_path = download_pdf_from_supabase(file_name)
     print(f"Downloaded pitch deck to: {pdf_path}")
@@ -91,11 +60,12 @@ def process_pitch_deck(file_name: str, index_resource_name: str):
     pages = extract_pdf_text(pdf_path)
     print(f"Found {len(pages)} non-empty pages in {file_name}.")
 
-    # Generate embeddings & upsert each page
-    for page_number, text_content in pages:
-        embedding_vector = generate_embedding(text_content)
-        data_id = f"{file_name}_page{page_number}"
-        upsert_embedding_to_vertex(index_resource_name, data_id, embedding_vector)
+    # Generate embeddings & upsert all pages
+    vectors = generate_embeddings([text_content for _, text_content in pages])
+    upsert_embeddings_to_vertex(
+        index_resource_name,
+        [(f"{file_name}_page{page_number}", vector) for (page_number, _), vector in zip(pages, vectors)],
+    )
 
     print(f"Completed processing for pitch deck: {file_name}")
 
@@ -0,0 +1,277 @@
+"""
+Content-addressed key/value caches with pluggable backends.
+
+Both backends store JSON-serialisable values under a caller-supplied key
+(normally a sha256 digest), honour an optional TTL and keep hit/miss counters:
+
+*   `DiskCache`     – one file per entry under a directory, LRU-evicted by
+                      entry count and total bytes (access time = file mtime).
+*   `PostgresCache` – rows in `cache_entries` (namespace, key), LRU-evicted by
+                      `last_accessed_at` per namespace.
+
+Eviction is amortised: it runs on every CACHE_EVICT_EVERY-th write (per
+process), so the bounds may be exceeded by that many entries in between.
+
+Used by the agent response cache and the OCR page cache.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Writes between two eviction passes (a pass scans the directory / table)
+CACHE_EVICT_EVERY = int(os.getenv("CACHE_EVICT_EVERY", "100"))
+
+
+def content_hash(*parts: str) -> str:
+    """sha256 over the given parts (length-prefixed so boundaries are unambiguous)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8")
+        digest.update(str(len(data)).encode("ascii") + b":")
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class _CacheStats:
+    """Thread-safe hit/miss/write counters shared by all backends."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._writes_since_evict = 0
+
+    def _eviction_due(self) -> bool:
+        """Count a write; True on every CACHE_EVICT_EVERY-th one."""
+        with self._lock:
+            self._writes_since_evict += 1
+            if self._writes_since_evict < CACHE_EVICT_EVERY:
+                return False
+            self._writes_since_evict = 0
+            return True
+
+    def record(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + count)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+
+class DiskCache(_CacheStats):
+    """
+    File-per-entry cache. Entries are written atomically (temp file + rename)
+    so concurrent processes never read a partial value.
+    """
+    def __init__(
+        self,
+        directory: str,
+        ttl_seconds: Optional[int] = None,
+        max_entries: int = 10_000,
+        max_bytes: int = 512 * 1024 * 1024,
+    ):
+        super().__init__()
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.record("misses")
+            return None
+
+        if self.ttl_seconds and time.time() - entry.get("created", 0) > self.ttl_seconds:
+            self._remove(path)
+            self.record("misses")
+            return None
+
+        try:
+            os.utime(path, None)  # mark as recently used
+        except OSError:
+            pass
+        self.record("hits")
+        return entry.get("value")
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self.record("writes")
+        if self._eviction_due():
+            self._evict()
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        entries = []
+        total_bytes = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total_bytes += st.st_size
+
+        if len(entries) <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        entries.sort()  # least recently used first
+        removed = 0
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total_bytes -= size
+            removed += 1
+        if removed:
+            self.record("evictions", removed)
+            logger.info("Disk cache %s evicted %s entries.", self.directory, removed)
+
+
+class PostgresCache(_CacheStats):
+    """Cache rows in the `cache_entries` table, partitioned by namespace."""
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: Optional[int] = None,
+        max_entries: int = 100_000,
+    ):
+        super().__init__()
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Optional[Any]:
+        # Imported lazily: app.database.database requires DATABASE_URL at import.
+        from app.database.database import db_session
+        from app.database.models import CacheEntry
+
+        with db_session() as db:
+            row = db.get(CacheEntry, (self.namespace, key))
+            if row is None:
+                self.record("misses")
+                return None
+            now = datetime.utcnow()
+            if self.ttl_seconds and now - row.created_at > timedelta(seconds=self.ttl_seconds):
+                db.delete(row)
+                self.record("misses")
+                return None
+            row.last_accessed_at = now
+            self.record("hits")
+            return row.value
+
+    def set(self, key: str, value: Any) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+        from app.database.database import db_session
+        from app.database.models import CacheEntry
+
+        now = datetime.utcnow()
+        stmt = insert(CacheEntry).values(
+            namespace=self.namespace,
+            key=key,
+            value=value,
+            created_at=now,
+            last_accessed_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["namespace", "key"],
+            set_={"value": stmt.excluded.value, "created_at": now, "last_accessed_at": now},
+        )
+        with db_session() as db:
+            db.execute(stmt)
+        self.record("writes")
+        if self._eviction_due():
+            self._evict()
+
+    def _evict(self) -> None:
+        from sqlalchemy import text
+        from app.database.database import db_session
+
+        with db_session() as db:
+            result = db.execute(
+                text(
+                    """
+                    DELETE FROM cache_entries
+                    WHERE namespace = :ns AND key IN (
+                        SELECT key FROM cache_entries
+                        WHERE namespace = :ns
+                        ORDER BY last_accessed_at DESC
+                        OFFSET :keep
+                    )
+                    """
+                ),
+                {"ns": self.namespace, "keep": self.max_entries},
+            )
+            if result.rowcount:
+                self.record("evictions", result.rowcount)
+
+
+def make_cache(
+    backend: str,
+    namespace: str,
+    directory: Optional[str] = None,
+    ttl_seconds: Optional[int] = None,
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+):
+    """
+    Build a cache from configuration strings. Returns None when caching is
+    disabled (`backend` empty or 'none').
+    """
+    backend = (backend or "none").lower()
+    if backend == "none":
+        return None
+    if backend == "disk":
+        kwargs = {}
+        if max_entries:
+            kwargs["max_entries"] = max_entries
+        if max_bytes:
+            kwargs["max_bytes"] = max_bytes
+        directory = directory or os.path.join(tempfile.gettempdir(), f"{namespace}_cache")
+        return DiskCache(directory, ttl_seconds=ttl_seconds, **kwargs)
+    if backend == "postgres":
+        kwargs = {"max_entries": max_entries} if max_entries else {}
+        return PostgresCache(namespace, ttl_seconds=ttl_seconds, **kwargs)
+    logger.warning("Unknown cache backend '%s' for %s; caching disabled.", backend, namespace)
+    return None
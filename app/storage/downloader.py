@@ -0,0 +1,154 @@
+# app/storage/downloader.py
+"""
+Bounded, validating download of pitch decks (and other remote PDFs).
+
+`requests.get(url).content` buffers any file whole, opens a new connection
+every time and accepts whatever the URL returns. `download_pdf` instead:
+
+*   reuses connections through one pooled `requests.Session`;
+*   streams into a `SpooledTemporaryFile` (in memory up to
+    DOWNLOAD_SPOOL_BYTES, then on disk);
+*   refuses a Content-Length above DOWNLOAD_MAX_BYTES up front, and stops
+    reading as soon as the body exceeds it;
+*   checks the `%PDF-` header in the first KB, so an HTML error page or
+    a renamed binary is rejected after one chunk;
+*   resumes an interrupted transfer with a `Range` request (guarded by
+    `If-Range`) up to DOWNLOAD_MAX_RESUMES times, restarting if the server
+    ignores the range.
+
+Errors are raised as `DownloadError` subclasses.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from typing import IO, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Same cap as uploads unless set separately
+DOWNLOAD_MAX_BYTES = int(
+    float(os.getenv("DOWNLOAD_MAX_MB", os.getenv("MAX_UPLOAD_SIZE_MB", "25"))) * 1024 * 1024
+)
+DOWNLOAD_SPOOL_BYTES = int(os.getenv("DOWNLOAD_SPOOL_BYTES", str(4 * 1024 * 1024)))
+DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "10"))
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "30"))
+DOWNLOAD_MAX_RESUMES = int(os.getenv("DOWNLOAD_MAX_RESUMES", "3"))
+DOWNLOAD_POOL_SIZE = int(os.getenv("DOWNLOAD_POOL_SIZE", "10"))
+
+CHUNK_SIZE = 64 * 1024
+PDF_MAGIC = b"%PDF-"
+# The PDF header may follow up to 1 KB of junk (tolerated by all readers)
+PDF_MAGIC_WINDOW = 1024
+
+
+class DownloadError(Exception):
+    """The file could not be downloaded or is not acceptable."""
+
+
+class DownloadTooLarge(DownloadError):
+    pass
+
+
+class NotAPdf(DownloadError):
+    pass
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_download_session() -> requests.Session:
+    """Shared session: keep-alive connection pool, retries on connect errors and 502/503/504."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=2,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"GET"}),
+            )
+            adapter = HTTPAdapter(
+                pool_connections=DOWNLOAD_POOL_SIZE, pool_maxsize=DOWNLOAD_POOL_SIZE, max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _check_length(response: requests.Response, offset: int, max_bytes: int) -> None:
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit() and offset + int(length) > max_bytes:
+        raise DownloadTooLarge(f"File is {offset + int(length)} bytes; the limit is {max_bytes}.")
+
+
+def download_pdf(url: str, max_bytes: int = DOWNLOAD_MAX_BYTES) -> IO[bytes]:
+    """
+    Download `url` into a spooled temp file, positioned at 0. The caller owns
+    (and should close) the file. Raises `DownloadTooLarge`, `NotAPdf` or
+    `DownloadError`.
+    """
+    session = get_download_session()
+    timeout = (DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT)
+    spool = tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_BYTES)
+    received = 0
+    head = b""
+    validator = None     # ETag / Last-Modified of the first response, for If-Range
+    resumes = 0
+
+    try:
+        while True:
+            headers = {}
+            if received:
+                headers["Range"] = f"bytes={received}-"
+                if validator:
+                    headers["If-Range"] = validator
+            try:
+                with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                    if received and response.status_code == 200:
+                        # Range ignored (or the file changed): start over
+                        logger.info("Server ignored the range request for %s; restarting.", url)
+                        spool.seek(0)
+                        spool.truncate()
+                        received, head = 0, b""
+                    elif response.status_code not in (200, 206):
+                        raise DownloadError(f"GET {url} returned HTTP {response.status_code}.")
+                    if not received:
+                        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                    _check_length(response, received, max_bytes)
+
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        received += len(chunk)
+                        if received > max_bytes:
+                            raise DownloadTooLarge(f"File exceeds the {max_bytes}-byte limit.")
+                        if len(head) < PDF_MAGIC_WINDOW:
+                            head += chunk[:PDF_MAGIC_WINDOW - len(head)]
+                            if PDF_MAGIC not in head and len(head) >= PDF_MAGIC_WINDOW:
+                                raise NotAPdf(f"{url} does not look like a PDF.")
+                        spool.write(chunk)
+                break
+            except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError,
+                    requests.exceptions.ReadTimeout) as e:
+                if resumes >= DOWNLOAD_MAX_RESUMES:
+                    raise DownloadError(f"Download of {url} failed after {resumes} resume(s): {e}") from e
+                resumes += 1
+                logger.warning("Download of %s interrupted at %s bytes (%s); resuming.", url, received, e)
+
+        if PDF_MAGIC not in head:
+            raise NotAPdf(f"{url} does not look like a PDF.")
+        spool.seek(0)
+        logger.info("Downloaded %s bytes from %s.", received, url)
+        return spool
+    except BaseException:
+        spool.close()
+        raise
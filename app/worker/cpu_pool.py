@@ -0,0 +1,160 @@
+# app/worker/cpu_pool.py
+"""
+Process pool for CPU-bound pipeline stages.
+
+PDF rendering (WeasyPrint + markdown) and OCR (pytesseract / PyMuPDF) hold
+the GIL for seconds at a time. Run on a thread, they still stall the event
+loop that serves status polling and drives the agents. `run_cpu_stage`
+sends them to a shared `ProcessPoolExecutor` instead:
+
+*   sized to the cores the container may actually use (cgroup CPU quota,
+    then CPU affinity); override with CPU_POOL_WORKERS;
+*   per-item fan-out: `submit_cpu_stage` returns a future, so one caller can
+    spread e.g. the pages of a deck across all processes;
+*   bounded: at most CPU_POOL_MAX_PENDING stages are queued or running, and
+    further callers wait for a slot. This is backpressure instead of an
+    unbounded backlog of pickled PDFs;
+*   instrumented: `cpu_pool_stats()` reports queue depth, in-flight stages
+    and per-stage counts / seconds (served on /health).
+
+Stage functions and their arguments must be picklable (module-level
+functions, plain data). Processes are started with "spawn", so they do not
+inherit the parent's threads, sockets or DB pools.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def container_cpu_count() -> int:
+    """CPUs this process may use: cgroup quota if set, else affinity, else os.cpu_count()."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:          # cgroup v2: "<quota> <period>"
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:     # cgroup v1
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, quota // period)
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "0")) or container_cpu_count()
+CPU_POOL_MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", "0")) or CPU_POOL_WORKERS * 4
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "spawn")
+
+
+class CpuStageRunner:
+    """Bounded, instrumented wrapper around one lazily created ProcessPoolExecutor."""
+
+    def __init__(self, workers: int = CPU_POOL_WORKERS, max_pending: int = CPU_POOL_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._waiting = 0
+        self._in_flight = 0
+        self._stages: Dict[str, Dict[str, float]] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(CPU_POOL_START_METHOD),
+                )
+                logger.info("CPU pool started with %s process(es).", self.workers)
+            return self._executor
+
+    def submit(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Queue `fn(*args, **kwargs)` in the pool and return its future. Blocks
+        (call from a thread) only while all CPU_POOL_MAX_PENDING slots are taken.
+        """
+        with self._lock:
+            self._waiting += 1
+        try:
+            self._slots.acquire()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        started = time.monotonic()
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_flight += 1
+
+        def done(f: Future) -> None:
+            self._slots.release()
+            self._record(stage, time.monotonic() - started, not f.cancelled() and f.exception() is None)
+
+        future.add_done_callback(done)
+        return future
+
+    def run(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` in the pool and block for the result (call from a thread)."""
+        return self.submit(stage, fn, *args, **kwargs).result()
+
+    def _record(self, stage: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            counters = self._stages.setdefault(stage, {"completed": 0, "failed": 0, "seconds": 0.0})
+            counters["completed" if ok else "failed"] += 1
+            counters["seconds"] += seconds
+        logger.debug("CPU stage '%s' took %.2fs (%s).", stage, seconds, "ok" if ok else "failed")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "stages": {k: dict(v) for k, v in self._stages.items()},
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_runner = CpuStageRunner()
+
+
+def submit_cpu_stage(stage: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+    return _runner.submit(stage, fn, *args, **kwargs)
+
+
+def run_cpu_stage(stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return _runner.run(stage, fn, *args, **kwargs)
+
+
+def cpu_pool_stats() -> Dict[str, Any]:
+    return _runner.stats()
+
+
+def shutdown_cpu_pool() -> None:
+    _runner.shutdown()
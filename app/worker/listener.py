@@ -0,0 +1,311 @@
+# app/worker/listener.py
+"""
+Postgres LISTEN/NOTIFY pickup of new work.
+
+Two triggers publish events:
+
+  analysis_requests_pending  NEW.id of every analysis request inserted as
+                             'pending' (except parameters.generation_mode =
+                             'batch', which the batch runner owns)
+  report_jobs_queued         NEW.id of every report job entering 'queued'
+
+They are installed once per database, like a migration, with
+`python -m app.worker.listener --install` (idempotent). Workers only LISTEN
+and warn if the triggers are missing: (re)creating them takes ACCESS
+EXCLUSIVE locks on the hot tables.
+
+`run_listener` subscribes to both on one dedicated connection:
+
+*   a pending request is turned into a report job (`start_report_job`,
+    the same idempotent compare-and-set as the generate endpoint, so several
+    listeners can run at once);
+*   a queued job wakes the local worker loop immediately instead of at its
+    next JOB_POLL_INTERVAL tick.
+
+Backpressure: notifications go through a bounded queue drained by
+LISTENER_DISPATCH_CONCURRENCY dispatchers. When the queue is full, the
+notification is dropped and the listener sweeps the table for pending rows
+once the queue has drained. Rows stay 'pending' until dispatched, so nothing
+is lost; the same sweep runs after every (re)connect.
+
+    python -m app.worker.listener --install                # once per database
+    python -m app.worker.listener                          # pickup only
+    AUTO_GENERATE_PENDING=true python -m app.worker.main   # worker + pickup
+
+The worker LISTENs for queued jobs by default (WORKER_LISTEN); picking up
+pending requests without a /generate call is opt-in.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import text
+
+from app.database.crud import JOB_MAX_ATTEMPTS, get_pending_interactive_request_ids, start_report_job
+from app.database.database import ENGINE, db_session
+
+logger = logging.getLogger(__name__)
+
+PENDING_CHANNEL = "analysis_requests_pending"
+JOBS_CHANNEL = "report_jobs_queued"
+
+LISTENER_QUEUE_SIZE = int(os.getenv("LISTENER_QUEUE_SIZE", "100"))
+LISTENER_DISPATCH_CONCURRENCY = int(os.getenv("LISTENER_DISPATCH_CONCURRENCY", "4"))
+LISTENER_RECONNECT_DELAY = float(os.getenv("LISTENER_RECONNECT_DELAY", "5"))
+# Idle connections are checked this often so a dead socket is noticed
+LISTENER_PING_INTERVAL = float(os.getenv("LISTENER_PING_INTERVAL", "60"))
+
+TRIGGER_SQL = (
+    f"""
+    CREATE OR REPLACE FUNCTION notify_analysis_request_pending() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.status = 'pending'
+           AND COALESCE(NEW.parameters ->> 'generation_mode', '') <> 'batch' THEN
+            PERFORM pg_notify('{PENDING_CHANNEL}', NEW.id::text);
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS analysis_requests_pending_notify ON analysis_requests",
+    """
+    CREATE TRIGGER analysis_requests_pending_notify
+    AFTER INSERT ON analysis_requests
+    FOR EACH ROW EXECUTE FUNCTION notify_analysis_request_pending()
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION notify_report_job_queued() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.status = 'queued' THEN
+            PERFORM pg_notify('{JOBS_CHANNEL}', NEW.id::text);
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS report_jobs_queued_notify ON report_jobs",
+    """
+    CREATE TRIGGER report_jobs_queued_notify
+    AFTER INSERT OR UPDATE OF status ON report_jobs
+    FOR EACH ROW EXECUTE FUNCTION notify_report_job_queued()
+    """,
+)
+
+
+TRIGGER_NAMES = ("analysis_requests_pending_notify", "report_jobs_queued_notify")
+
+
+def install_triggers() -> None:
+    """Create (or replace) the NOTIFY triggers. Safe to run repeatedly; one-off, not per worker."""
+    with ENGINE.begin() as conn:
+        # Serialise concurrent installs
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('install_notify_triggers'))"))
+        for statement in TRIGGER_SQL:
+            conn.execute(text(statement))
+    logger.info("NOTIFY triggers installed on analysis_requests and report_jobs.")
+
+
+def triggers_installed() -> bool:
+    """True if both NOTIFY triggers exist (read-only catalog check)."""
+    with ENGINE.connect() as conn:
+        found = conn.execute(
+            text("SELECT count(*) FROM pg_trigger WHERE tgname = ANY(:names) AND NOT tgisinternal"),
+            {"names": list(TRIGGER_NAMES)},
+        ).scalar()
+    return found == len(TRIGGER_NAMES)
+
+
+def warn_if_triggers_missing() -> None:
+    try:
+        if not triggers_installed():
+            logger.warning(
+                "NOTIFY triggers are not installed; work is picked up by polling only. "
+                "Run `python -m app.worker.listener --install` once."
+            )
+    except Exception as e:
+        logger.warning("Could not check NOTIFY triggers: %s", e)
+
+
+class NotificationListener:
+    """
+    LISTENs on `channels` over a dedicated psycopg2 connection, driven by the
+    event loop (`add_reader`, no polling). `on_notify(channel, payload)` runs
+    on the loop; `on_connect()` after every (re)connect.
+    """
+    def __init__(
+        self,
+        channels: Iterable[str],
+        on_notify: Callable[[str, str], None],
+        on_connect: Optional[Callable[[], None]] = None,
+    ):
+        self.channels = list(channels)
+        self.on_notify = on_notify
+        self.on_connect = on_connect
+
+    async def run(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                await self._listen(stop)
+            except Exception as e:
+                logger.error("LISTEN connection failed: %s; reconnecting in %ss.", e, LISTENER_RECONNECT_DELAY)
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=LISTENER_RECONNECT_DELAY)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _listen(self, stop: asyncio.Event) -> None:
+        loop = asyncio.get_running_loop()
+        pooled = await asyncio.to_thread(ENGINE.raw_connection)
+        conn = pooled.dbapi_connection
+        lost: asyncio.Future = loop.create_future()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                for channel in self.channels:
+                    cur.execute(f'LISTEN "{channel}"')
+            logger.info("Listening on %s.", ", ".join(self.channels))
+
+            def on_readable():
+                try:
+                    conn.poll()
+                except Exception as e:
+                    if not lost.done():
+                        lost.set_exception(e)
+                    return
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.on_notify(notify.channel, notify.payload)
+
+            loop.add_reader(conn.fileno(), on_readable)
+            if self.on_connect is not None:
+                self.on_connect()
+
+            stopped = asyncio.ensure_future(stop.wait())
+            try:
+                while not stop.is_set():
+                    done, _ = await asyncio.wait(
+                        {lost, stopped}, timeout=LISTENER_PING_INTERVAL,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if lost in done:
+                        lost.result()   # re-raise the connection error
+                    if not done:
+                        # Keep-alive: surfaces a dead connection as an error
+                        await asyncio.to_thread(_ping, conn)
+            finally:
+                stopped.cancel()
+                loop.remove_reader(conn.fileno())
+        finally:
+            # Autocommit + LISTEN state must not go back into the pool
+            pooled.invalidate()
+
+
+def _ping(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+
+
+def _dispatch(request_id: str) -> bool:
+    with db_session() as db:
+        return start_report_job(db, request_id, max_attempts=JOB_MAX_ATTEMPTS) is not None
+
+
+def _pending_ids(limit: int):
+    with db_session() as db:
+        return get_pending_interactive_request_ids(db, limit)
+
+
+async def run_listener(
+    stop: asyncio.Event,
+    wake: Optional[asyncio.Event] = None,
+    dispatch_pending: bool = True,
+) -> None:
+    """
+    Listen until `stop` is set. Sets `wake` whenever a job is queued; when
+    `dispatch_pending`, turns newly inserted pending requests into jobs.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=LISTENER_QUEUE_SIZE)
+    sweep_needed = asyncio.Event()
+
+    def on_notify(channel: str, payload: str) -> None:
+        if channel == JOBS_CHANNEL:
+            if wake is not None:
+                wake.set()
+        elif channel == PENDING_CHANNEL and dispatch_pending:
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Still 'pending' in the table: the sweep picks it up later
+                sweep_needed.set()
+
+    async def dispatcher() -> None:
+        while True:
+            request_id = await queue.get()
+            try:
+                if await asyncio.to_thread(_dispatch, request_id):
+                    logger.info("Queued generation for new request %s.", request_id)
+            except Exception as e:
+                logger.error("Dispatching request %s failed: %s", request_id, e, exc_info=True)
+            finally:
+                queue.task_done()
+
+    async def sweeper() -> None:
+        while True:
+            await sweep_needed.wait()
+            await queue.join()          # let the backlog drain first
+            sweep_needed.clear()
+            try:
+                ids = await asyncio.to_thread(_pending_ids, LISTENER_QUEUE_SIZE)
+            except Exception as e:
+                logger.error("Sweeping pending requests failed: %s", e)
+                continue
+            for request_id in ids:
+                await queue.put(str(request_id))
+            if len(ids) == LISTENER_QUEUE_SIZE:
+                sweep_needed.set()      # there may be more
+
+    def on_connect() -> None:
+        # Catch up on anything inserted while we were not listening
+        if dispatch_pending:
+            sweep_needed.set()
+        if wake is not None:
+            wake.set()
+
+    channels = [JOBS_CHANNEL] + ([PENDING_CHANNEL] if dispatch_pending else [])
+    tasks = []
+    if dispatch_pending:
+        tasks = [asyncio.create_task(dispatcher()) for _ in range(LISTENER_DISPATCH_CONCURRENCY)]
+        tasks.append(asyncio.create_task(sweeper()))
+    try:
+        await NotificationListener(channels, on_notify, on_connect).run(stop)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:     # Windows
+            pass
+    await asyncio.to_thread(warn_if_triggers_missing)
+    await run_listener(stop)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    parser = argparse.ArgumentParser(description="LISTEN/NOTIFY pickup of pending requests.")
+    parser.add_argument("--install", action="store_true", help="Install the NOTIFY triggers and exit")
+    args = parser.parse_args()
+    if args.install:
+        install_triggers()
+    else:
+        asyncio.run(_main())
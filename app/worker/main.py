@@ -0,0 +1,210 @@
+# app/worker/main.py
+"""
+Report worker: runs the jobs queued by `POST /reports/{id}/generate`.
+
+    python -m app.worker.main
+
+Each worker claims up to WORKER_CONCURRENCY jobs from `report_jobs` with
+`FOR UPDATE SKIP LOCKED`, so any number of workers (Cloud Run jobs, VMs, a
+second container) can share the queue without double-processing a report.
+A claimed job is leased for JOB_LEASE_SECONDS and the lease is renewed every
+JOB_HEARTBEAT_SECONDS while the pipeline runs. If a worker dies, its lease
+expires and another worker re-claims the job; sections that were already
+checkpointed are not generated again. Failed attempts are retried after
+JOB_RETRY_DELAY seconds, up to the job's max_attempts.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from typing import Any, Dict, Optional, Set
+
+from app.api.ai.http_client import close_http_session
+from app.database.crud import (
+    claim_report_jobs,
+    complete_report_job,
+    fail_report_job,
+    heartbeat_report_job,
+    update_analysis_request_status,
+)
+from app.database.database import db_session
+from app.worker.cpu_pool import shutdown_cpu_pool
+from app.worker.listener import run_listener, warn_if_triggers_missing
+from app.worker.pipeline import run_report_pipeline
+from app.worker.reaper import start_reaper
+
+logger = logging.getLogger(__name__)
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "60"))
+# LISTEN for queued jobs (wake immediately) instead of only polling
+WORKER_LISTEN = os.getenv("WORKER_LISTEN", "true").lower() == "true"
+# Also turn newly inserted 'pending' requests into jobs, without /generate
+AUTO_GENERATE_PENDING = os.getenv("AUTO_GENERATE_PENDING", "false").lower() == "true"
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _claim(worker_id: str, limit: int):
+    with db_session() as db:
+        return claim_report_jobs(db, worker_id, limit, JOB_LEASE_SECONDS)
+
+
+def _heartbeat(job_id, worker_id: str) -> bool:
+    with db_session() as db:
+        return heartbeat_report_job(db, job_id, worker_id, JOB_LEASE_SECONDS)
+
+
+def _complete(job_id, worker_id: str) -> None:
+    with db_session() as db:
+        complete_report_job(db, job_id, worker_id)
+
+
+def _fail(job_id, worker_id: str, error: str) -> bool:
+    with db_session() as db:
+        return fail_report_job(db, job_id, worker_id, error, JOB_RETRY_DELAY)
+
+
+def _mark_request_failed(request_id) -> None:
+    with db_session() as db:
+        update_analysis_request_status(db, request_id, "failed")
+
+
+async def _keep_lease(job_id, worker_id: str, task: asyncio.Task) -> None:
+    """Renew the lease until cancelled; cancel `task` if the lease is lost."""
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            still_ours = await asyncio.to_thread(_heartbeat, job_id, worker_id)
+        except Exception as e:
+            # A transient DB error is not a lost lease; the next beat retries
+            logger.warning("Heartbeat for job %s failed: %s", job_id, e)
+            continue
+        if not still_ours:
+            logger.error("Lost the lease on job %s; abandoning it.", job_id)
+            task.cancel(msg="lease lost")
+            return
+
+
+async def run_job(job: Dict[str, Any], worker_id: str) -> None:
+    """Run one claimed job to completion, retry or failure."""
+    job_id, request_id = job["id"], job["request_id"]
+    attempt, max_attempts = job["attempts"], job["max_attempts"]
+
+    if attempt > max_attempts:
+        # Re-claimed after its worker died on the final attempt
+        await asyncio.to_thread(_fail, job_id, worker_id, "lease expired on the final attempt")
+        await asyncio.to_thread(_mark_request_failed, request_id)
+        return
+
+    logger.info("Job %s: report %s, attempt %s/%s.", job_id, request_id, attempt, max_attempts)
+    pipeline = asyncio.create_task(
+        run_report_pipeline(request_id, final_attempt=attempt >= max_attempts)
+    )
+    heartbeat = asyncio.create_task(_keep_lease(job_id, worker_id, pipeline))
+    try:
+        await pipeline
+    except asyncio.CancelledError:
+        if not heartbeat.done():
+            # The worker itself is shutting down: leave the lease to expire
+            # so another worker resumes the job from its checkpoints.
+            raise
+        logger.warning("Job %s abandoned after losing its lease.", job_id)
+        return
+    except Exception as exc:
+        final = await asyncio.to_thread(_fail, job_id, worker_id, f"{type(exc).__name__}: {exc}")
+        logger.error("Job %s attempt %s failed%s.", job_id, attempt, "" if final else "; will retry")
+        return
+    finally:
+        heartbeat.cancel()
+
+    await asyncio.to_thread(_complete, job_id, worker_id)
+    logger.info("Job %s completed.", job_id)
+
+
+async def run_worker(
+    stop: Optional[asyncio.Event] = None,
+    concurrency: int = WORKER_CONCURRENCY,
+    wake: Optional[asyncio.Event] = None,
+) -> None:
+    """
+    Claim and run jobs until `stop` is set. Setting `wake` (the listener does
+    on every queued job) triggers a claim right away; otherwise the queue is
+    checked every JOB_POLL_INTERVAL. In-flight jobs are cancelled on stop;
+    their leases lapse and they are picked up again elsewhere.
+    """
+    stop = stop or asyncio.Event()
+    wake = wake or asyncio.Event()
+    worker_id = make_worker_id()
+    running: Set[asyncio.Task] = set()
+    logger.info("Worker %s started (concurrency %s).", worker_id, concurrency)
+
+    try:
+        while not stop.is_set():
+            free = concurrency - len(running)
+            if free > 0:
+                try:
+                    jobs = await asyncio.to_thread(_claim, worker_id, free)
+                except Exception as e:
+                    logger.error("Claiming jobs failed: %s", e, exc_info=True)
+                    jobs = []
+                for job in jobs:
+                    task = asyncio.create_task(run_job(job, worker_id))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                if jobs and len(running) < concurrency:
+                    continue        # there may be more work queued
+
+            # Sleep until the poll interval passes, a job finishes, a job is
+            # queued (wake), or stop
+            signals = {asyncio.create_task(stop.wait()), asyncio.create_task(wake.wait())}
+            await asyncio.wait(
+                signals | running, timeout=JOB_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+            )
+            for waiter in signals:
+                waiter.cancel()
+            wake.clear()
+    finally:
+        for task in list(running):
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        logger.info("Worker %s stopped.", worker_id)
+
+
+async def _main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:     # Windows
+            pass
+    wake = asyncio.Event()
+    listener = None
+    if WORKER_LISTEN:
+        await asyncio.to_thread(warn_if_triggers_missing)
+        listener = asyncio.create_task(run_listener(stop, wake, dispatch_pending=AUTO_GENERATE_PENDING))
+    reaper = start_reaper()
+    try:
+        await run_worker(stop, wake=wake)
+    finally:
+        stop.set()
+        if reaper is not None:
+            reaper.stop(timeout=5)
+        if listener is not None:
+            await listener
+        await close_http_session()
+        await asyncio.to_thread(shutdown_cpu_pool)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    asyncio.run(_main())
@@ -0,0 +1,290 @@
+# app/worker/pipeline.py
+"""
+The report-generation pipeline, independent of any HTTP request:
+
+    OCR pitch deck → agent graph (checkpointed, streamed progress) →
+    save sections → PDF → upload / email → completion + deal rows
+
+`run_report_pipeline` is what a queue worker executes for one job (see
+`app.worker.main`). Blocking steps run in threads so one worker event loop
+can drive several reports at once.
+"""
+
+import asyncio
+import functools
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.api.ai.agents import BaseAIAgent
+from app.api.ai.orchestrator import RESEARCH_NODE, generate_report_async
+from app.api.ai.progress import get_report_progress, release_report_progress, start_report_progress
+from app.api.ai.rate_limiter import count_tokens
+from app.database.crud import (
+    get_analysis_request_by_id,
+    get_section_checkpoints,
+    save_generated_section,
+    save_generated_sections,
+    save_report_progress,
+    set_request_parameter,
+    update_analysis_request_status,
+)
+from app.database.database import db_session
+from app.matching_engine.deck_extractor import extract_deck_pages
+from app.notifications.supabase_notifier import supabase
+from app.storage.downloader import download_pdf
+from app.storage.gcs import finalize_report_with_pdf
+from app.storage.pdfgenerator import generate_pdf
+from app.worker.cpu_pool import run_cpu_stage
+
+logger = logging.getLogger(__name__)
+
+SECTION_TITLES = {
+    "executive_summary_investment_rationale": "Section 1: Executive Summary & Investment Rationale",
+    "market_opportunity_competitive_landscape": "Section 2: Market Opportunity & Competitive Landscape",
+    "financial_performance_investment_readiness": "Section 3: Financial Performance & Investment Readiness",
+    "go_to_market_strategy_customer_traction": "Section 4: Go-To-Market (GTM) Strategy & Customer Traction",
+    "leadership_team": "Section 5: Leadership & Team",
+    "investor_fit_exit_strategy_funding": "Section 6: Investor Fit, Exit Strategy & Funding Narrative",
+    "final_recommendations_next_steps": "Section 7: Final Recommendations & Next Steps",
+}
+SECTION_ORDINALS = {key: i for i, key in enumerate(SECTION_TITLES, start=1)}
+
+
+def build_generation_params(req) -> Dict[str, Any]:
+    """Merge form inputs and defaults into the parameters used for AI generation."""
+    params: Dict[str, Any] = (req.parameters or {}).copy()
+    # Extract founder company from additional_info (prefix "Founder Company: ")
+    # founder_co = ""
+    # if req.additional_info:
+    #     founder_co = req.additional_info.split("\n")[0].replace("Founder Company:", "").strip()
+    # founder_co = founder_co or "Unknown Company"
+
+    # Build the report title dynamically to include founder name & company:contentReference[oaicite:1]{index=1}
+    title_str = f"Founder Due Diligence Report for "
+    title_str += f"{req.company_name or 'Startup'}"
+    params.update({
+        "title": title_str,
+        "requestor_name": req.requestor_name,
+        "company": "DealIntel.VC",
+        "founder_company": req.company_name,
+        "founder_name": req.founder_name or "",
+        "industry": req.industry or "",
+        "funding_stage": req.funding_stage or "",
+        "company_type": req.company_type or "",
+        "pitch_deck_url": req.pitch_deck_url or "",
+        "email": req.email,
+    })
+    return params
+
+
+def checkpoint_step(request_id, step_key: str, content: str) -> None:
+    """
+    Persist one finished step right away (own session: called from agent tasks)
+    as its own `report_sections` row. Report sections are kind 'section';
+    intermediate steps such as the research pass are kind 'step'.
+    """
+    progress = get_report_progress(request_id)
+    with db_session() as session:
+        save_generated_section(
+            session,
+            request_id,
+            step_key,
+            content,
+            kind="section" if step_key in SECTION_TITLES else "step",
+            ordinal=SECTION_ORDINALS.get(step_key, 0),
+            completion_tokens=count_tokens(content),
+            model=BaseAIAgent.model_name(),
+            started_at=progress.started_at(step_key) if progress else None,
+            finished_at=datetime.utcnow(),
+        )
+
+
+def persist_progress(request_id, snapshot: Dict[str, Any]) -> None:
+    """Store the live progress snapshot so any instance can serve /status and /events."""
+    with db_session() as session:
+        save_report_progress(session, request_id, snapshot)
+
+
+def fetch_pitch_deck_pages(pitch_deck_url: str) -> List[str]:
+    """
+    Download the pitch deck and extract its text page by page. Blocking (run in
+    a thread); pages that need OCR are spread over the CPU process pool.
+    """
+    with download_pdf(pitch_deck_url) as pdf_file:
+        pdf_data = pdf_file.read()
+    return extract_deck_pages(pdf_data)
+
+
+def publish_report(db: Session, req, request_id, title_str: str, ai_sections: Dict[str, str]):
+    """
+    Build the PDF, upload it, mark the request completed and create the deal rows.
+    Blocking (storage uploads, DB; run in a thread). WeasyPrint rendering runs in
+    the CPU process pool.
+
+    Safe to call again for the same request (queue retries, reaper reclaims):
+    a completed request is left alone, and once the PDF has been uploaded and
+    emailed (`parameters.published`) it is not rendered, uploaded or sent again.
+    """
+    current = get_analysis_request_by_id(db, request_id)
+    if not current:
+        raise LookupError(f"Analysis request {request_id} not found")
+    if current.status == "completed":
+        logger.info("Request %s is already completed; not publishing it again.", request_id)
+        return
+    published = (current.parameters or {}).get("published")
+
+    if published:
+        logger.info("PDF for %s was already uploaded and sent; completing the request.", request_id)
+    else:
+        # 5. Build PDF from the generated sections
+        sections_for_pdf = [
+            {"id": f"sec_{i}", "title": SECTION_TITLES.get(key, key), "content": body}
+            for i, (key, body) in enumerate(ai_sections.items(), start=1)
+        ]
+        pdf_bytes = run_cpu_stage(
+            "pdf",
+            generate_pdf,
+            report_id=req.id,
+            report_title=title_str,
+            tier2_sections=sections_for_pdf,
+            founder_name=req.founder_name or "",
+            founder_company=req.company_name or "",
+            founder_type=req.company_type or "",
+            output_path=None,
+        )
+
+        # 6. Upload PDF to storage and send notification email (returns public URL info)
+        supabase_info = finalize_report_with_pdf(
+            report_id=req.id,
+            user_id=req.user_id,
+            final_report_sections=sections_for_pdf,
+            pdf_data=pdf_bytes,
+            expiration_seconds=86_400,
+            upload_to_supabase=True,
+            user_email=req.email,
+            requestor_name=req.requestor_name,
+        )
+        # finalize_report_with_pdf is now modified to return a dict with storage info (public_url, etc.)
+        published = {
+            "public_url": supabase_info.get("public_url") or "",
+            "storage_path": supabase_info.get("storage_path") or "",
+        }
+        # Marker: a retry from here on must not upload or email again
+        set_request_parameter(db, request_id, "published", published)
+
+    # 7. Mark request as completed and record external ID & PDF link in the database
+    set_request_parameter(db, request_id, "pdf_url", published["public_url"])
+    current.status = "completed"
+    current.external_request_id = str(req.id)  # use the same ID as external reference:contentReference[oaicite:2]{index=2}
+    current.updated_at = datetime.utcnow()
+    db.commit()  # commit all the above changes
+
+    # 8. Create a new internal deal entry and a summary placeholder, actually just use the id sent for the request for the other table entries
+    # deal_id = f"deal_{int(time.time())}_{uuid.uuid4().hex[:8]}"  # unique deal identifier
+    try:
+        # Insert into deal_reports (PDF link initially included, since we have it now)
+        supabase.table("deal_reports").insert({
+            "deal_id": str(request_id),
+            "company_name": req.company_name or "Unknown Company",
+            "pdf_url": published["public_url"] or None,
+            "pdf_file_path": published["storage_path"] or None
+        }).execute()
+    except Exception as e:
+        logger.error("Error saving deal report record: %s", e, exc_info=True)
+    try:
+        # Insert into deal_report_summaries with placeholder content:contentReference[oaicite:3]{index=3}:contentReference[oaicite:4]{index=4}
+        supabase.table("deal_report_summaries").insert({
+            "deal_id": str(request_id),
+            "company_name": req.company_name or "Unknown Company",
+            "executive_summary": f"Analysis report submitted to external API with ID: {req.id}. Report generation is in progress.",
+            "strategic_recommendations": "Report generation in progress via external API",
+            "market_analysis": "Analysis pending via external API service",
+            "financial_overview": "Financial analysis pending",
+            "competitive_landscape": "Competitive analysis pending",
+            "action_plan": "Action plan to be generated",
+            "investment_readiness": "pending",
+            "key_metrics": {"external_report_id": str(req.id), "api_status": "submitted"},
+            "financial_projections": {"status": "pending", "external_report_id": str(req.id)}
+        }).execute()
+    except Exception as e:
+        logger.error("Error saving report summary placeholder: %s", e, exc_info=True)
+
+    return updated_req
+
+
+async def run_report_pipeline(request_id, final_attempt: bool = True) -> None:
+    """
+    Generate, publish and complete one analysis request.
+
+    Raises on failure. The request is only marked 'failed' when
+    `final_attempt` is set; otherwise it stays 'processing' and the queue
+    retries it, resuming from the sections checkpointed so far.
+    """
+    # Live progress (per-step state + streamed partial text) for /status and /events
+    progress = start_report_progress(
+        request_id,
+        [RESEARCH_NODE, *SECTION_TITLES],
+        persist=functools.partial(persist_progress, request_id),
+    )
+    try:
+        # Each DB step has its own short session: none is held while the deck
+        # is fetched or the agents run
+        with db_session() as db:
+            req = await asyncio.to_thread(get_analysis_request_by_id, db, request_id)
+            if not req:
+                raise LookupError(f"Analysis request {request_id} not found")
+
+            # 1. Update status to 'processing'
+            await asyncio.to_thread(update_analysis_request_status, db, request_id, "processing")  # triggers real-time update
+
+            # 2. Prepare parameters for AI generation (merge form inputs and defaults)
+            params = build_generation_params(req)
+
+        # If a pitch deck URL is provided, fetch and OCR its text to include in prompts
+        if params["pitch_deck_url"]:
+            try:
+                # Pages are kept separately so context routing can label them
+                pages = await asyncio.to_thread(fetch_pitch_deck_pages, params["pitch_deck_url"])
+                params["pitch_deck_pages"] = pages
+                params["pitch_deck_text"] = "\n".join(page for page in pages if page)
+            except Exception as e:
+                logger.warning("Could not fetch/parse pitch deck PDF: %s", e)
+
+        # 3. Generate report sections using AI orchestrator, resuming from any
+        #    sections checkpointed by a previous attempt and checkpointing each
+        #    new one as soon as it finishes
+        with db_session() as db:
+            checkpoints = await asyncio.to_thread(get_section_checkpoints, db, request_id)
+        ai_sections: Dict[str, str] = await generate_report_async(
+            params,
+            checkpoints=checkpoints,
+            on_step_complete=functools.partial(checkpoint_step, request_id),
+            progress=progress,
+        )
+        progress.set_stage("publishing")
+
+        with db_session() as db:
+            # 4. Save generated sections (report_sections rows)
+            await asyncio.to_thread(
+                save_generated_sections, db, request_id, ai_sections, BaseAIAgent.model_name()
+            )
+
+            # 5–8. PDF, upload, completion update, deal rows
+            await asyncio.to_thread(publish_report, db, req, request_id, params["title"], ai_sections)
+        progress.set_stage("completed")
+
+    except Exception as exc:
+        logger.error("Report generation failed for %s: %s", request_id, exc, exc_info=True)
+        if final_attempt:
+            progress.set_stage("failed")
+            # Mark the request as failed in the database
+            with db_session() as db:
+                await asyncio.to_thread(update_analysis_request_status, db, request_id, "failed")
+        else:
+            progress.set_stage("retrying")
+        raise
+    finally:
+        release_report_progress(request_id)
@@ -0,0 +1,95 @@
+# app/worker/reaper.py
+"""
+Recovery of analysis requests stuck in 'processing'.
+
+Jobs in the queue recover on their own (an expired lease is re-claimed), but
+a request can still be left 'processing' with nothing working on it: an
+instance killed outside the queue (in-process run), or rows from before the
+queue existed. `StaleRequestReaper` is a background thread in the worker
+process that every REAPER_INTERVAL seconds looks for requests with no write
+(progress snapshots keep `updated_at` fresh while a report is generating)
+for REAPER_STALE_SECONDS and no live job, and
+
+*   queues a new job for it (the pipeline resumes from the sections already
+    checkpointed), or
+*   marks it 'failed' once it has had REAPER_MAX_ATTEMPTS jobs.
+
+Batch-mode requests (parameters.generation_mode = 'batch') only write their
+row when the batch runner heartbeats them (every provider poll, deck and
+publish), so they get the longer REAPER_BATCH_STALE_SECONDS.
+
+Several workers can run a reaper; rows are locked with SKIP LOCKED.
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.database.crud import JOB_MAX_ATTEMPTS, requeue_stale_requests
+from app.database.database import db_session
+
+logger = logging.getLogger(__name__)
+
+REAPER_ENABLED = os.getenv("REAPER_ENABLED", "true").lower() == "true"
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", "60"))
+REAPER_STALE_SECONDS = int(os.getenv("REAPER_STALE_SECONDS", "900"))
+REAPER_MAX_ATTEMPTS = int(os.getenv("REAPER_MAX_ATTEMPTS", "3"))
+# Batch rows are heartbeated once per BATCH_POLL_INTERVAL; allow for slow waves
+REAPER_BATCH_STALE_SECONDS = int(os.getenv("REAPER_BATCH_STALE_SECONDS", "3600"))
+
+
+def reap_stale_requests() -> int:
+    """One pass. Returns how many requests were requeued or failed."""
+    now = datetime.utcnow()
+    with db_session() as db:
+        requeued, failed = requeue_stale_requests(
+            db,
+            now - timedelta(seconds=REAPER_STALE_SECONDS),
+            max_attempts=REAPER_MAX_ATTEMPTS,
+            job_max_attempts=JOB_MAX_ATTEMPTS,
+            batch_stale_before=now - timedelta(seconds=REAPER_BATCH_STALE_SECONDS),
+        )
+    if requeued:
+        logger.warning(
+            "Requeued %s stale request(s): %s", len(requeued), ", ".join(map(str, requeued))
+        )
+    if failed:
+        logger.error(
+            "Marked %s stale request(s) failed after %s attempts: %s",
+            len(failed), REAPER_MAX_ATTEMPTS, ", ".join(map(str, failed)),
+        )
+    return len(requeued) + len(failed)
+
+
+class StaleRequestReaper(threading.Thread):
+    """Runs `reap_stale_requests` every `interval` seconds until `stop()`."""
+
+    def __init__(self, interval: float = REAPER_INTERVAL):
+        super().__init__(name="stale-request-reaper", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        logger.info(
+            "Reaper started (every %ss, stale after %ss).", self.interval, REAPER_STALE_SECONDS
+        )
+        while not self._stop_event.wait(self.interval):
+            try:
+                reap_stale_requests()
+            except Exception as e:
+                logger.error("Reaper pass failed: %s", e, exc_info=True)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        self.join(timeout)
+
+
+def start_reaper() -> Optional[StaleRequestReaper]:
+    """Start the reaper thread unless REAPER_ENABLED=false."""
+    if not REAPER_ENABLED:
+        return None
+    reaper = StaleRequestReaper()
+    reaper.start()
+    return reaper